@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Outbound call benchmark: a burst of calls dialed directly vs. through the call scheduler
+
+Starts the fake VAPI server (fixtures/fake_vapi.py) with a cap on calls in
+progress at once, then places N calls two ways: all at once, the way the
+synchronous /weaviate-query-generator handles a campaign burst (calls beyond
+the provider's cap are rejected), and through CallScheduler with the same cap
+(every call is placed; the queue absorbs the burst). Context preparation is
+simulated with a fixed delay so only scheduling is measured. Reports rejected
+dials, peak concurrent calls, calls per minute and queue-to-dial time.
+
+Run from the backend directory:
+    python benchmarks/bench_call_scheduler.py [--calls 40] [--max-concurrent 5] [--call-seconds 2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def wait_until_up(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stats", timeout=1) as response:
+                return json.loads(response.read())
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError("fake VAPI server never came up")
+
+
+def start_server(port: int, env: dict) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fixtures.fake_vapi:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    wait_until_up(port)
+    return server
+
+
+async def direct_burst(numbers, call_payload, place_call) -> dict:
+    start = time.perf_counter()
+    responses = await asyncio.gather(
+        *(place_call(call_payload(number, None, "bench")) for number in numbers), return_exceptions=True
+    )
+    placed = sum(1 for r in responses if not isinstance(r, Exception) and r.status_code < 400)
+    return {"placed": placed, "rejected": len(numbers) - placed, "seconds": round(time.perf_counter() - start, 2)}
+
+
+async def scheduled(numbers, scheduler, prepare_ms: float) -> dict:
+    async def prepare(prompt, session_id):
+        await asyncio.sleep(prepare_ms / 1000)
+        return {"focused_query": prompt, "extracted_data": [], "prior_calls": []}
+
+    start = time.perf_counter()
+    scheduler.enqueue_many([{"phone_number": number, "prompt": f"bench {number}"} for number in numbers])
+    runner = asyncio.ensure_future(scheduler.run(prepare))
+    try:
+        while True:
+            by_status = scheduler.metrics()["by_status"]
+            if by_status["completed"] + by_status["failed"] == len(numbers):
+                break
+            await asyncio.sleep(0.1)
+    finally:
+        runner.cancel()
+    seconds = time.perf_counter() - start
+    metrics = scheduler.metrics()
+    return {
+        "completed": metrics["by_status"]["completed"],
+        "failed": metrics["by_status"]["failed"],
+        "seconds": round(seconds, 2),
+        "calls_per_minute": round(metrics["dialed"] / seconds * 60, 1),
+        "queue_to_dial_seconds_p50": metrics["queue_to_dial_seconds_p50"],
+        "queue_to_dial_seconds_p95": metrics["queue_to_dial_seconds_p95"],
+        "dial_failures": metrics["dial_failures"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Outbound call scheduler benchmark")
+    parser.add_argument("--calls", type=int, default=40)
+    parser.add_argument("--max-concurrent", type=int, default=5)
+    parser.add_argument("--call-seconds", type=float, default=2)
+    parser.add_argument("--prepare-ms", type=float, default=300)
+    parser.add_argument("--port", type=int, default=8901)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = {**os.environ, "FAKE_VAPI_LATENCY_MS": "50", "FAKE_VAPI_CALL_SECONDS": str(args.call_seconds),
+           "FAKE_VAPI_MAX_CALLS": str(args.max_concurrent)}
+    # Settings are read from the environment when config is first imported
+    os.environ.update({
+        "VAPI_BASE_URL": base_url, "VAPI_API_KEY": "bench-key",
+        "CALL_QUEUE_DB": str(Path(tmp) / "calls.db"), "CALL_MAX_CONCURRENT": str(args.max_concurrent),
+        "CALL_DIALS_PER_MINUTE": "1000", "CALL_NUMBER_INTERVAL": "0", "CALL_POLL_INTERVAL": "0.25",
+        "CALL_RETRY_DELAY": "1",
+    })
+    from services.call_scheduler import CallScheduler, call_payload, place_call
+
+    # Distinct numbers, none ending in 0 (the fake server treats those as busy)
+    numbers = [f"+1555{i:05d}1" for i in range(args.calls)]
+    report = {"calls": args.calls, "max_concurrent": args.max_concurrent, "call_seconds": args.call_seconds}
+
+    server = start_server(args.port, env)
+    try:
+        report["direct_burst"] = asyncio.run(direct_burst(numbers, call_payload, place_call))
+    finally:
+        server.terminate()
+        server.wait()
+
+    server = start_server(args.port, env)
+    try:
+        report["scheduled"] = asyncio.run(scheduled(numbers, CallScheduler(Path(tmp) / "calls.db"), args.prepare_ms))
+        report["scheduled"]["peak_active_calls"] = wait_until_up(args.port)["peak_active_calls"]
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
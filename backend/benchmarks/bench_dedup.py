@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Ingest-time deduplication benchmark: index growth saved and retrieval quality
+
+Builds a synthetic submission stream where users resubmit documents exactly,
+with light edits, or with new content, and runs it through the duplicate
+detector. Reports how many inserts/embeddings and characters were saved, then
+ranks every query against the index with and without deduplication (simple
+term-frequency cosine) to show the effect on top-k: distinct source documents
+in the top k and whether the relevant document is still retrieved.
+
+Run from the backend directory:
+    python benchmarks/bench_dedup.py [--documents 300] [--resubmit-rate 0.4]
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.dedup import WORD_PATTERN, DuplicateDetector, fingerprint
+
+TOPICS = ("pricing churn retention fundraising investor seed series product market fit growth hiring "
+          "runway burn margin customer acquisition enterprise sales channel partnership portfolio "
+          "capital research roadmap competition moat regulation").split()
+
+
+def make_stream(documents: int, resubmit_rate: float, words: int, rng):
+    """(source document index, text) pairs in submission order"""
+    # Shared topic vocabulary plus a few document-specific terms (names, figures)
+    originals = [
+        " ".join(rng.choice(TOPICS + [f"d{i}term{j}" for j in range(20)]) for _ in range(words))
+        for i in range(documents)
+    ]
+    stream = [(i, text) for i, text in enumerate(originals)]
+    for _ in range(int(documents * resubmit_rate)):
+        source = rng.randrange(documents)
+        tokens = originals[source].split()
+        if rng.random() < 0.5:
+            # Light edit: a few words changed, as when a deck is re-exported
+            for _ in range(max(1, words // 100)):
+                tokens[rng.randrange(len(tokens))] = rng.choice(TOPICS)
+        stream.append((source, " ".join(tokens)))
+    rng.shuffle(stream)
+    return originals, stream
+
+
+def vectorize(text: str):
+    counts = Counter(WORD_PATTERN.findall(text.lower()))
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {term: v / norm for term, v in counts.items()}
+
+
+def rank(index, query_vector, k):
+    scored = sorted(
+        ((sum(weight * vector.get(term, 0.0) for term, weight in query_vector.items()), source)
+         for source, vector in index),
+        reverse=True,
+    )
+    return [source for _, source in scored[:k]]
+
+
+def retrieval(index, originals, queries, k):
+    distinct, hits = [], 0
+    for source in queries:
+        words = originals[source].split()
+        top = rank(index, vectorize(" ".join(words[:40])), k)
+        distinct.append(len(set(top)))
+        hits += source in top
+    return {"distinct_sources_at_k": round(sum(distinct) / len(distinct), 2), "recall_at_k": round(hits / len(queries), 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=300)
+    parser.add_argument("--resubmit-rate", type=float, default=0.4)
+    parser.add_argument("--words", type=int, default=600)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    originals, stream = make_stream(args.documents, args.resubmit_rate, args.words, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        detector = DuplicateDetector(str(Path(tmp) / "dedup.db"), threshold=args.threshold, window_days=30)
+        kept, linked_chars, false_links = [], 0, 0
+        start = time.perf_counter()
+        for n, (source, text) in enumerate(stream):
+            fp = fingerprint(text)
+            duplicate = detector.find_duplicate(fp)
+            if duplicate:
+                linked_chars += len(text)
+                false_links += stream[int(duplicate["object_id"])][0] != source
+                continue
+            detector.register(str(n), None, fp)
+            kept.append((source, text))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+    all_index = [(source, vectorize(text)) for source, text in stream]
+    dedup_index = [(source, vectorize(text)) for source, text in kept]
+    queries = [rng.randrange(args.documents) for _ in range(args.queries)]
+
+    report = {
+        "submissions": len(stream),
+        "stored_without_dedup": len(stream),
+        "stored_with_dedup": len(kept),
+        "inserts_and_embeddings_saved": len(stream) - len(kept),
+        "index_growth_saved_pct": round(100 * (len(stream) - len(kept)) / len(stream), 1),
+        "chars_saved": linked_chars,
+        "false_links": false_links,
+        "check_ms_per_submission": round(elapsed_ms / len(stream), 2),
+        "retrieval_without_dedup": retrieval(all_index, originals, queries, args.k),
+        "retrieval_with_dedup": retrieval(dedup_index, originals, queries, args.k),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
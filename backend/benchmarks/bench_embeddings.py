@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Hosted vectorizer vs. local embedder benchmark
+
+Creates two scratch collections on a local Weaviate container - one vectorized
+by a Weaviate module, one with bring-your-own vectors from the local ONNX
+embedder - then measures ingest throughput and query latency for both.
+
+Start Weaviate with a vectorizer module first, e.g. the text2vec-transformers
+docker-compose from the Weaviate docs, then run from the backend directory:
+    python benchmarks/bench_embeddings.py --documents 500 --queries 100
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import weaviate
+from weaviate.classes.config import Configure, DataType, Property
+
+from services.embeddings import local_embedder
+
+WORDS = ("startup revenue pricing churn retention fundraising investor seed series product market fit "
+         "growth hiring runway burn margin customer acquisition enterprise sales channel partnership "
+         "portfolio capital research development roadmap competition moat regulation").split()
+
+
+def synthetic_texts(count: int, words: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def create(client, name, vector_config):
+    if client.collections.exists(name):
+        client.collections.delete(name)
+    return client.collections.create(
+        name=name,
+        vector_config=vector_config,
+        properties=[Property(name="normalized_content", data_type=DataType.TEXT)],
+    )
+
+
+def ingest(collection, texts, vectors=None):
+    start = time.perf_counter()
+    with collection.batch.fixed_size(batch_size=100) as batch:
+        for i, text in enumerate(texts):
+            batch.add_object(properties={"normalized_content": text}, vector=vectors[i] if vectors else None)
+    return time.perf_counter() - start
+
+
+def run_queries(search, queries):
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        "p50_ms": round(statistics.median(latencies), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--module", default="text2vec_transformers",
+                        help="Configure.Vectors factory used for the hosted collection")
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--words", type=int, default=120)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    documents = synthetic_texts(args.documents, args.words)
+    queries = synthetic_texts(args.queries, 6, seed=11)
+
+    client = weaviate.connect_to_local(host=args.host, port=args.port)
+    try:
+        hosted = create(client, "BenchHostedVectorizer", getattr(Configure.Vectors, args.module)())
+        local = create(client, "BenchLocalVectors", Configure.Vectors.self_provided())
+
+        hosted_ingest = ingest(hosted, documents)
+
+        embed_start = time.perf_counter()
+        vectors = local_embedder.embed_documents(documents)
+        embed_seconds = time.perf_counter() - embed_start
+        local_ingest = ingest(local, documents, vectors) + embed_seconds
+
+        hosted_latency = run_queries(lambda q: hosted.query.near_text(query=q, limit=5), queries)
+        local_cold = run_queries(
+            lambda q: local.query.near_vector(near_vector=local_embedder.embed_query(q), limit=5), queries
+        )
+        # Second pass is served from the query-embedding LRU
+        local_warm = run_queries(
+            lambda q: local.query.near_vector(near_vector=local_embedder.embed_query(q), limit=5), queries
+        )
+
+        report = {
+            "documents": args.documents,
+            "ingest_docs_per_second": {
+                "hosted_vectorizer": round(args.documents / hosted_ingest, 1),
+                "local_embedder": round(args.documents / local_ingest, 1),
+                "local_embedding_only": round(args.documents / embed_seconds, 1),
+            },
+            "query_latency": {
+                "hosted_vectorizer": hosted_latency,
+                "local_embedder_cold": local_cold,
+                "local_embedder_cached": local_warm,
+            },
+            "embedder_stats": local_embedder.stats,
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        for name in ("BenchHostedVectorizer", "BenchLocalVectors"):
+            if client.collections.exists(name):
+                client.collections.delete(name)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Peak memory and full-file copies from upload to the Gemini/extraction stages
+
+Builds a synthetic multi-file session (100 MB by default, PDF-like files with
+page markers) held in spooled upload files, then runs the per-file work done
+between receiving an upload and building the Gemini request:
+- legacy: UploadFile.read() into bytes, write, hash in the normalizer, the
+  per-file notes cache and the Gemini handle cache, f.read() for page counting
+- current: chunked streaming into the blob store (hashed while written),
+  memoized hashes and memory-mapped page counting
+
+Python heap peak comes from tracemalloc; "full copies" is that peak divided by
+the largest file, i.e. how many whole files were held in memory at once.
+
+Run from the backend directory:
+    python benchmarks/bench_file_handoff.py [--total-mb 100] [--files 4]
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.blob_store import BlobStore
+from services.file_views import sha256_file
+from services.prompt_assembly import count_pdf_pages
+
+# Stages that ask for a file's hash before the request is built
+HASHING_STAGES = ("normalize", "normalize_file", "gemini_file_cache")
+
+
+def make_uploads(total_mb: int, files: int):
+    """Spooled upload files, like the ones Starlette hands to UploadFile"""
+    page = b"%PDF-1.4 /Type /Page " + b"x" * (64 * 1024)
+    size = total_mb * 1024 * 1024 // files
+    uploads = []
+    for i in range(files):
+        spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        written = 0
+        while written < size:
+            chunk = page[: size - written]
+            spooled.write(chunk)
+            written += len(chunk)
+        spooled.seek(0)
+        uploads.append((f"deck_{i}.pdf", spooled, size))
+    return uploads
+
+
+def legacy_chunked_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def legacy(uploads, workdir: Path):
+    for filename, upload, _ in uploads:
+        upload.seek(0)
+        content = upload.read()
+        path = workdir / filename
+        with open(path, "wb") as f:
+            f.write(content)
+        hashlib.sha256(content).hexdigest()
+        for _ in HASHING_STAGES:
+            legacy_chunked_hash(str(path))
+        with open(path, "rb") as f:
+            data = f.read()
+        len(re.findall(rb"/Type\s*/Page(?!s)", data))
+
+
+def current(uploads, workdir: Path):
+    store = BlobStore(str(workdir / "blobs"), str(workdir / "blobs.db"))
+    for filename, upload, _ in uploads:
+        upload.seek(0)
+        entry = store.store_upload("bench", "pdfs", filename, upload)
+        for _ in HASHING_STAGES:
+            sha256_file(entry["path"])
+        count_pdf_pages(entry["path"])
+
+
+def measure(pipeline, uploads):
+    largest = max(size for _, _, size in uploads)
+    with tempfile.TemporaryDirectory() as tmp:
+        tracemalloc.start()
+        start = time.perf_counter()
+        pipeline(uploads, Path(tmp))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "seconds": round(elapsed, 2),
+        "peak_heap_mb": round(peak / 1024 / 1024, 1),
+        "full_copies_in_memory": round(peak / largest, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--total-mb", type=int, default=100)
+    parser.add_argument("--files", type=int, default=4)
+    args = parser.parse_args()
+
+    uploads = make_uploads(args.total_mb, args.files)
+    report = {
+        "session_mb": args.total_mb,
+        "files": args.files,
+        "legacy": measure(legacy, uploads),
+        "current": measure(current, uploads),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
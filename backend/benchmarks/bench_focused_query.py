@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Focused-query cache benchmark: hit rate and query-generation latency
+
+Replays a synthetic stream of consultation prompts that repeat and cluster
+(exact resubmissions, reworded variants, new prompts) through the
+focused-query cache, with Gemini replaced by a generator of configurable
+latency, and compares query setup time against calling the model every time.
+
+Run from the backend directory:
+    python benchmarks/bench_focused_query.py [--prompts 500] [--model-ms 1800] [--budget-ms 2500]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.query_cache import FocusedQueryCache, percentile
+
+TOPICS = ["pricing", "churn", "fundraising", "hiring", "enterprise sales", "retention", "runway", "partnerships"]
+STAGES = ["pre-seed", "seed", "series A"]
+TEMPLATES = [
+    "How should we approach {topic} at the {stage} stage for our {industry} product?",
+    "We are a {stage} {industry} startup struggling with {topic}. What should we focus on?",
+    "What are the best {topic} strategies for a {industry} company raising a {stage} round?",
+]
+INDUSTRIES = ["logistics", "fintech", "healthcare", "edtech", "climate"]
+FILLERS = ["", " Thanks!", " Any advice is appreciated.", " We have limited time."]
+
+
+def prompt_stream(count: int, repeat_rate: float, rng):
+    seen = []
+    for _ in range(count):
+        if seen and rng.random() < repeat_rate:
+            prompt = rng.choice(seen)
+            # Resubmissions are often re-typed: case, spacing or a trailing filler changes
+            yield rng.choice([prompt, prompt.lower(), prompt + rng.choice(FILLERS)])
+            continue
+        prompt = rng.choice(TEMPLATES).format(
+            topic=rng.choice(TOPICS), stage=rng.choice(STAGES), industry=rng.choice(INDUSTRIES)
+        )
+        seen.append(prompt)
+        yield prompt
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    prompts = list(prompt_stream(args.prompts, args.repeat_rate, rng))
+
+    async def model(prompt: str) -> str:
+        await asyncio.sleep(max(0.0, rng.gauss(args.model_ms, args.model_ms / 4)) / 1000)
+        return f"focused: {prompt[:60]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = FocusedQueryCache(db_path=f"{tmp}/fq.db", ttl_days=30, budget_ms=args.budget_ms)
+        cached_ms, sources = [], {}
+        for prompt in prompts:
+            start = time.perf_counter()
+            _, source = await cache.resolve(prompt, model)
+            cached_ms.append((time.perf_counter() - start) * 1000)
+            sources[source] = sources.get(source, 0) + 1
+
+    uncached_ms = []
+    for prompt in prompts[:args.uncached_sample]:
+        start = time.perf_counter()
+        await model(prompt)
+        uncached_ms.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "prompts": len(prompts),
+        "sources": sources,
+        "hit_rate": round((sources.get("exact", 0) + sources.get("semantic", 0)) / len(prompts), 3),
+        "uncached_ms": {"p50": percentile(uncached_ms, 50), "p95": percentile(uncached_ms, 95)},
+        "cached_ms": {"p50": percentile(cached_ms, 50), "p95": percentile(cached_ms, 95),
+                      "mean": round(statistics.mean(cached_ms), 1)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Focused-query cache benchmark")
+    parser.add_argument("--prompts", type=int, default=500)
+    parser.add_argument("--repeat-rate", type=float, default=0.6)
+    parser.add_argument("--model-ms", type=float, default=1800)
+    parser.add_argument("--budget-ms", type=float, default=2500)
+    parser.add_argument("--uncached-sample", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Local vector index vs. Weaviate benchmark (QPS and recall@k)
+
+Loads the same random unit vectors into a scratch Weaviate collection (HNSW)
+and a LocalVectorIndex snapshot taken from it, then runs the same query
+vectors against both. The local index is an exact brute-force search, so its
+top-k is the ground truth: recall@k is reported for Weaviate, and the overlap
+of the two result lists is reported as well.
+
+Start a local Weaviate container first, then run from the backend directory:
+    python benchmarks/bench_local_index.py --documents 20000 --queries 500
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import weaviate
+from weaviate.classes.config import Configure, DataType, Property
+
+from services.local_index import LocalVectorIndex
+
+COLLECTION = "BenchLocalIndex"
+
+
+def unit_vectors(count: int, dim: int, rng):
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run(search, queries):
+    latencies, results = [], []
+    start = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        results.append(search(query))
+        latencies.append((time.perf_counter() - query_start) * 1000)
+    elapsed = time.perf_counter() - start
+    return results, {
+        "qps": round(len(queries) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    documents = unit_vectors(args.documents, args.dim, rng)
+    # Queries near existing documents, like real searches
+    picks = documents[rng.integers(0, args.documents, args.queries)]
+    queries = picks + 0.3 * unit_vectors(args.queries, args.dim, rng)
+
+    client = weaviate.connect_to_local(host=args.host, port=args.port)
+    try:
+        if client.collections.exists(COLLECTION):
+            client.collections.delete(COLLECTION)
+        collection = client.collections.create(
+            name=COLLECTION,
+            vector_config=Configure.Vectors.self_provided(),
+            properties=[Property(name="doc", data_type=DataType.INT)],
+        )
+        with collection.batch.fixed_size(batch_size=500) as batch:
+            for i, vector in enumerate(documents):
+                batch.add_object(properties={"doc": i}, vector=vector.tolist())
+
+        with tempfile.TemporaryDirectory() as index_dir:
+            index = LocalVectorIndex(index_dir)
+            snapshot_start = time.perf_counter()
+            index.snapshot_from_weaviate(collection)
+            snapshot_seconds = time.perf_counter() - snapshot_start
+
+            local_results, local_stats = run(
+                lambda q: [obj["id"] for obj, _ in index.search_vector(q, args.k)], queries
+            )
+            remote_results, remote_stats = run(
+                lambda q: [str(o.uuid) for o in collection.query.near_vector(near_vector=q.tolist(), limit=args.k).objects],
+                queries,
+            )
+
+        recall = statistics.mean(
+            len(set(local) & set(remote)) / args.k for local, remote in zip(local_results, remote_results)
+        )
+        report = {
+            "documents": args.documents,
+            "dim": args.dim,
+            "k": args.k,
+            "snapshot_seconds": round(snapshot_seconds, 2),
+            "local_index": local_stats,
+            "weaviate": remote_stats,
+            "weaviate_recall_at_k_vs_exact": round(recall, 4),
+            "speedup_qps": round(local_stats["qps"] / remote_stats["qps"], 1),
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        if client.collections.exists(COLLECTION):
+            client.collections.delete(COLLECTION)
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Whole-collection vs. session-scoped RAG: generation prompt size and latency
+
+For a sample of stored sessions, runs /weaviate/rag's generation three ways
+against the configured cluster (WEAVIATE_URL / WEAVIATE_API_KEY):
+- legacy: whole collection, every property of the retrieved chunks in the prompt
+- scoped: session_id filter applied inside Weaviate, only original_prompt and
+  normalized_content in the prompt
+- scoped_single_chunk: as scoped, with the context limited to one chunk
+
+Prompt tokens are estimated locally (~4 characters per token) from the chunks
+Weaviate put into the grouped task.
+
+Run from the backend directory:
+    python benchmarks/bench_rag_scope.py --sessions 10 --query "what is the pricing strategy"
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.prompt_assembly import estimate_text_tokens
+from services.weaviate_service import weaviate_service
+
+
+def prompt_tokens(collection, chunk_ids, properties):
+    from weaviate.classes.query import Filter
+
+    if not chunk_ids:
+        return 0
+    response = collection.query.fetch_objects(
+        filters=Filter.by_id().contains_any(chunk_ids), limit=len(chunk_ids), return_properties=properties
+    )
+    return sum(
+        estimate_text_tokens(" ".join(str(value) for value in obj.properties.values()))
+        for obj in response.objects
+    )
+
+
+def legacy_generate(collection, query, limit):
+    start = time.perf_counter()
+    response = collection.generate.near_text(
+        query=query, limit=limit,
+        grouped_task=f"Based on the retrieved documents, provide a comprehensive answer to: {query}"
+    )
+    return (time.perf_counter() - start) * 1000, [str(obj.uuid) for obj in response.objects]
+
+
+def scoped_generate(query, limit, session_id):
+    start = time.perf_counter()
+    result = weaviate_service.generate_response(query, limit, session_id=session_id)
+    return (time.perf_counter() - start) * 1000, [chunk["id"] for chunk in result["chunks"]]
+
+
+def summarize(rows):
+    latencies = [latency for latency, _ in rows]
+    tokens = [tokens for _, tokens in rows]
+    return {
+        "latency_p50_ms": round(statistics.median(latencies), 1),
+        "latency_mean_ms": round(statistics.mean(latencies), 1),
+        "prompt_tokens_mean": round(statistics.mean(tokens), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=3)
+    parser.add_argument("--query", default="What are the main challenges and the recommended strategy?")
+    args = parser.parse_args()
+
+    if not weaviate_service.connect():
+        sys.exit("Failed to connect to Weaviate")
+    collection = weaviate_service.client.collections.use(weaviate_service.collection_name)
+    try:
+        session_ids = []
+        for obj in collection.iterator(return_properties=["session_id"]):
+            if obj.properties.get("session_id"):
+                session_ids.append(obj.properties["session_id"])
+            if len(session_ids) >= args.sessions:
+                break
+
+        results = {"legacy": [], "scoped": [], "scoped_single_chunk": []}
+        scoped_properties = ["original_prompt", "normalized_content"]
+        for session_id in session_ids:
+            latency, ids = legacy_generate(collection, args.query, args.limit)
+            results["legacy"].append((latency, prompt_tokens(collection, ids, None)))
+            latency, ids = scoped_generate(args.query, args.limit, session_id)
+            results["scoped"].append((latency, prompt_tokens(collection, ids, scoped_properties)))
+            latency, ids = scoped_generate(args.query, 1, session_id)
+            results["scoped_single_chunk"].append((latency, prompt_tokens(collection, ids, scoped_properties)))
+
+        report = {"sessions": len(session_ids), "limit": args.limit}
+        report.update({name: summarize(rows) for name, rows in results.items() if rows})
+        print(json.dumps(report, indent=2))
+    finally:
+        weaviate_service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Batch search benchmark: one POST /weaviate/search/batch vs. the same queries as sequential GET /weaviate/search
+
+Runs against an already running server (start it with SEARCH_CACHE_TTL=0 so
+neither side is answered from the result cache). Each round issues a workload
+of related queries, with some repeated as the frontend and VAPI tooling do,
+and reports queries/sec and round latency for both modes.
+
+Run from the backend directory:
+    SEARCH_CACHE_TTL=0 python main.py &
+    python benchmarks/bench_search_batch.py --queries 20 --rounds 10
+"""
+
+import argparse
+import http.client
+import json
+import random
+import statistics
+import time
+import urllib.parse
+
+TERMS = ("pricing churn retention fundraising investor seed product market fit growth hiring runway burn "
+         "margin customer acquisition enterprise sales channel partnership roadmap competition").split()
+
+
+def workload(count: int, duplicate_rate: float, rng):
+    queries = []
+    for _ in range(count):
+        if queries and rng.random() < duplicate_rate:
+            queries.append(rng.choice(queries))
+        else:
+            queries.append(" ".join(rng.sample(TERMS, 3)))
+    return queries
+
+
+def request(connection, method: str, path: str, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    if response.status != 200 or payload.get("status") != "success":
+        raise RuntimeError(f"{method} {path}: {response.status} {payload.get('message')}")
+    return payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch vs. sequential search benchmark")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--duplicate-rate", type=float, default=0.25)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    connection = http.client.HTTPConnection(args.host, args.port, timeout=120)
+    sequential_ms, batch_ms = [], []
+    distinct = 0
+    for _ in range(args.rounds):
+        queries = workload(args.queries, args.duplicate_rate, rng)
+
+        start = time.perf_counter()
+        for query in queries:
+            request(connection, "GET", "/weaviate/search?" + urllib.parse.urlencode({"query": query, "limit": args.limit}))
+        sequential_ms.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        payload = request(connection, "POST", "/weaviate/search/batch",
+                          {"queries": [{"query": query, "limit": args.limit} for query in queries]})
+        batch_ms.append((time.perf_counter() - start) * 1000)
+        distinct += payload["distinct_queries"]
+
+    total = args.queries * args.rounds
+    report = {
+        "queries_per_round": args.queries,
+        "distinct_per_round": round(distinct / args.rounds, 1),
+        "sequential": {"round_ms_median": round(statistics.median(sequential_ms), 1),
+                       "queries_per_second": round(total / (sum(sequential_ms) / 1000), 1)},
+        "batch": {"round_ms_median": round(statistics.median(batch_ms), 1),
+                  "queries_per_second": round(total / (sum(batch_ms) / 1000), 1)},
+    }
+    report["speedup"] = round(report["batch"]["queries_per_second"] / report["sequential"]["queries_per_second"], 2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Response size and serialization-time benchmark per endpoint shape
+
+Compares, on synthetic Weaviate objects with large normalized_content:
+- legacy: every property str()-ed / full properties, encoded with jsonable_encoder + json.dumps
+- projected: services.projection + orjson, with and without gzip
+
+Run from the backend directory:
+    python benchmarks/bench_serialization.py [--objects 50] [--content-kb 8]
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+from services.projection import DEFAULT_MAX_PASSAGES, DEFAULT_SNIPPET_CHARS, SEARCH_PROPERTIES, project_object
+
+QUERY = "how does FuturaTech fund R&D from its portfolio"
+
+
+def make_objects(count: int, content_kb: int):
+    paragraph = "FuturaTech allocates capital from its equity portfolio to fund R&D programs. "
+    content = (paragraph * (content_kb * 1024 // len(paragraph) + 1))[: content_kb * 1024]
+    return [
+        SimpleNamespace(
+            uuid=uuid.uuid4(),
+            properties={
+                "session_id": str(uuid.uuid4()),
+                "original_prompt": "How is FuturaTech funding R&D from its stock portfolio?",
+                "normalized_content": content,
+                "pdf_count": 2,
+                "image_count": 1,
+                "pdf_files": ["futuratech_financials.pdf", "futuratech_overview.pdf"],
+                "image_files": ["futuratech_diagram.png"],
+                "total_files": 3,
+            },
+            metadata=SimpleNamespace(distance=0.12 + i / 1000, score=None),
+        )
+        for i in range(count)
+    ]
+
+
+def legacy_search(objects):
+    results = [{"id": str(o.uuid), "properties": o.properties, "metadata": vars(o.metadata)} for o in objects]
+    return json.dumps(jsonable_encoder({"results": results})).encode()
+
+
+def legacy_vapi(objects):
+    extracted = []
+    for o in objects:
+        properties = {key: str(value) for key, value in o.properties.items()}
+        extracted.append({"id": str(o.uuid), "properties": properties, "metadata": vars(o.metadata)})
+    return json.dumps(jsonable_encoder({"extracted_data": extracted})).encode()
+
+
+def projected_search(objects):
+    results = [
+        project_object(o, SEARCH_PROPERTIES, DEFAULT_SNIPPET_CHARS, query=QUERY, max_passages=DEFAULT_MAX_PASSAGES)
+        for o in objects
+    ]
+    return orjson.dumps({"results": results})
+
+
+def projected_vapi(objects):
+    properties = ["session_id", "original_prompt", "pdf_files", "image_files"]
+    return orjson.dumps({"extracted_data": [project_object(o, properties, query=QUERY, max_passages=3) for o in objects]})
+
+
+def measure(fn, objects, repeats: int):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        body = fn(objects)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeats
+    return {
+        "serialize_ms": round(elapsed_ms, 3),
+        "bytes": len(body),
+        "gzip_bytes": len(gzip.compress(body, compresslevel=6)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--objects", type=int, default=50)
+    parser.add_argument("--content-kb", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    objects = make_objects(args.objects, args.content_kb)
+    report = {
+        "/weaviate/search": {
+            "legacy": measure(legacy_search, objects, args.repeats),
+            "projected": measure(projected_search, objects, args.repeats),
+        },
+        "/weaviate/weaviate-query-generator": {
+            "legacy": measure(legacy_vapi, objects, args.repeats),
+            "projected": measure(projected_vapi, objects, args.repeats),
+        },
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
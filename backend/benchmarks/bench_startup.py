@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the FastAPI app
+
+Measures:
+- import time of `main` with `python -X importtime` (and the slowest modules)
+- time from launching uvicorn to the first healthy /health response
+
+Run from the backend directory:
+    python benchmarks/bench_startup.py [--runs 5] [--port 8765]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def measure_import_time():
+    """Return the cumulative import time of main (ms) and the slowest top-level imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            modules.append((fields[2].strip(), int(fields[1])))
+        except (IndexError, ValueError):
+            continue  # header line
+
+    main_entry = next((m for m in modules if m[0] == "main"), None)
+    slowest = sorted(modules, key=lambda m: m[1], reverse=True)[:10]
+    return {
+        "main_cumulative_ms": round(main_entry[1] / 1000, 1) if main_entry else None,
+        "slowest": [{"module": name, "cumulative_ms": round(cumulative / 1000, 1)} for name, cumulative in slowest],
+    }
+
+
+def measure_time_to_healthy(port: int, timeout: float = 60.0):
+    """Launch uvicorn and poll /health until it answers; returns seconds"""
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError("/health never became healthy")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    import_runs = [measure_import_time() for _ in range(args.runs)]
+    import_ms = [run["main_cumulative_ms"] for run in import_runs if run["main_cumulative_ms"] is not None]
+    healthy_s = [measure_time_to_healthy(args.port) for _ in range(args.runs)]
+
+    report = {
+        "runs": args.runs,
+        "import_main_ms": {"median": statistics.median(import_ms), "min": min(import_ms), "max": max(import_ms)},
+        "time_to_healthy_ms": {
+            "median": round(statistics.median(healthy_s) * 1000, 1),
+            "min": round(min(healthy_s) * 1000, 1),
+            "max": round(max(healthy_s) * 1000, 1),
+        },
+        "slowest_imports": import_runs[-1]["slowest"],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Transcript ingestion benchmark: webhook acknowledgement latency and batch insert throughput
+
+Replays a recorded VAPI end-of-call report (backend/fixtures/) as N distinct
+calls through the webhook's parse-and-enqueue path, then drains the queue into
+the ConsultationTranscripts collection of a local Weaviate, once with batched
+inserts and once with one insert per call. Gemini is skipped (the worker falls
+back to VAPI's own summary), so only queueing and Weaviate are measured.
+Replaying the same calls again must not add objects.
+
+Start a local Weaviate first (docker run -p 8080:8080 -p 50051:50051
+cr.weaviate.io/semitechnologies/weaviate with a vectorizer module, or set
+EMBEDDING_BACKEND=local), then run from the backend directory:
+    WEAVIATE_URL=http://localhost:8080 python benchmarks/bench_transcripts.py --calls 200
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.transcripts import TRANSCRIPTS_COLLECTION, TranscriptPipeline, parse_end_of_call_report
+from services.weaviate_service import weaviate_service
+
+FIXTURE = Path(__file__).resolve().parent.parent / "fixtures" / "vapi_end_of_call_report.json"
+
+
+def fixture_payloads(path: Path, calls: int):
+    with open(path, "r", encoding="utf-8") as f:
+        recorded = json.load(f)
+    for n in range(calls):
+        payload = copy.deepcopy(recorded)
+        payload["message"]["call"]["id"] = f"bench-call-{n:05d}"
+        payload["message"]["call"]["metadata"]["session_id"] = f"bench-session-{n % 20:03d}"
+        yield payload
+
+
+def collection_count(client) -> int:
+    if not client.collections.exists(TRANSCRIPTS_COLLECTION):
+        return 0
+    return client.collections.use(TRANSCRIPTS_COLLECTION).aggregate.over_all(total_count=True).total_count
+
+
+async def drain(pipeline: TranscriptPipeline) -> float:
+    start = time.perf_counter()
+    while await pipeline.process_batch(None, weaviate_service):
+        pass
+    return time.perf_counter() - start
+
+
+def replay(pipeline: TranscriptPipeline, payloads) -> list:
+    ack_ms = []
+    for payload in payloads:
+        start = time.perf_counter()
+        report = parse_end_of_call_report(payload)
+        pipeline.enqueue(report)
+        ack_ms.append((time.perf_counter() - start) * 1000)
+    return ack_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--fixture", type=Path, default=FIXTURE)
+    args = parser.parse_args()
+
+    if not weaviate_service.connect():
+        sys.exit("Failed to connect to Weaviate (set WEAVIATE_URL=http://localhost:8080)")
+    client = weaviate_service.client
+    if client.collections.exists(TRANSCRIPTS_COLLECTION):
+        client.collections.delete(TRANSCRIPTS_COLLECTION)
+
+    report = {"calls": args.calls}
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, batch_size in (("per_call", 1), ("batched", args.batch_size)):
+                pipeline = TranscriptPipeline(db_path=f"{tmp}/{label}.db", batch_size=batch_size)
+                ack_ms = replay(pipeline, fixture_payloads(args.fixture, args.calls))
+                seconds = asyncio.run(drain(pipeline))
+                report[label] = {
+                    "batch_size": batch_size,
+                    "ack_ms_p50": round(statistics.median(ack_ms), 3),
+                    "ack_ms_max": round(max(ack_ms), 3),
+                    "ingest_seconds": round(seconds, 2),
+                    "transcripts_per_second": round(args.calls / seconds, 1),
+                    "failures": pipeline.stats["failures"],
+                }
+
+            # The second run re-inserted the same call IDs: the collection must not have grown
+            report["objects_after_replay"] = collection_count(client)
+            report["idempotent"] = report["objects_after_replay"] == args.calls
+    finally:
+        client.collections.delete(TRANSCRIPTS_COLLECTION)
+        weaviate_service.close()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
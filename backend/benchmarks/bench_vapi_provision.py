@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+VAPI provisioning benchmark: tenants provisioned one at a time vs. concurrently
+
+Starts the fake VAPI server (fixtures/fake_vapi.py) with per-request latency
+and a per-key rate limit, provisions N tenants with vapi_provision.py at
+concurrency 1 (what the old setup scripts amounted to) and at the given
+concurrency, then re-runs to show an idempotent pass creates nothing.
+
+Run from the backend directory:
+    python benchmarks/bench_vapi_provision.py [--tenants 50] [--keys 5] [--latency-ms 150] [--rate-limit 10]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def wait_until_up(port: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stats", timeout=1) as response:
+                return json.loads(response.read())
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError("fake VAPI server never came up")
+
+
+def provision(spec: Path, store: Path, port: int, concurrency: int, env: dict) -> dict:
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "vapi_provision.py", "apply", "--spec", str(spec), "--store", str(store),
+         "--base-url", f"http://127.0.0.1:{port}", "--concurrency", str(concurrency)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    report = json.loads(output.stdout)
+    actions = {}
+    for tenant in report["tenants"]:
+        if tenant["status"] == "success":
+            action = tenant["assistant"]["action"]
+            actions[action] = actions.get(action, 0) + 1
+    return {
+        "concurrency": concurrency,
+        "seconds": round(time.perf_counter() - start, 2),
+        "failed": report["failed"],
+        "assistant_actions": actions,
+        "http": report["http"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VAPI provisioning benchmark")
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--rate-limit", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    env = {**os.environ, "FAKE_VAPI_LATENCY_MS": str(args.latency_ms), "FAKE_VAPI_RATE_LIMIT": str(args.rate_limit)}
+    for k in range(args.keys):
+        env[f"BENCH_VAPI_KEY_{k}"] = f"bench-key-{k}"
+
+    report = {"tenants": args.tenants, "keys": args.keys}
+    with tempfile.TemporaryDirectory() as tmp:
+        spec = Path(tmp) / "spec.json"
+        for label, concurrency in (("serial", 1), ("concurrent", args.concurrency)):
+            tenants = [
+                {"name": f"{label}-{i}", "api_key_env": f"BENCH_VAPI_KEY_{i % args.keys}",
+                 "assistant": {"name": f"{label} advisor {i}"}}
+                for i in range(args.tenants)
+            ]
+            spec.write_text(json.dumps({"tenants": tenants}), encoding="utf-8")
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "fixtures.fake_vapi:app", "--port", str(args.port),
+                 "--log-level", "warning"],
+                cwd=BACKEND_DIR, env=env,
+            )
+            try:
+                wait_until_up(args.port)
+                store = Path(tmp) / f"{label}.json"
+                report[label] = provision(spec, store, args.port, concurrency, env)
+                if label == "concurrent":
+                    report["idempotent_rerun"] = provision(spec, store, args.port, concurrency, env)
+            finally:
+                server.terminate()
+                server.wait()
+
+    report["speedup"] = round(report["serial"]["seconds"] / report["concurrent"]["seconds"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the multi-worker launch mode
+
+Starts the app with 1..N uvicorn workers and measures requests/sec against a
+single endpoint using several client processes with keep-alive connections.
+
+Run from the backend directory:
+    python benchmarks/bench_workers.py --max-workers 4 --path "/weaviate/search?query=pricing"
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def wait_until_healthy(port: int, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError("server never became healthy")
+
+
+def client_loop(port: int, path: str, duration: float, results):
+    """Issue requests back to back over one keep-alive connection for the given duration"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    completed = errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                completed += 1
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    results.put((completed, errors))
+
+
+def run_level(workers: int, port: int, path: str, clients: int, duration: float):
+    env = dict(os.environ, WORKERS=str(workers), PORT=str(port), WARMUP_ON_STARTUP="false",
+               # Keep rate limiting out of a throughput measurement
+               RATE_LIMIT_PER_MINUTE="100000000", RATE_LIMIT_BURST="100000000")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    try:
+        wait_until_healthy(port)
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=client_loop, args=(port, path, duration, results))
+            for _ in range(clients)
+        ]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    completed = sum(t[0] for t in totals)
+    errors = sum(t[1] for t in totals)
+    return {"workers": workers, "requests_per_second": round(completed / duration, 1), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    levels = []
+    for workers in range(1, args.max_workers + 1):
+        level = run_level(workers, args.port, args.path, args.clients, args.duration)
+        baseline = levels[0]["requests_per_second"] if levels else level["requests_per_second"]
+        level["scaling"] = round(level["requests_per_second"] / baseline, 2) if baseline else None
+        levels.append(level)
+        print(json.dumps(level))
+
+    print(json.dumps({"path": args.path, "levels": levels}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
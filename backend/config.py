@@ -0,0 +1,181 @@
+"""
+Application settings, loaded once from the environment (and .env) at import time
+"""
+
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from pydantic import BaseModel, field_validator, model_validator
+
+
+class Settings(BaseModel):
+    gemini_api_key: Optional[str] = None
+    gemini_model: str = "gemini-2.0-flash-thinking-exp"
+    weaviate_url: Optional[str] = None
+    weaviate_api_key: Optional[str] = None
+    vapi_api_key: str = "YOUR_VAPI_API_KEY"
+    vapi_assistant_id: str = "your-assistant-id"
+    vapi_phone_number_id: str = "your-phone-number-id"
+    # VAPI REST endpoint (point at fixtures/fake_vapi.py to try calls locally)
+    vapi_base_url: str = "https://api.vapi.ai"
+    upload_dir: Path = Path("uploads")
+    cors_origins: List[str] = ["http://localhost:3000"]  # Next.js default port
+    warmup_on_startup: bool = True
+    # Canned queries (comma-separated) that prime the Weaviate and embedding caches during warm-up
+    warmup_queries: List[str] = ["startup growth strategy", "product market fit"]
+    # Background readiness probes (services/readiness.py)
+    readiness_probe_interval: float = 15
+    readiness_probe_timeout: float = 5
+    host: str = "0.0.0.0"
+    port: int = 8000
+    # Production launch mode: >1 runs several uvicorn worker processes sharing the SQLite caches
+    workers: int = 1
+    search_cache_ttl: int = 60
+    # Responses larger than this many bytes are gzip-compressed (0 disables compression)
+    gzip_min_size: int = 1024
+    # "weaviate" uses the hosted text2vec_weaviate vectorizer, "local" embeds on our CPUs (services/embeddings.py)
+    embedding_backend: str = "weaviate"
+    local_embedding_model_dir: Path = Path("models/all-MiniLM-L6-v2")
+    embedding_batch_size: int = 32
+    query_embedding_cache_size: int = 4096
+    # Query embeddings in the shared cache expire after this many seconds (the model id is part of the key)
+    query_embedding_cache_ttl: int = 7 * 24 * 3600
+    # In-process vector index (services/local_index.py); needs EMBEDDING_BACKEND=local
+    local_index_enabled: bool = False
+    local_index_dir: Path = Path("cache/local_index")
+    # Delta-log records after which the log is folded into a new snapshot
+    local_index_compact_deltas: int = 2000
+    # "weaviate" searches the cluster and falls back to the local index, "local" serves from the local index first
+    search_backend: str = "weaviate"
+    # Near-duplicate submissions (services/dedup.py) are linked to the existing document instead of inserted
+    dedup_enabled: bool = True
+    dedup_threshold: float = 0.8
+    dedup_window_days: float = 30
+    dedup_db_path: Path = Path("cache/dedup.db")
+    # Content-addressed upload storage (services/blob_store.py); blob_dir defaults to <upload_dir>/blobs
+    blob_dir: Optional[Path] = None
+    blob_db_path: Path = Path("cache/blobs.db")
+    upload_retention_days: float = 30
+    blob_cold_after_days: float = 7
+    blob_maintenance_interval: int = 3600
+    # Outbound-call policies per dependency (services/resilience.py): timeout, retries with
+    # exponential backoff, circuit breaker and hedging; VAPI calls are never retried by default
+    gemini_timeout: float = 120
+    gemini_max_retries: int = 2
+    gemini_retry_base_delay: float = 1.0
+    gemini_retry_max_delay: float = 10.0
+    gemini_breaker_threshold: int = 5
+    gemini_breaker_reset: float = 30
+    gemini_hedge_delay: float = 0.3
+    weaviate_timeout: float = 10
+    weaviate_max_retries: int = 2
+    weaviate_retry_base_delay: float = 0.2
+    weaviate_retry_max_delay: float = 5.0
+    weaviate_breaker_threshold: int = 5
+    weaviate_breaker_reset: float = 30
+    weaviate_hedge_delay: float = 0.3
+    vapi_timeout: float = 15
+    vapi_max_retries: int = 0
+    vapi_retry_base_delay: float = 0.2
+    vapi_retry_max_delay: float = 5.0
+    vapi_breaker_threshold: int = 5
+    vapi_breaker_reset: float = 30
+    vapi_hedge_delay: float = 0.3
+    # Admission control (services/admission.py): per-client token bucket and per-dependency concurrency
+    rate_limit_per_minute: float = 60
+    rate_limit_burst: float = 20
+    rate_limit_max_clients: int = 10000
+    # Comma-separated API keys that get their own bucket via x-api-key; other callers are limited per IP
+    admission_api_keys: List[str] = []
+    admission_max_queue: int = 32
+    admission_max_wait: float = 2.0
+    gemini_concurrency: int = 4
+    weaviate_concurrency: int = 16
+    vapi_concurrency: int = 2
+    # Gemini normalization (services/gemini_normalizer.py, services/prompt_assembly.py):
+    # "single" sends the whole submission in one request, "per_file" fans out one request per file
+    gemini_normalization_mode: str = "single"
+    gemini_max_parallel_calls: int = 4
+    gemini_token_budget: int = 120000
+    # Largest fraction of the file allowance a single PDF may take before it is compressed
+    gemini_max_file_share: float = 0.5
+    file_notes_ttl_seconds: int = 30 * 24 * 3600
+    normalized_ttl_seconds: int = 30 * 24 * 3600
+    # Gemini Files API handles (services/gemini_file_cache.py), refreshed this many seconds before they expire
+    gemini_file_cache_db: Path = Path("cache/gemini_files.db")
+    gemini_file_refresh_margin: int = 3600
+    gemini_max_concurrent_uploads: int = 4
+    # Shared response/result cache (services/sqlite_cache.py); expired entries are purged every interval
+    cache_db_path: Path = Path("cache/cache.db")
+    cache_purge_interval: int = 3600
+    # Upper bound on how many retrieved chunks /weaviate/rag puts into the generation prompt
+    rag_max_context_chunks: int = 5
+    # VAPI end-of-call reports (services/transcripts.py); the secret is checked against the x-vapi-secret header
+    # and the webhook refuses every report until it is set
+    vapi_webhook_secret: Optional[str] = None
+    transcript_queue_db: Path = Path("cache/transcripts.db")
+    transcript_batch_size: int = 20
+    transcript_flush_interval: float = 30
+    # Focused-query cache (services/query_cache.py): Gemini gets this budget before the keyword fallback is used
+    focused_query_budget_ms: float = 2500
+    focused_query_similarity: float = 0.92
+    focused_query_ttl_days: float = 30
+    focused_query_db_path: Path = Path("cache/focused_queries.db")
+    # POST /weaviate/search/batch: queries per request and searches in flight at once
+    search_batch_max_queries: int = 50
+    search_batch_concurrency: int = 8
+    # Request profiling (services/profiling.py): off by default; slow or x-profile requests are captured
+    profiling_enabled: bool = False
+    profile_slow_ms: float = 2000
+    profile_dir: Path = Path("cache/profiles")
+    profile_retention: int = 200
+    profile_interval_ms: float = 1
+    # Sample every request so slow ones have a profile (costly); false profiles only x-profile requests
+    profile_sample_all: bool = False
+    # x-profile must carry this token and the /admin/profiles endpoints require it; both are off until it is set
+    profile_token: Optional[str] = None
+    # Outbound call scheduler (services/call_scheduler.py): calls in progress at once, dials per minute overall,
+    # minimum seconds between calls to the same number, and dial attempts per call (retries back off from the delay)
+    call_queue_db: Path = Path("cache/calls.db")
+    call_max_concurrent: int = 5
+    call_dials_per_minute: int = 30
+    call_number_interval: float = 300
+    call_max_attempts: int = 3
+    call_retry_delay: float = 60
+    call_poll_interval: float = 10
+    # Calls whose Weaviate context (focused query, passages, prior calls) is prepared at once
+    call_prepare_concurrency: int = 4
+
+    @field_validator("cors_origins", "warmup_queries", "admission_api_keys", mode="before")
+    @classmethod
+    def split_origins(cls, value):
+        if isinstance(value, str):
+            return [origin.strip() for origin in value.split(",") if origin.strip()]
+        return value
+
+    @model_validator(mode="after")
+    def check_local_index_embeddings(self) -> "Settings":
+        # The snapshot would hold Weaviate's vectors while queries are embedded locally
+        if self.local_index_enabled and self.embedding_backend != "local":
+            raise ValueError("LOCAL_INDEX_ENABLED=true requires EMBEDDING_BACKEND=local")
+        return self
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Load .env once and read every field from its upper-cased environment variable"""
+        try:
+            from dotenv import load_dotenv
+            load_dotenv()
+        except ImportError:
+            pass
+
+        values = {
+            name: os.environ[name.upper()]
+            for name in cls.model_fields
+            if os.environ.get(name.upper())
+        }
+        return cls(**values)
+
+# Global instance
+settings = Settings.from_env()
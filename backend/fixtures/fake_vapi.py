@@ -0,0 +1,169 @@
+"""
+In-memory stand-in for the VAPI REST API, for trying provisioning and calls locally
+
+Implements the endpoints vapi_provision.py uses (assistants and phone numbers)
+and the call endpoints the call scheduler uses. Keys starting with "invalid"
+get 401. FAKE_VAPI_LATENCY_MS adds a delay to every request and
+FAKE_VAPI_RATE_LIMIT caps requests per second per key (excess requests get 429
+with Retry-After). Calls ring for a moment, stay in progress for
+FAKE_VAPI_CALL_SECONDS and then end; customer numbers ending in "0" are busy.
+FAKE_VAPI_MAX_CALLS rejects calls beyond that many in progress at once.
+
+Run from the backend directory:
+    uvicorn fixtures.fake_vapi:app --port 8900
+    VAPI_BASE_URL=http://127.0.0.1:8900 VAPI_API_KEY=test python vapi_provision.py apply
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Header, Request
+from fastapi.responses import JSONResponse
+
+LATENCY_SECONDS = float(os.getenv("FAKE_VAPI_LATENCY_MS", "50")) / 1000
+RATE_LIMIT = float(os.getenv("FAKE_VAPI_RATE_LIMIT", "0"))
+CALL_SECONDS = float(os.getenv("FAKE_VAPI_CALL_SECONDS", "5"))
+MAX_CALLS = int(os.getenv("FAKE_VAPI_MAX_CALLS", "0"))
+RING_SECONDS = 0.5
+
+app = FastAPI(title="Fake VAPI")
+resources: Dict[str, Dict[str, Dict]] = {"assistant": {}, "phone-number": {}, "call": {}}
+windows: Dict[str, list] = defaultdict(list)
+stats = {"requests": 0, "rate_limited": 0, "peak_concurrency": 0, "peak_active_calls": 0, "calls_rejected": 0}
+in_flight = 0
+
+
+@app.middleware("http")
+async def vapi_behaviour(request: Request, call_next):
+    global in_flight
+    if request.url.path.startswith("/_stats"):
+        return await call_next(request)
+    stats["requests"] += 1
+    key = (request.headers.get("authorization") or "").removeprefix("Bearer ").strip()
+    if not key or key.startswith("invalid"):
+        return JSONResponse(status_code=401, content={"message": "Invalid Key"})
+    if RATE_LIMIT:
+        now = time.monotonic()
+        window = [t for t in windows[key] if t > now - 1]
+        if len(window) >= RATE_LIMIT:
+            stats["rate_limited"] += 1
+            windows[key] = window
+            return JSONResponse(status_code=429, content={"message": "Too Many Requests"},
+                                headers={"Retry-After": "1"})
+        window.append(now)
+        windows[key] = window
+    in_flight += 1
+    stats["peak_concurrency"] = max(stats["peak_concurrency"], in_flight)
+    try:
+        await asyncio.sleep(LATENCY_SECONDS)
+        return await call_next(request)
+    finally:
+        in_flight -= 1
+
+
+def owned(kind: str, authorization: Optional[str]):
+    key = (authorization or "").removeprefix("Bearer ").strip()
+    return [item for item in resources[kind].values() if item["_key"] == key]
+
+
+def public(item: Dict) -> Dict:
+    return {k: v for k, v in item.items() if not k.startswith("_")}
+
+
+def create(kind: str, body: Dict, authorization: Optional[str], **extra) -> Dict:
+    item = {**body, **extra, "id": str(uuid.uuid4()), "createdAt": time.time(),
+            "_key": (authorization or "").removeprefix("Bearer ").strip()}
+    resources[kind][item["id"]] = item
+    return item
+
+
+@app.get("/_stats")
+async def get_stats():
+    return {**stats, **{kind: len(items) for kind, items in resources.items()}}
+
+
+@app.get("/assistant")
+async def list_assistants(authorization: str = Header(None)):
+    return [public(item) for item in owned("assistant", authorization)]
+
+
+@app.post("/assistant", status_code=201)
+async def create_assistant(request: Request, authorization: str = Header(None)):
+    return public(create("assistant", await request.json(), authorization))
+
+
+@app.get("/assistant/{item_id}")
+async def get_assistant(item_id: str):
+    if item_id not in resources["assistant"]:
+        return JSONResponse(status_code=404, content={"message": "Not Found"})
+    return public(resources["assistant"][item_id])
+
+
+@app.patch("/assistant/{item_id}")
+async def update_assistant(item_id: str, request: Request):
+    if item_id not in resources["assistant"]:
+        return JSONResponse(status_code=404, content={"message": "Not Found"})
+    resources["assistant"][item_id].update(await request.json())
+    return public(resources["assistant"][item_id])
+
+
+@app.get("/phone-number")
+async def list_phone_numbers(authorization: str = Header(None)):
+    return [public(item) for item in owned("phone-number", authorization)]
+
+
+@app.post("/phone-number", status_code=201)
+async def create_phone_number(request: Request, authorization: str = Header(None)):
+    body = await request.json()
+    number = f"+1{body.get('numberDesiredAreaCode', '555')}{len(resources['phone-number']):07d}"
+    return public(create("phone-number", body, authorization, number=number))
+
+
+@app.get("/phone-number/{item_id}")
+async def get_phone_number(item_id: str):
+    if item_id not in resources["phone-number"]:
+        return JSONResponse(status_code=404, content={"message": "Not Found"})
+    return public(resources["phone-number"][item_id])
+
+
+
+def call_progress(call: Dict) -> Dict:
+    """Advance a call through ringing -> in-progress -> ended by elapsed time"""
+    elapsed = time.time() - call["createdAt"]
+    busy = call["customer"]["number"].endswith("0")
+    if call["status"] != "ended":
+        if busy and elapsed >= RING_SECONDS:
+            call.update(status="ended", endedReason="customer-busy")
+        elif elapsed >= RING_SECONDS + CALL_SECONDS:
+            call.update(status="ended", endedReason="customer-ended-call")
+        elif elapsed >= RING_SECONDS:
+            call["status"] = "in-progress"
+    return call
+
+
+def active_calls() -> int:
+    return sum(1 for call in resources["call"].values() if call_progress(call)["status"] != "ended")
+
+
+@app.post("/call", status_code=201)
+async def create_call(request: Request, authorization: str = Header(None)):
+    body = await request.json()
+    if not body.get("customer", {}).get("number"):
+        return JSONResponse(status_code=400, content={"message": "customer.number is required"})
+    if MAX_CALLS and active_calls() >= MAX_CALLS:
+        stats["calls_rejected"] += 1
+        return JSONResponse(status_code=429, content={"message": "Over Concurrency Limit"})
+    call = create("call", body, authorization, status="ringing")
+    stats["peak_active_calls"] = max(stats["peak_active_calls"], active_calls())
+    return public(call)
+
+
+@app.get("/call/{item_id}")
+async def get_call(item_id: str):
+    if item_id not in resources["call"]:
+        return JSONResponse(status_code=404, content={"message": "Not Found"})
+    return public(call_progress(resources["call"][item_id]))
@@ -1,26 +1,91 @@
-from fastapi import FastAPI
+from config import settings
+from fastapi import FastAPI, Header
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from routes import weaviate
-from dotenv import load_dotenv
-import os
+from services.gemini_file_cache import gemini_file_cache
+from services.resilience import outbound
+from services.admission import admission
+from services.embeddings import local_embedder
+from services.local_index import local_index
+from services.dedup import duplicate_detector
+from services.blob_store import blob_store
+from services.sqlite_cache import local_cache
+from services.transcripts import transcript_pipeline
+from services.call_scheduler import call_scheduler
+from services.query_cache import focused_query_cache
+from services.profiling import ProfilingMiddleware, profile_store
+from services.readiness import readiness
+from services.warmup import warm_dependencies, warmup_status
+from services.weaviate_service import weaviate_service
+import asyncio
+import hmac
 
-# Load environment variables
-load_dotenv()
-
-app = FastAPI(title="Startup Voice Agent API", version="1.0.0")
+app = FastAPI(title="Startup Voice Agent API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Add CORS middleware to allow frontend to communicate with backend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000"],  # Next.js default port
+    allow_origins=settings.cors_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Compress large responses (e.g. big search result sets) for clients that accept gzip
+if settings.gzip_min_size:
+    app.add_middleware(GZipMiddleware, minimum_size=settings.gzip_min_size)
+
+# Opt-in profiling: not installed at all unless PROFILING_ENABLED=true (outermost, so it sees whole requests)
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(weaviate.router)
 
+# Long-running background tasks; the event loop only keeps weak references, so they are held here
+background_tasks = set()
+
+def background_task_done(task: asyncio.Task):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"❌ Background task {task.get_name()} stopped: {task.exception()!r}")
+
+def start_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_task_done)
+    return task
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Heavy SDKs are imported lazily; warm them, the Weaviate connection and
+    # the collection in the background so neither startup nor the first
+    # request pays for them. Readiness probes keep running afterwards.
+    if settings.warmup_on_startup:
+        start_background(warm_dependencies())
+    else:
+        readiness.warmed_up = True
+        start_background(readiness.probe_loop())
+        if settings.local_index_enabled:
+            start_background(asyncio.to_thread(local_index.load))
+    # Upload retention, blob garbage collection and cold compression
+    start_background(blob_store.maintenance_loop())
+    # Expired search results, file notes, normalizations and query embeddings in the shared cache
+    start_background(local_cache.purge_loop())
+    # Normalize and batch-insert consultation transcripts queued by the VAPI webhook
+    start_background(transcript_pipeline.run(weaviate.get_gemini_client, weaviate_service))
+    # Prepare, dial and follow scheduled outbound calls
+    start_background(call_scheduler.run(weaviate.prepare_call_context))
+    # Keep Gemini file handles fresh so reused uploads never hit an expired URI
+    if settings.gemini_api_key:
+        start_background(gemini_file_cache.refresh_loop(weaviate.get_gemini_client))
+
+@app.on_event("shutdown")
+async def close_connections():
+    weaviate_service.close()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Startup Voice Agent API"}
@@ -29,7 +94,65 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    # Served from cached background probes; never makes a live call per hit
+    status = readiness.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "outbound": outbound.metrics(),
+        "admission": admission.metrics(),
+        "embeddings": {"backend": settings.embedding_backend, **local_embedder.stats},
+        "local_index": {"ready": local_index.ready, "documents": local_index.size},
+        "dedup": duplicate_detector.stats() if settings.dedup_enabled else {"enabled": False},
+        "uploads": blob_store.stats(),
+        "transcripts": transcript_pipeline.metrics(),
+        "calls": call_scheduler.metrics(),
+        "focused_query": focused_query_cache.metrics(),
+        "profiling": profile_store.metrics() if settings.profiling_enabled else {"enabled": False},
+        "warmup": warmup_status,
+    }
+
+def profile_access_denied(token: str):
+    # Captures expose internals, so the endpoints don't exist without profiling and a PROFILE_TOKEN
+    if not (settings.profiling_enabled and settings.profile_token):
+        return JSONResponse(status_code=404, content={"message": "Not found", "status": "error"})
+    if not hmac.compare_digest(token or "", settings.profile_token):
+        return JSONResponse(status_code=403, content={"message": "Invalid profile token", "status": "error"})
+    return None
+
+@app.get("/admin/profiles")
+async def list_profiles(limit: int = 20, since_minutes: float = None, path: str = None,
+                        x_profile_token: str = Header(None)):
+    """Slowest captured requests (all workers) with their per-stage breakdown and profile file"""
+    denied = profile_access_denied(x_profile_token)
+    if denied:
+        return denied
+    captures = await asyncio.to_thread(
+        profile_store.slowest, min(max(limit, 1), 200), since_minutes * 60 if since_minutes else None, path
+    )
+    return {"captures": captures, "count": len(captures), "slow_ms": settings.profile_slow_ms, "status": "success"}
+
+@app.get("/admin/profiles/{name}")
+async def get_profile(name: str, x_profile_token: str = Header(None)):
+    """Download a captured profile (.html from pyinstrument, .prof for pstats/snakeviz)"""
+    denied = profile_access_denied(x_profile_token)
+    if denied:
+        return denied
+    path = profile_store.resolve(name)
+    if path is None:
+        return JSONResponse(status_code=404, content={"message": "Profile not found", "status": "error"})
+    return FileResponse(path)
+
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if settings.workers > 1:
+        # Each worker is a separate process with its own Weaviate connection;
+        # caches are shared through the SQLite (WAL) store under cache/
+        uvicorn.run("main:app", host=settings.host, port=settings.port, workers=settings.workers)
+    else:
+        uvicorn.run(app, host=settings.host, port=settings.port)
@@ -1,17 +1,38 @@
-from fastapi import APIRouter, File, UploadFile, Form
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, File, Header, Request, UploadFile, Form
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Dict, List, Optional
 from pydantic import BaseModel
-import aiofiles
+import asyncio
+import hashlib
+import hmac
+import json
+import time
 import uuid
-import os
 from pathlib import Path
-from google import genai
-from google.genai.types import HttpOptions, Part
-from dotenv import load_dotenv
+from config import settings
 from services.weaviate_service import weaviate_service
-
-# Load environment variables
-load_dotenv()
+from services.local_index import local_index
+from services.embeddings import local_embedder, use_local_embeddings
+from services.dedup import duplicate_detector
+from services import gemini_normalizer
+from services.gemini_normalizer import GEMINI_MODEL
+from services.prompt_assembly import gemini_usage
+from services.resilience import outbound
+from services.admission import admission, admit
+from services.sqlite_cache import local_cache
+from services.projection import (
+    DEFAULT_MAX_PASSAGES, DEFAULT_SNIPPET_CHARS, SEARCH_PROPERTIES, parse_properties, truncate
+)
+from services.snippets import DEFAULT_PAGE_CHARS, page_text
+from services.session_manifest import (
+    FILE_KINDS, diff_entry, load_manifest, new_manifest, remove_entry, save_manifest, upsert_entry
+)
+from services.blob_store import blob_store, sanitize_filename, unique_filename
+from services.export import ndjson_lines
+from services.transcripts import parse_end_of_call_report, transcript_pipeline
+from services.query_cache import QUERY_GENERATION_TEMPLATE, focused_query_cache
+from services.profiling import stage
+from services.call_scheduler import call_payload, call_scheduler, place_call
 
 router = APIRouter(prefix="/weaviate", tags=["weaviate"])
 
@@ -19,98 +40,118 @@ router = APIRouter(prefix="/weaviate", tags=["weaviate"])
 class VAPIRequest(BaseModel):
     prompt: str
     phone_number: str = None
+    # Links the call's transcript back to the submission it was about
+    session_id: Optional[str] = None
+    # Queue the call with the scheduler instead of dialing within the request
+    schedule: bool = False
+
+class CallRequest(BaseModel):
+    prompt: str
+    phone_number: str
+    session_id: Optional[str] = None
+    # Unix time before which the call isn't dialed
+    not_before: Optional[float] = None
+
+class ScheduleCallsRequest(BaseModel):
+    calls: List[CallRequest]
+
+class BatchSearchQuery(BaseModel):
+    query: str
+    limit: int = 5
+    properties: Optional[str] = None
+    snippet_chars: int = DEFAULT_SNIPPET_CHARS
+    passages: int = DEFAULT_MAX_PASSAGES
+    # Scope the search to a session and/or property values (see /rag)
+    session_id: Optional[str] = None
+    filters: Optional[Dict] = None
+
+class BatchSearchRequest(BaseModel):
+    queries: List[BatchSearchQuery]
+    merge: bool = False
+
+# Per-query fields kept when a batch merges shared documents
+BATCH_HIT_FIELDS = ("id", "metadata", "passages", "content_length", "duplicate_ids")
 
-# Create uploads directory if it doesn't exist
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
+# Session uploads live here; the directory is created on first use
+UPLOAD_DIR = settings.upload_dir
 
-# Initialize Gemini client
+# Properties handed to the voice agent alongside the best passages
+VAPI_CONTEXT_PROPERTIES = ["session_id", "original_prompt", "pdf_files", "image_files"]
+
+# Search results are shared across workers through the local cache for a short time
+SEARCH_CACHE_TTL_SECONDS = settings.search_cache_ttl
+
+# Initialize Gemini client (the SDK is imported lazily to keep cold start fast)
 def get_gemini_client():
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
+    if not settings.gemini_api_key:
         raise ValueError("GEMINI_API_KEY not found in environment variables")
     
-    return genai.Client(api_key=api_key)
+    from google import genai
+    from google.genai import types
+    # Client-side timeout (milliseconds) matching the outbound policy, so blocking SDK calls
+    # abandoned by outbound.call's timeout don't keep their worker threads busy
+    return genai.Client(
+        api_key=settings.gemini_api_key,
+        http_options=types.HttpOptions(timeout=int(outbound.policies["gemini"].timeout * 1000))
+    )
 
-async def process_with_gemini(prompt: str, pdf_paths: List[str], image_paths: List[str]) -> str:
+async def search_backends(query: str, limit: int, properties: Optional[List[str]] = None,
+                          snippet_chars: Optional[int] = None, max_passages: int = 0,
+                          filters=None) -> List[dict]:
+    """
+    Run a search on the configured backend
+    SEARCH_BACKEND=local answers from the in-process index; otherwise Weaviate is
+    searched and the local index (when loaded) takes over if the cluster is unreachable.
+    Filtered searches (see WeaviateService.build_filters) always go to Weaviate.
+    Hits from the same duplicate group are collapsed, so a few extra are fetched.
+    """
+    options = {"properties": properties, "snippet_chars": snippet_chars, "max_passages": max_passages}
+    fetch_limit = limit * 2 if settings.dedup_enabled else limit
+    results = await run_search(query, fetch_limit, options, filters)
+    if settings.dedup_enabled:
+        results = duplicate_detector.collapse(results)
+    return results[:limit]
+
+async def run_search(query: str, limit: int, options: dict, filters=None) -> List[dict]:
+    if settings.search_backend == "local" and local_index.ready and filters is None:
+        # Embedding the query, sync() and the scan are blocking work, kept off the event loop
+        return await asyncio.to_thread(local_index.search_documents, query, limit, raise_errors=True, **options)
+    try:
+        if not weaviate_service.connect():
+            raise ConnectionError("Failed to connect to Weaviate")
+        # Searches are idempotent, so slow ones are hedged to trim tail latency
+        return await outbound.call(
+            "weaviate", weaviate_service.search_documents, query, limit, raise_errors=True, hedge=True,
+            filters=filters, **options
+        )
+    except Exception as e:
+        if not local_index.ready or filters is not None:
+            raise
+        print(f"⚠️  Weaviate search failed ({e}), answering from the local index")
+        outbound.record_fallback("weaviate")
+        return await asyncio.to_thread(local_index.search_documents, query, limit, raise_errors=True, **options)
+
+async def process_with_gemini(prompt: str, pdf_paths: List[str], image_paths: List[str],
+                              mode: Optional[str] = None) -> str:
     """
     Process the prompt, PDFs, and images using Gemini 2.0 Flash Lite
     Returns normalized text suitable for Weaviate storage
+    mode: "single" (one request) or "per_file" (concurrent per-file requests merged at the end)
     """
     try:
         print(f"      🔧 Initializing Gemini client...")
         client = get_gemini_client()
         
-        # Build the content array for Gemini
-        contents = [prompt]
-        print(f"      📝 Added prompt to contents ({len(prompt)} characters)")
-        
-        # Add PDF files (Note: Gemini may need PDFs to be converted to text first)
-        print(f"      📄 Processing {len(pdf_paths)} PDF files...")
-        for i, pdf_path in enumerate(pdf_paths):
-            print(f"        Adding PDF {i+1}: {Path(pdf_path).name}")
-            # For now, we'll add a note about the PDF
-            # In a real implementation, you might want to extract text from PDFs first
-            contents.append(f"[PDF file: {Path(pdf_path).name}]")
-        
-        # Add image files
-        print(f"      🖼️  Processing {len(image_paths)} image files...")
-        for i, image_path in enumerate(image_paths):
-            print(f"        Reading image {i+1}: {Path(image_path).name}")
-            with open(image_path, 'rb') as image_file:
-                image_data = image_file.read()
-            
-            # Determine MIME type based on file extension
-            if image_path.lower().endswith(('.jpg', '.jpeg')):
-                mime_type = "image/jpeg"
-            elif image_path.lower().endswith('.png'):
-                mime_type = "image/png"
-            else:
-                mime_type = "image/jpeg"  # default
-            
-            print(f"        ✅ Added image {i+1} ({len(image_data)} bytes, {mime_type})")
-            
-            # Create inline data part for the image
-            image_part = Part.from_bytes(
-                data=image_data,
-                mime_type=mime_type
-            )
-            contents.append(image_part)
-        
-        # Add instruction for normalization optimized for Weaviate
-        normalization_instruction = """
-        
-        Please analyze and normalize the above content (prompt, PDFs, and images) into a comprehensive, well-structured text format that is specifically optimized for Weaviate vector database storage and semantic search.
-        
-        The normalized text should be structured for Weaviate with these characteristics:
-        
-        1. **Semantic Richness**: Use descriptive, context-rich language that captures the full meaning and relationships between concepts
-        2. **Searchable Keywords**: Include relevant technical terms, business concepts, and domain-specific vocabulary
-        3. **Hierarchical Structure**: Organize information in a logical hierarchy with clear sections and subsections
-        4. **Entity Relationships**: Explicitly mention relationships between entities, concepts, and ideas
-        5. **Context Preservation**: Maintain the original context and intent while making it more discoverable
-        6. **Dense Information**: Pack maximum relevant information into coherent, searchable chunks
-        7. **Cross-References**: Include references and connections between different parts of the content
-        8. **Metadata Integration**: Embed implicit metadata and categorization within the text
+        print(f"      📝 Prompt: {len(prompt)} characters")
+        print(f"      📄 Processing {len(pdf_paths)} PDF files and 🖼️  {len(image_paths)} image files...")
         
-        Format the output as structured, searchable content that will work optimally with Weaviate's vector embeddings and semantic search capabilities. Focus on creating text that will be highly retrievable and contextually relevant when users search for related information.
+        # Count tokens per part, compress oversized inputs and fall back to
+        # map-reduce when the submission can't fit in the token budget
+        print(f"      🚀 Sending to Gemini ({GEMINI_MODEL})...")
+        normalized_text = await gemini_normalizer.normalize(client, prompt, pdf_paths, image_paths, mode)
         
-        Provide a comprehensive, Weaviate-optimized normalized summary of all the content.
-        """
-        
-        contents.append(normalization_instruction)
-        print(f"      📋 Added normalization instruction")
-        print(f"      📊 Total content parts: {len(contents)}")
-        
-        # Generate content using Gemini 2.0 Flash
-        print(f"      🚀 Sending to Gemini 2.0 Flash Thinking...")
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-thinking-exp",  # Using Gemini 2.0 Flash
-            contents=contents,
-        )
-        
-        print(f"      ✅ Received response from Gemini ({len(response.text)} characters)")
-        return response.text
+        print(f"      ✅ Received response from Gemini ({len(normalized_text)} characters)")
+        return normalized_text
         
     except Exception as e:
         print(f"      ❌ Gemini processing error: {str(e)}")
@@ -118,18 +159,30 @@ async def process_with_gemini(prompt: str, pdf_paths: List[str], image_paths: Li
         print(f"      📋 Traceback: {traceback.format_exc()}")
         raise Exception(f"Error processing with Gemini: {str(e)}")
 
-@router.post("/process-form")
+async def prepare_file_notes(prompt: str, pdf_paths: List[str], image_paths: List[str]):
+    """Background step after a single-request normalization: per-file notes for later incremental updates"""
+    try:
+        prepared = await gemini_normalizer.prepare_file_notes(get_gemini_client(), prompt, pdf_paths, image_paths)
+        print(f"📝 Prepared per-file notes for {prepared}/{len(pdf_paths) + len(image_paths)} files")
+    except Exception as e:
+        print(f"⚠️  Preparing per-file notes failed: {e}")
+
+@router.post("/process-form", dependencies=[Depends(admit("gemini", "weaviate", priority="bulk", cost=5))])
 async def process_form(
+    request: Request,
+    background_tasks: BackgroundTasks,
     prompt: str = Form(...),
     phone_number: str = Form(None),
     pdfs: List[UploadFile] = File(None),
-    images: List[UploadFile] = File(None)
+    images: List[UploadFile] = File(None),
+    normalization_mode: str = Form(None)
 ):
     """
     Process a form containing:
     - prompt: Text prompt
     - pdfs: List of PDF files (optional)
     - images: List of image files (optional)
+    - normalization_mode: "single" or "per_file" (optional)
     """
     
     print(f"\n🚀 ===== FORM PROCESSING STARTED =====")
@@ -139,10 +192,11 @@ async def process_form(
     print(f"   - PDFs received: {len(pdfs) if pdfs else 0}")
     print(f"   - Images received: {len(images) if images else 0}")
     
-    # Create a unique session directory for this request
+    # Create a unique session directory for this request (it only holds the manifest;
+    # file contents go to the content-addressed blob store)
     session_id = str(uuid.uuid4())
     session_dir = UPLOAD_DIR / session_id
-    session_dir.mkdir(exist_ok=True)
+    session_dir.mkdir(parents=True, exist_ok=True)
     print(f"🆔 Generated session ID: {session_id}")
     print(f"📁 Created session directory: {session_dir}")
     
@@ -153,50 +207,37 @@ async def process_form(
         "images": [],
         "session_id": session_id
     }
+    # Two uploads may share a name; each keeps its own file reference
+    taken_filenames = set()
     
     # Save PDF files
     print(f"\n📄 ===== PROCESSING PDF FILES =====")
     if pdfs:
-        pdf_dir = session_dir / "pdfs"
-        pdf_dir.mkdir(exist_ok=True)
-        print(f"📁 Created PDF directory: {pdf_dir}")
-        
         for i, pdf in enumerate(pdfs):
             if pdf.filename:
-                print(f"   Processing PDF {i+1}/{len(pdfs)}: {pdf.filename}")
-                file_path = pdf_dir / pdf.filename
-                async with aiofiles.open(file_path, 'wb') as f:
-                    content = await pdf.read()
-                    await f.write(content)
-                print(f"   ✅ Saved: {pdf.filename} ({len(content)} bytes)")
-                uploaded_files["pdfs"].append({
-                    "filename": pdf.filename,
-                    "size": len(content),
-                    "path": str(file_path)
-                })
+                filename = unique_filename(sanitize_filename(pdf.filename, default=f"document_{i+1}.pdf"), taken_filenames)
+                print(f"   Processing PDF {i+1}/{len(pdfs)}: {filename}")
+                # Streamed from the spooled upload to the blob store in chunks, never read whole
+                await pdf.seek(0)
+                with stage("store_uploads"):
+                    entry = await asyncio.to_thread(blob_store.store_upload, session_id, "pdfs", filename, pdf.file)
+                print(f"   ✅ Saved: {filename} ({entry['size']} bytes, blob {entry['sha256'][:12]})")
+                uploaded_files["pdfs"].append(entry)
     else:
         print("   No PDF files to process")
     
     # Save image files
     print(f"\n🖼️  ===== PROCESSING IMAGE FILES =====")
     if images:
-        image_dir = session_dir / "images"
-        image_dir.mkdir(exist_ok=True)
-        print(f"📁 Created image directory: {image_dir}")
-        
         for i, image in enumerate(images):
             if image.filename:
-                print(f"   Processing image {i+1}/{len(images)}: {image.filename}")
-                file_path = image_dir / image.filename
-                async with aiofiles.open(file_path, 'wb') as f:
-                    content = await image.read()
-                    await f.write(content)
-                print(f"   ✅ Saved: {image.filename} ({len(content)} bytes)")
-                uploaded_files["images"].append({
-                    "filename": image.filename,
-                    "size": len(content),
-                    "path": str(file_path)
-                })
+                filename = unique_filename(sanitize_filename(image.filename, default=f"image_{i+1}.jpg"), taken_filenames)
+                print(f"   Processing image {i+1}/{len(images)}: {filename}")
+                await image.seek(0)
+                with stage("store_uploads"):
+                    entry = await asyncio.to_thread(blob_store.store_upload, session_id, "images", filename, image.file)
+                print(f"   ✅ Saved: {filename} ({entry['size']} bytes, blob {entry['sha256'][:12]})")
+                uploaded_files["images"].append(entry)
     else:
         print("   No image files to process")
     
@@ -214,7 +255,8 @@ async def process_form(
             print(f"     - {image_path}")
         
         print(f"   🚀 Sending to Gemini AI...")
-        normalized_text = await process_with_gemini(prompt, pdf_paths, image_paths)
+        with stage("normalize"):
+            normalized_text = await process_with_gemini(prompt, pdf_paths, image_paths, normalization_mode)
         
         print(f"   ✅ Gemini processing completed!")
         print(f"   📊 Normalized text length: {len(normalized_text)} characters")
@@ -223,29 +265,39 @@ async def process_form(
         # Add the normalized text to the response
         uploaded_files["normalized_text"] = normalized_text
         
+        # Record the inputs so later updates only re-normalize what changed
+        owner = admission.owner(request)
+        manifest = new_manifest(session_id, prompt, phone_number, owner=owner)
+        manifest.update(pdfs=uploaded_files["pdfs"], images=uploaded_files["images"],
+                        normalization_mode=normalization_mode,
+                        normalized_sha256=hashlib.sha256(normalized_text.encode("utf-8")).hexdigest())
+        
         # Store in Weaviate
         print(f"\n💾 ===== WEAVIATE STORAGE =====")
         weaviate_stored = False
         try:
             # Connect to Weaviate
             print(f"   🔗 Connecting to Weaviate...")
-            if weaviate_service.connect():
+            if await asyncio.to_thread(weaviate_service.connect):
                 print(f"   ✅ Connected to Weaviate successfully")
                 print(f"   📊 Collection: {weaviate_service.collection_name}")
                 
-                # Create collection if it doesn't exist
+                # Verified once per process (normally during startup warm-up)
                 print(f"   🏗️  Ensuring collection exists...")
-                weaviate_service.create_collection()
+                await asyncio.to_thread(weaviate_service.ensure_collection)
                 
                 # Store the document
                 print(f"   💾 Storing document in Weaviate...")
-                weaviate_stored = weaviate_service.store_document(
-                    session_id=session_id,
-                    prompt=prompt,
-                    normalized_text=normalized_text,
-                    pdf_files=uploaded_files["pdfs"],
-                    image_files=uploaded_files["images"]
-                )
+                with stage("store_document"):
+                    weaviate_stored = await asyncio.to_thread(
+                        weaviate_service.store_document,
+                        session_id=session_id,
+                        prompt=prompt,
+                        normalized_text=normalized_text,
+                        pdf_files=uploaded_files["pdfs"],
+                        image_files=uploaded_files["images"],
+                        owner=owner
+                    )
                 
                 if weaviate_stored:
                     print(f"   ✅ Successfully stored in Weaviate!")
@@ -253,8 +305,6 @@ async def process_form(
                 else:
                     print(f"   ❌ Failed to store in Weaviate")
                 
-                weaviate_service.close()
-                print(f"   🔌 Disconnected from Weaviate")
             else:
                 print(f"   ❌ Failed to connect to Weaviate")
         except Exception as weaviate_error:
@@ -262,6 +312,15 @@ async def process_form(
             import traceback
             print(f"   📋 Traceback: {traceback.format_exc()}")
         
+        # A session that didn't reach Weaviate is redone by the next update even without changes
+        manifest["stale"] = not weaviate_stored
+        save_manifest(session_dir, manifest)
+        
+        # Updates re-normalize per file; without notes from this submission the first one would redo every file
+        mode = normalization_mode or gemini_normalizer.DEFAULT_NORMALIZATION_MODE
+        if mode != "per_file" and (pdf_paths or image_paths):
+            background_tasks.add_task(prepare_file_notes, prompt, pdf_paths, image_paths)
+        
         print(f"\n🎉 ===== FORM PROCESSING COMPLETED =====")
         print(f"   ✅ Session ID: {session_id}")
         print(f"   📁 Files processed: {len(uploaded_files['pdfs']) + len(uploaded_files['images'])}")
@@ -290,23 +349,414 @@ async def process_form(
             "status": "error"
         }
 
-@router.get("/search")
-async def search_documents(query: str, limit: int = 5):
+@router.put("/sessions/{session_id}", dependencies=[Depends(admit("gemini", "weaviate", priority="bulk", cost=2))])
+async def update_session(
+    session_id: str,
+    prompt: str = Form(None),
+    pdfs: List[UploadFile] = File(None),
+    images: List[UploadFile] = File(None),
+    remove_files: str = Form(None),
+    normalization_mode: str = Form("per_file")
+):
+    """
+    Update an existing session's inputs and re-normalize incrementally
+    - prompt: new prompt (optional, defaults to the stored one)
+    - pdfs / images: new or replacement files; files whose content is unchanged are ignored
+    - remove_files: comma-separated filenames to drop from the session
+    - normalization_mode: "per_file" (default) reuses the cached notes of unchanged files,
+      so only new or changed files are sent to Gemini before the merge
+    """
+    session_dir = UPLOAD_DIR / Path(session_id).name
+    if not session_dir.is_dir() or session_dir == blob_store.root:
+        return {"message": f"Session {session_id} not found", "status": "error"}
+    
+    manifest = load_manifest(session_dir)
+    if manifest is None or any((session_dir / kind).is_dir() for kind in FILE_KINDS):
+        # Sessions created before the blob store: move their files into it once
+        await asyncio.to_thread(blob_store.migrate_session, session_dir)
+        manifest = load_manifest(session_dir)
+    if not (prompt or manifest.get("prompt")):
+        return {"message": "prompt is required for sessions created without one", "status": "error"}
+    
+    changes = {"added": [], "changed": [], "unchanged": [], "removed": []}
+    for name in (remove_files or "").split(","):
+        name = name.strip()
+        entry = remove_entry(manifest, name) if name else None
+        if entry:
+            # The blob itself is garbage-collected once no session references it
+            for kind in FILE_KINDS:
+                blob_store.detach(session_id, kind, name)
+            changes["removed"].append(name)
+    
+    for kind, uploads in (("pdfs", pdfs), ("images", images)):
+        for upload in uploads or []:
+            if not upload.filename:
+                continue
+            filename = sanitize_filename(upload.filename)
+            # Storing is idempotent per hash, so the upload is streamed in first and diffed by its hash
+            await upload.seek(0)
+            entry = await asyncio.to_thread(blob_store.store_upload, session_id, kind, filename, upload.file)
+            status = diff_entry(manifest, kind, filename, entry["sha256"])
+            changes[status].append(filename)
+            if status != "unchanged":
+                upsert_entry(manifest, kind, entry)
+    
+    prompt_changed = bool(prompt) and prompt != manifest["prompt"]
+    if prompt_changed:
+        manifest["prompt"] = prompt
+    
+    if not (prompt_changed or changes["added"] or changes["changed"] or changes["removed"] or manifest.get("stale")):
+        return {
+            "message": "Session is already up to date",
+            "session_id": session_id,
+            "changes": changes,
+            "renormalized": False,
+            "status": "success"
+        }
+    
+    print(f"🔁 Updating session {session_id}: {len(changes['added'])} added, {len(changes['changed'])} changed, "
+          f"{len(changes['removed'])} removed, prompt changed: {prompt_changed}")
+    try:
+        # Cold blobs are compressed on disk; restore the ones this session needs
+        for entry in manifest["pdfs"] + manifest["images"]:
+            entry["path"] = str(await asyncio.to_thread(blob_store.ensure_local, entry["sha256"]))
+        pdf_paths = [entry["path"] for entry in manifest["pdfs"]]
+        image_paths = [entry["path"] for entry in manifest["images"]]
+        normalized_text = await process_with_gemini(manifest["prompt"], pdf_paths, image_paths, normalization_mode)
+        normalized_sha256 = hashlib.sha256(normalized_text.encode("utf-8")).hexdigest()
+        
+        # store_document upserts by session ID: identical text with a new prompt or file list only updates
+        # those properties, and nothing is written when neither changed
+        weaviate_stored = False
+        if await asyncio.to_thread(weaviate_service.connect):
+            await asyncio.to_thread(weaviate_service.ensure_collection)
+            weaviate_stored = await asyncio.to_thread(
+                weaviate_service.store_document,
+                session_id=session_id,
+                prompt=manifest["prompt"],
+                normalized_text=normalized_text,
+                pdf_files=manifest["pdfs"],
+                image_files=manifest["images"],
+                owner=manifest.get("owner"),
+                # An existing session always gets its own document, so the update is never dropped as a duplicate
+                link_duplicates=False
+            )
+        
+        if weaviate_stored:
+            manifest.update(normalization_mode=normalization_mode, normalized_sha256=normalized_sha256)
+        manifest["stale"] = not weaviate_stored
+        save_manifest(session_dir, manifest)
+        return {
+            "message": "Session updated successfully",
+            "session_id": session_id,
+            "changes": changes,
+            "renormalized": True,
+            "normalized_text": normalized_text,
+            "weaviate_stored": weaviate_stored,
+            "status": "success"
+        }
+    except Exception as e:
+        # The files on disk changed, so keep the manifest in step with them
+        manifest["stale"] = True
+        save_manifest(session_dir, manifest)
+        return {
+            "message": f"Error updating session: {str(e)}",
+            "session_id": session_id,
+            "changes": changes,
+            "status": "error"
+        }
+
+# VAPI sends several server messages per call from a few addresses, so each one is cheap
+@router.post("/vapi/webhook", dependencies=[Depends(admit(cost=0.2))])
+async def vapi_webhook(request: Request, x_vapi_secret: Optional[str] = Header(None)):
+    """
+    VAPI server messages: end-of-call reports are queued for transcript ingestion
+    The report is persisted and acknowledged immediately; normalization and the
+    Weaviate insert happen in the background worker, so VAPI never waits on Gemini.
+    """
+    if not settings.vapi_webhook_secret:
+        # Unauthenticated reports could inject transcripts and end scheduled calls, so the webhook needs a secret
+        return ORJSONResponse({"message": "Webhook disabled: VAPI_WEBHOOK_SECRET is not set", "status": "error"},
+                              status_code=503)
+    if not hmac.compare_digest(x_vapi_secret or "", settings.vapi_webhook_secret):
+        return ORJSONResponse({"message": "Invalid webhook secret", "status": "error"}, status_code=401)
+    try:
+        payload = await request.json()
+    except ValueError:
+        return ORJSONResponse({"message": "Invalid JSON payload", "status": "error"}, status_code=400)
+
+    report = parse_end_of_call_report(payload)
+    if report is None:
+        # Other message types (status updates, speech updates...) are acknowledged and ignored
+        return {"message": "Ignored", "status": "success"}
+    await asyncio.to_thread(transcript_pipeline.enqueue, report)
+    # Scheduled calls are finished (or queued for a retry on no-answer) without waiting for the poller
+    await asyncio.to_thread(call_scheduler.mark_ended, report["call_id"], report["ended_reason"])
+    return {"message": "Transcript queued", "call_id": report["call_id"], "status": "success"}
+
+@router.get("/transcripts", dependencies=[Depends(admit("weaviate"))])
+async def list_transcripts(session_id: Optional[str] = None, query: Optional[str] = None, limit: int = 5):
+    """
+    Consultation transcript summaries, most relevant to the query (or most recent first)
+    """
+    try:
+        if not weaviate_service.connect():
+            return {"message": "Failed to connect to Weaviate", "status": "error"}
+        transcripts = await asyncio.to_thread(
+            transcript_pipeline.search, weaviate_service.client, query, session_id, min(max(limit, 1), 50)
+        )
+        return {
+            "transcripts": transcripts,
+            "count": len(transcripts),
+            "pending": await asyncio.to_thread(transcript_pipeline.pending),
+            "status": "success"
+        }
+    except Exception as e:
+        return {"message": f"Error listing transcripts: {str(e)}", "status": "error"}
+
+@router.get("/gemini-usage")
+async def get_gemini_usage():
+    """
+    Per-request Gemini token usage and latency over the recent window
+    """
+    return {
+        "message": "Gemini usage retrieved successfully",
+        "usage": gemini_usage.summary(),
+        "status": "success"
+    }
+
+@router.get("/search", dependencies=[Depends(admit("weaviate"))])
+async def search_documents(
+    query: str,
+    limit: int = 5,
+    properties: str = None,
+    snippet_chars: int = DEFAULT_SNIPPET_CHARS,
+    passages: int = DEFAULT_MAX_PASSAGES
+):
     """
     Search for documents using semantic search
+    - properties: comma-separated properties to return (default excludes the full normalized_content)
+    - snippet_chars: length of a leading normalized_content snippet added to each hit (0 disables it)
+    - passages: number of top-scoring passages (with highlight offsets) added to each hit;
+      use /documents/{id}/passages to page through the full text
     """
     try:
-        if weaviate_service.connect():
-            results = weaviate_service.search_documents(query, limit)
-            weaviate_service.close()
-            
-            return {
+        projection = parse_properties(properties, SEARCH_PROPERTIES)
+        cache_key = search_cache_key(query, limit, projection, snippet_chars, passages)
+        results = local_cache.get("search", cache_key) if SEARCH_CACHE_TTL_SECONDS else None
+        if results is not None:
+            return ORJSONResponse({
                 "message": "Search completed successfully",
                 "query": query,
                 "results": results,
                 "count": len(results),
+                "cached": True,
                 "status": "success"
+            })
+        
+        results = await search_backends(
+            query, limit, properties=projection, snippet_chars=snippet_chars, max_passages=passages
+        )
+        if SEARCH_CACHE_TTL_SECONDS:
+            local_cache.set("search", cache_key, results, ttl=SEARCH_CACHE_TTL_SECONDS)
+        
+        # Results are already plain JSON types, so skip jsonable_encoder and serialize with orjson
+        return ORJSONResponse({
+            "message": "Search completed successfully",
+            "query": query,
+            "results": results,
+            "count": len(results),
+            "status": "success"
+        })
+    except Exception as e:
+        return {
+            "message": f"Error searching documents: {str(e)}",
+            "status": "error"
+        }
+
+def search_cache_key(query: str, limit: int, projection: List[str], snippet_chars: int, passages: int) -> str:
+    return f"{limit}:{snippet_chars}:{passages}:{','.join(projection)}:{query}"
+
+@router.post("/search/batch", dependencies=[Depends(admit("weaviate", cost=3))])
+async def search_documents_batch(request: BatchSearchRequest):
+    """
+    Run many searches in one request
+    Identical queries (same text, limit, projection and scope) run once; the rest run
+    concurrently (SEARCH_BATCH_CONCURRENCY) over the shared client, with every query
+    embedded in one batch when EMBEDDING_BACKEND=local. Unscoped queries share the
+    /search result cache. A failing query is reported in its own entry.
+    - merge: return each document once under "documents"; per-query hits keep only
+      id, metadata and query-specific passages
+    """
+    try:
+        if not request.queries:
+            raise ValueError("queries must not be empty")
+        if len(request.queries) > settings.search_batch_max_queries:
+            raise ValueError(f"at most {settings.search_batch_max_queries} queries per batch")
+
+        keys = []
+        distinct = {}
+        for item in request.queries:
+            projection = parse_properties(item.properties, SEARCH_PROPERTIES)
+            scope = json.dumps([item.session_id, item.filters], sort_keys=True) if item.session_id or item.filters else None
+            key = (search_cache_key(item.query, item.limit, projection, item.snippet_chars, item.passages), scope)
+            keys.append(key)
+            distinct.setdefault(key, (item, projection))
+
+        # One model pass for all query vectors instead of one per search
+        if use_local_embeddings():
+            await asyncio.to_thread(local_embedder.embed_queries, [item.query for item, _ in distinct.values()])
+
+        semaphore = asyncio.Semaphore(settings.search_batch_concurrency)
+
+        async def run_one(key, item: BatchSearchQuery, projection: List[str]):
+            cache_key, scope = key
+            if scope is None and SEARCH_CACHE_TTL_SECONDS:
+                results = local_cache.get("search", cache_key)
+                if results is not None:
+                    return results, True
+            filters = weaviate_service.build_filters(item.session_id, item.filters) if scope else None
+            async with semaphore:
+                results = await search_backends(
+                    item.query, item.limit, properties=projection, snippet_chars=item.snippet_chars,
+                    max_passages=item.passages, filters=filters
+                )
+            if scope is None and SEARCH_CACHE_TTL_SECONDS:
+                local_cache.set("search", cache_key, results, ttl=SEARCH_CACHE_TTL_SECONDS)
+            return results, False
+
+        outcomes = await asyncio.gather(
+            *(run_one(key, item, projection) for key, (item, projection) in distinct.items()),
+            return_exceptions=True
+        )
+        by_key = dict(zip(distinct, outcomes))
+
+        documents = {}
+        entries = []
+        for item, key in zip(request.queries, keys):
+            outcome = by_key[key]
+            if isinstance(outcome, Exception):
+                entries.append({"query": item.query, "message": f"Error searching documents: {outcome}", "status": "error"})
+                continue
+            results, cached = outcome
+            if request.merge:
+                hits = []
+                for result in results:
+                    hits.append({k: v for k, v in result.items() if k in BATCH_HIT_FIELDS})
+                    document = documents.setdefault(result["id"], {"id": result["id"], "properties": {}})
+                    document["properties"].update(result["properties"])
+                    if "snippet" in result:
+                        document["snippet"] = result["snippet"]
+                results = hits
+            entries.append({"query": item.query, "results": results, "count": len(results), "cached": cached, "status": "success"})
+
+        response = {
+            "message": "Batch search completed",
+            "results": entries,
+            "queries": len(request.queries),
+            "distinct_queries": len(distinct),
+            "status": "success"
+        }
+        if request.merge:
+            response["documents"] = documents
+        return ORJSONResponse(response)
+    except Exception as e:
+        return {
+            "message": f"Error running batch search: {str(e)}",
+            "status": "error"
+        }
+
+@router.get("/documents", dependencies=[Depends(admit("weaviate"))])
+async def list_documents(
+    after: str = None,
+    page_size: int = 100,
+    properties: str = None,
+    include_vector: bool = False
+):
+    """
+    Page through every stored document in ID order
+    - after: cursor returned as next_cursor by the previous page (omit for the first page)
+    - page_size: documents per page (max 1000)
+    - properties: comma-separated properties to return (default: all)
+    - include_vector: also return each document's vector
+    """
+    try:
+        if weaviate_service.connect():
+            page = await outbound.call(
+                "weaviate",
+                weaviate_service.fetch_page,
+                after,
+                max(1, min(page_size, 1000)),
+                parse_properties(properties),
+                include_vector
+            )
+            return ORJSONResponse({
+                "message": "Documents retrieved successfully",
+                "objects": page["objects"],
+                "count": len(page["objects"]),
+                "next_cursor": page["next_cursor"],
+                "status": "success"
+            })
+        else:
+            return {
+                "message": "Failed to connect to Weaviate",
+                "status": "error"
             }
+    except Exception as e:
+        return {
+            "message": f"Error listing documents: {str(e)}",
+            "status": "error"
+        }
+
+@router.get("/documents/export", dependencies=[Depends(admit("weaviate", priority="bulk"))])
+async def export_documents(
+    properties: str = None,
+    include_vector: bool = False,
+    page_size: int = 500,
+    after: str = None
+):
+    """
+    Stream every stored document as NDJSON (one object per line), page by page
+    For Parquet use the CLI: python -m services.export --format parquet
+    """
+    if not weaviate_service.connect():
+        return {
+            "message": "Failed to connect to Weaviate",
+            "status": "error"
+        }
+    records = weaviate_service.iterate_documents(
+        page_size=max(1, min(page_size, 1000)),
+        properties=parse_properties(properties),
+        include_vector=include_vector,
+        after=after
+    )
+    # A sync generator: Starlette pulls each page from Weaviate in a worker thread
+    return StreamingResponse(ndjson_lines(records), media_type="application/x-ndjson")
+
+@router.get("/documents/{document_id}/passages", dependencies=[Depends(admit("weaviate"))])
+async def get_document_passages(document_id: str, page: int = 1, page_size: int = DEFAULT_PAGE_CHARS, query: str = ""):
+    """
+    Page through a document's normalized_content on sentence boundaries
+    - page: 1-based page number
+    - page_size: approximate characters per page
+    - query: optional query whose terms are returned as highlight offsets
+    """
+    try:
+        if weaviate_service.connect():
+            document = await outbound.call("weaviate", weaviate_service.get_document_content, document_id)
+            if document is None:
+                return {
+                    "message": f"Document {document_id} not found",
+                    "status": "error"
+                }
+            
+            return ORJSONResponse({
+                "message": "Passages retrieved successfully",
+                "id": document["id"],
+                "session_id": document["session_id"],
+                **page_text(document["normalized_content"], page, query, page_size),
+                "status": "success"
+            })
         else:
             return {
                 "message": "Failed to connect to Weaviate",
@@ -314,24 +764,55 @@ async def search_documents(query: str, limit: int = 5):
             }
     except Exception as e:
         return {
-            "message": f"Error searching documents: {str(e)}",
+            "message": f"Error retrieving passages: {str(e)}",
             "status": "error"
         }
 
-@router.post("/rag")
-async def generate_rag_response(query: str, limit: int = 3):
+@router.post("/rag", dependencies=[Depends(admit("weaviate"))])
+async def generate_rag_response(
+    query: str,
+    limit: int = 3,
+    session_id: str = None,
+    filters: str = None,
+    single_prompt: str = None,
+    grouped: bool = True
+):
     """
     Generate a response using Retrieval Augmented Generation (RAG)
+    - limit: retrieved chunks that go into the generation prompt (capped by RAG_MAX_CONTEXT_CHUNKS)
+    - session_id: only retrieve from this session's documents
+    - filters: JSON object of property filters, e.g. {"pdf_files": ["deck.pdf"]}
+      (a list matches any of its values); applied inside Weaviate before the vector search
+    - single_prompt: per-chunk prompt, e.g. "Summarize {normalized_content}"
+    - grouped: also generate one answer over all retrieved chunks
     """
     try:
+        property_filters = json.loads(filters) if filters else None
+        if property_filters is not None and not isinstance(property_filters, dict):
+            raise ValueError("filters must be a JSON object")
+        context_chunks = max(1, min(limit, settings.rag_max_context_chunks))
+        
         if weaviate_service.connect():
-            response = weaviate_service.generate_response(query, limit)
-            weaviate_service.close()
+            start = time.perf_counter()
+            # Generation can outlast the search timeout, so it runs outside the retrying outbound layer
+            with stage("rag_generate"):
+                result = await asyncio.to_thread(
+                    weaviate_service.generate_response,
+                    query,
+                    context_chunks,
+                    session_id=session_id,
+                    filters=property_filters,
+                    single_prompt=single_prompt,
+                    grouped=grouped
+                )
             
             return {
                 "message": "RAG response generated successfully",
                 "query": query,
-                "response": response,
+                "response": result["response"],
+                "chunks": result["chunks"],
+                "context_chunks": len(result["chunks"]),
+                "latency_ms": round((time.perf_counter() - start) * 1000, 1),
                 "status": "success"
             }
         else:
@@ -345,7 +826,7 @@ async def generate_rag_response(query: str, limit: int = 3):
             "status": "error"
         }
 
-@router.post("/test-generate")
+@router.post("/test-generate", dependencies=[Depends(admit("weaviate"))])
 async def test_generate_near_text(
     query: str,
     limit: int = 3,
@@ -373,8 +854,6 @@ async def test_generate_near_text(
                 else:
                     response_text = "No response generated"
                 
-                weaviate_service.close()
-                
                 return {
                     "message": "Direct generate.near_text test completed successfully",
                     "query": query,
@@ -391,21 +870,20 @@ async def test_generate_near_text(
                 # Fallback to regular search
                 search_response = collection.query.near_text(
                     query=query,
-                    limit=limit
+                    limit=limit,
+                    return_properties=["normalized_content", "session_id", "original_prompt"]
                 )
                 
-                # Format the search results
+                # Format the search results (content is truncated once per object)
                 results = []
                 for obj in search_response.objects:
                     results.append({
                         "id": str(obj.uuid),
-                        "content": obj.properties.get("normalized_content", "")[:500] + "..." if len(obj.properties.get("normalized_content", "")) > 500 else obj.properties.get("normalized_content", ""),
+                        "content": truncate(obj.properties.get("normalized_content") or "", 500),
                         "session_id": obj.properties.get("session_id", ""),
                         "original_prompt": obj.properties.get("original_prompt", "")
                     })
                 
-                weaviate_service.close()
-                
                 return {
                     "message": "Generate failed, returning search results instead",
                     "query": query,
@@ -428,7 +906,7 @@ async def test_generate_near_text(
             "status": "error"
         }
 
-@router.post("/test-cohere-direct")
+@router.post("/test-cohere-direct", dependencies=[Depends(admit("weaviate"))])
 async def test_cohere_direct():
     """
     Test Cohere API key directly through Weaviate
@@ -446,7 +924,6 @@ async def test_cohere_direct():
                 )
                 
                 generated_text = response.generated
-                weaviate_service.close()
                 
                 return {
                     "message": "Cohere direct test successful",
@@ -454,7 +931,6 @@ async def test_cohere_direct():
                     "status": "success"
                 }
             except Exception as gen_error:
-                weaviate_service.close()
                 return {
                     "message": "Cohere direct test failed",
                     "error": str(gen_error),
@@ -471,7 +947,7 @@ async def test_cohere_direct():
             "status": "error"
         }
 
-@router.post("/query-agent")
+@router.post("/query-agent", dependencies=[Depends(admit("weaviate"))])
 async def query_with_agent(query: str):
     """
     Use Weaviate Query Agent with Gemini to answer natural language queries
@@ -479,7 +955,6 @@ async def query_with_agent(query: str):
     try:
         if weaviate_service.connect():
             response = weaviate_service.query_with_agent(query)
-            weaviate_service.close()
             
             return {
                 "message": "Query Agent response generated successfully",
@@ -498,7 +973,7 @@ async def query_with_agent(query: str):
             "status": "error"
         }
 
-@router.post("/weaviate-query-generator")
+@router.post("/weaviate-query-generator", dependencies=[Depends(admit("gemini", "weaviate", "vapi"))])
 async def generate_weaviate_query_for_vapi(request: VAPIRequest):
     """
     Generate a focused Weaviate query from consultation prompt for VAPI context and make a VAPI call
@@ -508,71 +983,32 @@ async def generate_weaviate_query_for_vapi(request: VAPIRequest):
         print(f"📝 Original prompt: {request.prompt[:200]}...")
         print(f"📞 Phone number: {request.phone_number}")
 
-        # Step 1: Generate focused query using Gemini
-        print(f"\n🤖 ===== GENERATING FOCUSED QUERY =====")
-        focused_query = await generate_focused_query_for_weaviate(request.prompt)
-        print(f"🎯 Generated focused query: {focused_query}")
-
-        # Step 2: Use the focused query to search Weaviate and extract raw data
-        print(f"\n🔍 ===== SEARCHING WEAVIATE WITH FOCUSED QUERY =====")
-        extracted_data = []
-        if weaviate_service.connect():
-            collection = weaviate_service.client.collections.get("NormalizedDocuments")
-            print(f"      🔍 Performing semantic search with focused query...")
-            search_results = collection.query.near_text(
-                query=focused_query,
-                limit=5,
-                return_metadata=["distance", "score"]
+        if request.schedule:
+            if not request.phone_number:
+                return ORJSONResponse({"message": "phone_number is required to schedule a call", "status": "error"}, status_code=400)
+            # Queued: the scheduler prepares the context and dials within the concurrency and pacing limits
+            job_id = await asyncio.to_thread(
+                call_scheduler.enqueue, request.phone_number, request.prompt, request.session_id
             )
-            weaviate_service.close()
-            for result in search_results.objects:
-                # Convert UUID to string and ensure all data is JSON serializable
-                # Also convert any UUIDs in properties to strings
-                properties = {}
-                for key, value in result.properties.items():
-                    if hasattr(value, '__str__'):
-                        properties[key] = str(value)
-                    else:
-                        properties[key] = value
-                
-                data_object = {
-                    "id": str(result.uuid),
-                    "properties": properties,
-                    "metadata": {
-                        "distance": float(result.metadata.distance) if result.metadata.distance else None,
-                        "score": float(result.metadata.score) if result.metadata.score else None
-                    }
-                }
-                extracted_data.append(data_object)
-            print(f"✅ Retrieved {len(extracted_data)} data objects from Weaviate")
-        else:
-            return {"message": "Failed to connect to Weaviate", "status": "error"}
+            return ORJSONResponse({
+                "message": "Call queued",
+                "call_job_id": job_id,
+                "phone_number": request.phone_number,
+                "status": "success"
+            }, status_code=202)
+
+        context = await prepare_call_context(request.prompt, request.session_id)
+        focused_query = context["focused_query"]
+        extracted_data = context["extracted_data"]
+        prior_calls = context["prior_calls"]
 
         # Step 3: Make VAPI call using the proper VAPI API structure
-        vapi_api_key = os.getenv("VAPI_API_KEY", "YOUR_VAPI_API_KEY")
-        vapi_assistant_id = os.getenv("VAPI_ASSISTANT_ID", "your-assistant-id")
-        vapi_phone_number_id = os.getenv("VAPI_PHONE_NUMBER_ID", "your-phone-number-id")
-        
-        # VAPI call endpoint - this initiates a call
-        vapi_url = "https://api.vapi.ai/call"
-        vapi_payload = {
-            "assistantId": vapi_assistant_id,
-            "phoneNumberId": vapi_phone_number_id,
-            "customer": {
-                "number": request.phone_number
-            }
-        }
-        vapi_headers = {
-            "Authorization": f"Bearer {vapi_api_key}",
-            "Content-Type": "application/json"
-        }
-        import requests
         vapi_response = None
         try:
             print(f"\n📞 ===== MAKING VAPI CALL =====")
             print(f"📞 Calling: {request.phone_number}")
-            print(f"🤖 Assistant ID: {vapi_assistant_id}")
-            vapi_response = requests.post(vapi_url, json=vapi_payload, headers=vapi_headers)
+            print(f"🤖 Assistant ID: {settings.vapi_assistant_id}")
+            vapi_response = await place_call(call_payload(request.phone_number, request.session_id, focused_query, context))
             print(f"VAPI response status: {vapi_response.status_code}")
             vapi_response_json = vapi_response.json() if vapi_response.content else {}
             print(f"VAPI response: {vapi_response_json}")
@@ -580,16 +1016,17 @@ async def generate_weaviate_query_for_vapi(request: VAPIRequest):
             print(f"❌ Error making VAPI call: {vapi_error}")
             vapi_response_json = {"error": str(vapi_error)}
 
-        return {
+        return ORJSONResponse({
             "message": "VAPI data extracted and call made successfully",
             "original_prompt": request.prompt,
             "focused_query": focused_query,
             "extracted_data": extracted_data,
             "data_count": len(extracted_data),
+            "prior_calls": prior_calls,
             "phone_number": request.phone_number,
             "vapi_response": vapi_response_json,
             "status": "success"
-        }
+        })
     except Exception as e:
         print(f"❌ Error in Weaviate Query Generator: {str(e)}")
         import traceback
@@ -599,49 +1036,96 @@ async def generate_weaviate_query_for_vapi(request: VAPIRequest):
             "status": "error"
         }
 
-async def generate_focused_query_for_weaviate(original_prompt: str) -> str:
+@router.post("/calls", dependencies=[Depends(admit(priority="bulk", cost=2))])
+async def schedule_calls(request: ScheduleCallsRequest):
     """
-    Use Gemini to generate a focused query for Weaviate based on the original consultation prompt
+    Queue outbound consultation calls; the scheduler prepares each call's Weaviate
+    context ahead of time and dials under the concurrency and per-number pacing limits
     """
+    if not request.calls:
+        return ORJSONResponse({"message": "No calls given", "status": "error"}, status_code=400)
     try:
-        print(f"      🔧 Initializing Gemini client for query generation...")
-        client = get_gemini_client()
-        
-        # Create a prompt to generate a focused Weaviate query
-        query_generation_prompt = f"""
-        You are a query generation expert for a Weaviate vector database. Your task is to create a focused, specific query that will retrieve only the most relevant information from the database for a voice AI (VAPI) consultation.
-
-        Original consultation prompt: "{original_prompt}"
-
-        Based on this consultation prompt, generate a single, focused query that will:
-        1. Retrieve only the most relevant context for the specific business challenge
-        2. Focus on actionable insights and strategies
-        3. Provide context that would be useful for a voice AI consultation
-        4. Avoid generic information and focus on specific, actionable advice
-
-        The query should be:
-        - Specific to the business challenge mentioned
-        - Focused on practical strategies and insights
-        - Suitable for a voice AI to provide personalized advice
-        - Concise but comprehensive
-
-        Generate only the query text, nothing else.
-        """
-        
-        print(f"      📝 Sending query generation prompt to Gemini...")
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-thinking-exp",
-            contents=[query_generation_prompt],
-        )
-        
-        focused_query = response.text.strip()
-        print(f"      ✅ Generated focused query: {focused_query}")
-        
-        return focused_query
-        
+        job_ids = await asyncio.to_thread(call_scheduler.enqueue_many, [call.model_dump() for call in request.calls])
+        return ORJSONResponse({
+            "message": f"{len(job_ids)} call(s) queued",
+            "call_job_ids": job_ids,
+            "status": "success"
+        }, status_code=202)
     except Exception as e:
-        print(f"      ❌ Error generating focused query: {str(e)}")
-        # Fallback to a simple query based on the original prompt
-        fallback_query = f"Provide specific strategies and insights for: {original_prompt[:100]}"
-        print(f"      🔄 Using fallback query: {fallback_query}")
-        return fallback_query
+        return {"message": f"Error queueing calls: {str(e)}", "status": "error"}
+
+@router.get("/calls", dependencies=[Depends(admit())])
+async def list_calls(status: Optional[str] = None, limit: int = 50):
+    """
+    Scheduled calls, newest first, optionally filtered by status
+    """
+    calls = await asyncio.to_thread(call_scheduler.list, status, min(max(limit, 1), 500))
+    return {"calls": calls, "count": len(calls), "status": "success"}
+
+@router.get("/calls/{job_id}", dependencies=[Depends(admit())])
+async def get_call(job_id: str):
+    call = await asyncio.to_thread(call_scheduler.get, job_id)
+    if call is None:
+        return ORJSONResponse({"message": "Call not found", "status": "error"}, status_code=404)
+    return {"call": call, "status": "success"}
+
+@router.delete("/calls/{job_id}", dependencies=[Depends(admit())])
+async def cancel_call(job_id: str):
+    """
+    Cancel a scheduled call that hasn't been dialed yet
+    """
+    if not await asyncio.to_thread(call_scheduler.cancel, job_id):
+        return ORJSONResponse({"message": "Call not found or already dialed", "status": "error"}, status_code=409)
+    return {"message": "Call cancelled", "job_id": job_id, "status": "success"}
+
+async def prepare_call_context(prompt: str, session_id: Optional[str] = None) -> Dict:
+    """
+    Everything a consultation call needs from Weaviate: the focused query, the
+    passages the voice agent will speak from and summaries of earlier calls
+    """
+    # Step 1: Generate focused query using Gemini
+    print(f"\n🤖 ===== GENERATING FOCUSED QUERY =====")
+    with stage("focused_query"):
+        focused_query = await generate_focused_query_for_weaviate(prompt)
+    print(f"🎯 Generated focused query: {focused_query}")
+
+    # Step 2: Use the focused query to search Weaviate and extract raw data
+    print(f"\n🔍 ===== SEARCHING WEAVIATE WITH FOCUSED QUERY =====")
+    print(f"      🔍 Performing semantic search with focused query...")
+    # Only the passages the voice agent will actually speak from, not the whole document
+    extracted_data = await search_backends(
+        focused_query, 5, properties=VAPI_CONTEXT_PROPERTIES, max_passages=3
+    )
+    print(f"✅ Retrieved {len(extracted_data)} data objects from Weaviate")
+
+    # Summaries of earlier consultations for the same session, so the agent can follow up on them
+    prior_calls = []
+    if session_id and weaviate_service.connect():
+        try:
+            prior_calls = await asyncio.to_thread(
+                transcript_pipeline.search, weaviate_service.client, focused_query, session_id, 3
+            )
+        except Exception as e:
+            print(f"⚠️  Could not load prior consultation transcripts: {e}")
+
+    return {"focused_query": focused_query, "extracted_data": extracted_data, "prior_calls": prior_calls}
+
+async def generate_focused_query_for_weaviate(original_prompt: str) -> str:
+    """
+    Focused Weaviate query for a consultation prompt: served from the focused-query
+    cache (exact or similar prompt), generated by Gemini within the latency budget,
+    or built locally from the prompt's keywords when Gemini is slow or failing
+    """
+    focused_query, source = await focused_query_cache.resolve(original_prompt, gemini_focused_query)
+    print(f"      ✅ Focused query ({source}): {focused_query}")
+    return focused_query
+
+async def gemini_focused_query(original_prompt: str) -> str:
+    """
+    Use Gemini to generate a focused query for Weaviate based on the original consultation prompt
+    """
+    client = get_gemini_client()
+    print(f"      📝 Sending query generation prompt to Gemini...")
+    return await gemini_normalizer.generate_content(
+        client, [QUERY_GENERATION_TEMPLATE.format(prompt=original_prompt)], "focused_query"
+    )
@@ -0,0 +1,201 @@
+"""
+Admission control: per-client token buckets and per-dependency concurrency caps
+
+Requests over a client's rate or beyond a dependency's queue are shed with a
+fast 429 and a Retry-After header instead of piling up on Gemini and VAPI.
+Interactive requests are admitted ahead of bulk ingestion when slots free up.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import hmac
+import itertools
+import math
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from fastapi import HTTPException, Request
+
+from config import settings
+
+# Lower value = served first
+PRIORITIES = {"interactive": 0, "bulk": 1}
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, burst: float):
+        self.rate = rate_per_second
+        self.capacity = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Take tokens and return 0, or return the seconds to wait until enough are available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class PriorityGate:
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: str = "interactive"):
+        """Take a slot, waiting in priority order; raises Overloaded when the queue is full or too slow"""
+        if self.in_flight < self.limit and self.queue_depth == 0:
+            self.in_flight += 1
+            return
+        if self.queue_depth >= self.max_queue:
+            raise Overloaded(f"{self.name} queue full", self.max_wait)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES.get(priority, 1), next(self._sequence), future))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the wait expired
+                return
+            future.cancel()
+            raise Overloaded(f"{self.name} queue wait exceeded", self.max_wait)
+        except BaseException:
+            # Cancelled while queued (client went away): pass on a slot handed over meanwhile,
+            # otherwise mark the entry done so release() skips it
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+            raise
+
+    def release(self):
+        """Hand the slot to the highest-priority waiter still waiting (cancelled ones are skipped), or free it"""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.in_flight = max(self.in_flight - 1, 0)
+
+
+class AdmissionController:
+    def __init__(self):
+        self.rate_per_second = settings.rate_limit_per_minute / 60.0
+        self.burst = settings.rate_limit_burst
+        self.max_clients = settings.rate_limit_max_clients
+        max_queue = settings.admission_max_queue
+        max_wait = settings.admission_max_wait
+        self.gates: Dict[str, PriorityGate] = {
+            "gemini": PriorityGate("gemini", settings.gemini_concurrency, max_queue, max_wait),
+            "weaviate": PriorityGate("weaviate", settings.weaviate_concurrency, max_queue, max_wait),
+            "vapi": PriorityGate("vapi", settings.vapi_concurrency, max_queue, max_wait),
+        }
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.shed: Dict[str, int] = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+        self.admitted = 0
+
+    def client_key(self, request: Request) -> str:
+        """
+        Identify the caller by API key when it is one of ADMISSION_API_KEYS, otherwise by client IP
+        (an unchecked header would let a client mint a fresh bucket per request)
+        """
+        api_key = request.headers.get("x-api-key")
+        if api_key and any(hmac.compare_digest(api_key, known) for known in settings.admission_api_keys):
+            return f"key:{api_key}"
+        return f"ip:{request.client.host if request.client else 'unknown'}"
+
+    def owner(self, request: Request) -> str:
+        """Opaque id of the caller for scoping stored data (the client key itself may hold an API key)"""
+        return hashlib.sha256(self.client_key(request).encode("utf-8")).hexdigest()[:16]
+
+    def check_rate(self, client_key: str, cost: float = 1.0) -> float:
+        """Charge the client's bucket; returns seconds to wait, 0 when admitted"""
+        bucket = self.buckets.get(client_key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate_per_second, self.burst)
+            self.buckets[client_key] = bucket
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(client_key)
+        return bucket.take(cost)
+
+    def metrics(self) -> Dict:
+        return {
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "tracked_clients": len(self.buckets),
+            "gates": {
+                name: {"in_flight": gate.in_flight, "limit": gate.limit, "queue_depth": gate.queue_depth}
+                for name, gate in self.gates.items()
+            },
+        }
+
+
+def too_many_requests(reason: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=f"Too many requests: {reason}",
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def admit(*dependencies: str, priority: str = "interactive", cost: float = 1.0):
+    """
+    FastAPI dependency that rate-limits the caller and holds a slot on each downstream dependency
+    for the duration of the request.
+    """
+    async def dependency(request: Request):
+        wait = admission.check_rate(admission.client_key(request), cost)
+        if wait > 0:
+            admission.shed["rate_limited"] += 1
+            raise too_many_requests("rate limit exceeded", wait)
+
+        acquired = []
+        try:
+            for name in dependencies:
+                gate = admission.gates[name]
+                await gate.acquire(priority)
+                acquired.append(gate)
+        except BaseException as e:
+            # Overloaded or cancelled part-way: give back the slots already taken
+            for gate in acquired:
+                gate.release()
+            if not isinstance(e, Overloaded):
+                raise
+            admission.shed["queue_full" if "full" in e.reason else "queue_timeout"] += 1
+            raise too_many_requests(e.reason, e.retry_after)
+
+        admission.admitted += 1
+        try:
+            yield
+        finally:
+            for gate in acquired:
+                gate.release()
+
+    return dependency
+
+# Global instance
+admission = AdmissionController()
@@ -0,0 +1,400 @@
+"""
+Content-addressed blob store for uploaded files
+
+Uploads are stored once per content hash under uploads/blobs/<ab>/<cd>/<sha256><ext>
+no matter how many sessions submit them, and never under a client-supplied
+path. Sessions reference blobs through their manifest (services/session_manifest.py)
+and a reference table in SQLite, which also drives lifecycle maintenance:
+- sessions older than the retention TTL are released
+- blobs with no remaining references are garbage-collected
+- blobs not read for a while are gzip-compressed and restored on next access
+
+Every worker process runs the maintenance loop; a lock file lets one pass run at a
+time, and the per-blob steps are IMMEDIATE transactions that re-check the row, so
+a blob put() has just found is never collected or compressed underneath it.
+
+Usage:
+    python -m services.blob_store stats|gc|migrate
+"""
+
+import asyncio
+import contextlib
+import gzip
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional
+
+from config import settings
+from services.file_views import remember_hash, stream_to_file
+from services.session_manifest import FILE_KINDS, file_entry, load_manifest, new_manifest, save_manifest
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+SAFE_FILENAME = re.compile(r"[^A-Za-z0-9._ -]")
+MAX_FILENAME_LENGTH = 120
+# Cold blobs are kept compressed only when that saves at least this fraction
+MIN_COMPRESSION_SAVING = 0.1
+
+
+def sanitize_filename(filename: Optional[str], default: str = "upload") -> str:
+    """Reduce a client-supplied filename to a safe basename (no directories, no control characters)"""
+    name = Path((filename or "").replace("\\", "/")).name
+    name = SAFE_FILENAME.sub("_", name).strip(" .")
+    if not name:
+        return default
+    stem, suffix = os.path.splitext(name)
+    return stem[:MAX_FILENAME_LENGTH - len(suffix)] + suffix
+
+
+def unique_filename(filename: str, taken: set) -> str:
+    """
+    Number a filename already used in the session ("deck.pdf" -> "deck_2.pdf") and record it as taken;
+    file references are keyed by name, so two files sharing one would leave the first unreferenced
+    """
+    stem, suffix = os.path.splitext(filename)
+    candidate, n = filename, 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{stem}_{n}{suffix}"
+    taken.add(candidate)
+    return candidate
+
+
+class BlobStore:
+    def __init__(self, root: Optional[str] = None, db_path: Optional[str] = None):
+        self.root = Path(root or settings.blob_dir or settings.upload_dir / "blobs")
+        self.db_path = Path(db_path or settings.blob_db_path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database lazily and create the schema on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    sha256 TEXT PRIMARY KEY,
+                    suffix TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    stored_size INTEGER NOT NULL,
+                    compressed INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS blob_refs (
+                    session_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (session_id, kind, filename)
+                );
+                CREATE INDEX IF NOT EXISTS blob_refs_sha ON blob_refs (sha256);
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """IMMEDIATE transaction: takes the database write lock up front, so other processes wait their turn"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    @contextlib.contextmanager
+    def _maintenance_lock(self):
+        """Non-blocking lock on .maintenance.lock; yields False when another worker is already maintaining"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self.root / ".maintenance.lock", "a") as lock_file:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def blob_path(self, sha256: str, suffix: str = "") -> Path:
+        """Sharded by hash prefix so no directory grows past a few hundred entries"""
+        return self.root / sha256[:2] / sha256[2:4] / f"{sha256}{suffix}"
+
+    def put(self, source: BinaryIO, filename: str) -> Dict:
+        """
+        Stream a file into the store once per hash and return its blob entry (sha256, suffix, path, size)
+        The content is hashed while it is written to a temporary file, so it is never held in memory
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.root / f".upload.{os.getpid()}.{threading.get_ident()}.tmp"
+        sha256, size = stream_to_file(source, str(tmp_path))
+        suffix = Path(filename).suffix.lower()
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT suffix FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            if row is not None:
+                # Recently accessed blobs are left alone by GC until the caller has attached its reference
+                conn.execute("UPDATE blobs SET last_access = ? WHERE sha256 = ?", (now, sha256))
+            else:
+                path = self.blob_path(sha256, suffix)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(tmp_path, path)
+                conn.execute(
+                    "INSERT INTO blobs (sha256, suffix, size, stored_size, compressed, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, 0, ?, ?)",
+                    (sha256, suffix, size, size, now, now),
+                )
+        if row is not None:
+            tmp_path.unlink(missing_ok=True)
+            suffix = row[0]
+            path = self.ensure_local(sha256)
+        remember_hash(str(path), sha256)
+        return {"sha256": sha256, "suffix": suffix, "path": str(path), "size": size}
+
+    def ensure_local(self, sha256: str) -> Path:
+        """Path of the uncompressed blob, restoring it first if it was compressed as cold"""
+        with self._transaction() as conn:
+            # Touched first, so a compression pass that selected this blob as cold no longer applies
+            conn.execute("UPDATE blobs SET last_access = ? WHERE sha256 = ?", (time.time(), sha256))
+            row = conn.execute("SELECT suffix, compressed FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"Unknown blob {sha256}")
+        suffix, compressed = row
+        path = self.blob_path(sha256, suffix)
+        if compressed:
+            packed = path.with_name(path.name + ".gz")
+            tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            try:
+                with gzip.open(packed, "rb") as src, open(tmp_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp_path, path)
+                packed.unlink(missing_ok=True)
+            except FileNotFoundError:
+                # Another worker restored it first
+                tmp_path.unlink(missing_ok=True)
+        with self._lock:
+            self._connection().execute(
+                "UPDATE blobs SET compressed = 0, stored_size = size, last_access = ? WHERE sha256 = ?",
+                (time.time(), sha256),
+            )
+            self._connection().commit()
+        return path
+
+    def attach(self, session_id: str, kind: str, filename: str, sha256: str):
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO blob_refs (session_id, kind, filename, sha256, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, kind, filename, sha256, time.time()),
+            )
+            self._connection().commit()
+
+    def detach(self, session_id: str, kind: Optional[str] = None, filename: Optional[str] = None):
+        """Drop one file reference, or every reference of a session when no filename is given"""
+        query, params = "DELETE FROM blob_refs WHERE session_id = ?", [session_id]
+        if kind and filename:
+            query += " AND kind = ? AND filename = ?"
+            params += [kind, filename]
+        with self._lock:
+            self._connection().execute(query, params)
+            self._connection().commit()
+
+    def store_upload(self, session_id: str, kind: str, filename: str, source: BinaryIO) -> Dict:
+        """Store an uploaded file (any binary stream) for a session and return its manifest entry"""
+        blob = self.put(source, filename)
+        self.attach(session_id, kind, filename, blob["sha256"])
+        return file_entry(filename, blob["path"], blob["size"], blob["sha256"])
+
+    def session_dirs(self) -> List[Path]:
+        upload_root = Path(settings.upload_dir)
+        if not upload_root.is_dir():
+            return []
+        return [path for path in upload_root.iterdir() if path.is_dir() and path != self.root]
+
+    def migrate_session(self, session_dir: Path) -> int:
+        """Move a pre-blob-store session's files into the store and give it a manifest"""
+        moved = 0
+        manifest = load_manifest(session_dir) or new_manifest(session_dir.name, "")
+        # Distinct names can sanitize to the same one
+        taken = set()
+        for kind in FILE_KINDS:
+            kind_dir = session_dir / kind
+            if not kind_dir.is_dir():
+                continue
+            entries = []
+            for path in sorted(kind_dir.iterdir()):
+                if path.is_file():
+                    filename = unique_filename(sanitize_filename(path.name), taken)
+                    with open(path, "rb") as source:
+                        entries.append(self.store_upload(session_dir.name, kind, filename, source))
+                    path.unlink()
+                    moved += 1
+            if entries:
+                manifest[kind] = entries
+            shutil.rmtree(kind_dir, ignore_errors=True)
+        save_manifest(session_dir, manifest)
+        return moved
+
+    def expire_sessions(self, retention_days: Optional[float] = None) -> int:
+        """Release sessions whose manifest hasn't been updated within the retention period"""
+        retention = (retention_days if retention_days is not None else settings.upload_retention_days) * 86400
+        if retention <= 0:
+            return 0
+        cutoff = time.time() - retention
+        expired = 0
+        for session_dir in self.session_dirs():
+            manifest = load_manifest(session_dir)
+            updated_at = manifest.get("updated_at", 0) if manifest else session_dir.stat().st_mtime
+            if updated_at < cutoff:
+                self.detach(session_dir.name)
+                shutil.rmtree(session_dir, ignore_errors=True)
+                expired += 1
+        return expired
+
+    def collect_garbage(self, grace_seconds: float = 3600) -> Dict:
+        """Delete blobs no session references (after a grace period for in-flight uploads)"""
+        cutoff = time.time() - grace_seconds
+        unreferenced = """
+            b.created_at < ? AND b.last_access < ?
+            AND NOT EXISTS (SELECT 1 FROM blob_refs r WHERE r.sha256 = b.sha256)
+        """
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT b.sha256, b.suffix, b.stored_size FROM blobs b WHERE {unreferenced}", (cutoff, cutoff)
+            ).fetchall()
+        deleted, freed = 0, 0
+        for sha256, suffix, stored_size in rows:
+            with self._transaction() as conn:
+                # Re-checked under the write lock: put() may have found the blob or attached it since the scan
+                if conn.execute(
+                    f"DELETE FROM blobs AS b WHERE b.sha256 = ? AND {unreferenced}", (sha256, cutoff, cutoff)
+                ).rowcount == 0:
+                    continue
+                path = self.blob_path(sha256, suffix)
+                path.unlink(missing_ok=True)
+                path.with_name(path.name + ".gz").unlink(missing_ok=True)
+            deleted += 1
+            freed += stored_size
+        return {"blobs_deleted": deleted, "bytes_freed": freed}
+
+    def compress_cold(self, cold_days: Optional[float] = None) -> Dict:
+        """gzip blobs that haven't been read recently, when compression actually saves space"""
+        cutoff = time.time() - (cold_days if cold_days is not None else settings.blob_cold_after_days) * 86400
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT sha256, suffix, size FROM blobs WHERE compressed = 0 AND last_access < ?", (cutoff,)
+            ).fetchall()
+        compressed, saved = 0, 0
+        for sha256, suffix, size in rows:
+            path = self.blob_path(sha256, suffix)
+            packed = path.with_name(path.name + ".gz")
+            tmp_path = path.with_name(f".{packed.name}.{os.getpid()}.tmp")
+            try:
+                with open(path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst)
+            except FileNotFoundError:
+                tmp_path.unlink(missing_ok=True)
+                continue
+            packed_size = tmp_path.stat().st_size
+            if packed_size > size * (1 - MIN_COMPRESSION_SAVING):
+                # Already-compressed formats (most images) aren't worth it; touch so they aren't retried every pass
+                tmp_path.unlink(missing_ok=True)
+                with self._lock:
+                    self._connection().execute("UPDATE blobs SET last_access = ? WHERE sha256 = ?", (time.time(), sha256))
+                    self._connection().commit()
+                continue
+            with self._transaction() as conn:
+                # Skipped when the blob was read (or collected) since the scan
+                if conn.execute(
+                    "UPDATE blobs SET compressed = 1, stored_size = ? WHERE sha256 = ? AND compressed = 0 AND last_access < ?",
+                    (packed_size, sha256, cutoff),
+                ).rowcount == 0:
+                    tmp_path.unlink(missing_ok=True)
+                    continue
+                os.replace(tmp_path, packed)
+                path.unlink(missing_ok=True)
+            compressed += 1
+            saved += size - packed_size
+        return {"blobs_compressed": compressed, "bytes_saved": saved}
+
+    def maintain(self) -> Dict:
+        """One lifecycle pass: retention, garbage collection, cold compression (skipped while another worker runs one)"""
+        with self._maintenance_lock() as acquired:
+            if not acquired:
+                return {"skipped": "maintenance already running in another worker"}
+            result = {"sessions_expired": self.expire_sessions()}
+            result.update(self.collect_garbage())
+            result.update(self.compress_cold())
+            return result
+
+    async def maintenance_loop(self, interval: Optional[float] = None):
+        """Run the lifecycle pass periodically in a worker thread"""
+        interval = interval or settings.blob_maintenance_interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                result = await asyncio.to_thread(self.maintain)
+                print(f"🧹 Upload maintenance: {result}")
+            except Exception as e:
+                print(f"⚠️  Upload maintenance failed: {e}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            conn = self._connection()
+            blobs, size, stored, compressed = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0), COALESCE(SUM(compressed), 0) FROM blobs"
+            ).fetchone()
+            refs, referenced = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM blob_refs r JOIN blobs b ON b.sha256 = r.sha256"
+            ).fetchone()
+            sessions = conn.execute("SELECT COUNT(DISTINCT session_id) FROM blob_refs").fetchone()[0]
+        return {
+            "blobs": blobs,
+            "compressed_blobs": compressed,
+            "sessions": sessions,
+            "file_references": refs,
+            # Bytes the sessions reference vs. bytes actually on disk
+            "referenced_bytes": referenced,
+            "logical_bytes": size,
+            "stored_bytes": stored,
+        }
+
+# Global instance
+blob_store = BlobStore()
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Upload blob store maintenance")
+    parser.add_argument("command", choices=["stats", "gc", "migrate"])
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        moved = sum(blob_store.migrate_session(session_dir) for session_dir in blob_store.session_dirs())
+        print(json.dumps({"files_moved": moved, **blob_store.stats()}, indent=2))
+    elif args.command == "gc":
+        print(json.dumps(blob_store.maintain(), indent=2))
+    else:
+        print(json.dumps(blob_store.stats(), indent=2))
@@ -0,0 +1,535 @@
+"""
+Outbound call scheduler
+
+Call requests are queued in a local SQLite database and move through:
+queued -> preparing -> ready -> dialing -> in_progress -> completed | failed.
+A preparer builds each call's Weaviate context (focused query, passages,
+prior calls) ahead of time; the dispatcher dials ready calls as soon as a slot
+is free, under a cap on concurrent calls (CALL_MAX_CONCURRENT), a global dial
+rate (CALL_DIALS_PER_MINUTE) and a minimum interval between calls to the same
+number (CALL_NUMBER_INTERVAL). The prepared context is sent with the call as
+the assistant's {{consultation_context}} variable. Dials that never reached
+VAPI, rate-limited dials, busy lines and unanswered calls are retried with
+backoff up to CALL_MAX_ATTEMPTS; a dial that may have been placed (read
+timeout, dropped connection, no call id) is failed instead. A poller follows placed
+calls until VAPI reports them ended (the end-of-call webhook does the same
+sooner). Claims are taken in IMMEDIATE transactions, so several workers can
+share the queue without exceeding the caps.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config import settings
+from services.resilience import CircuitOpenError, outbound
+
+STATUSES = ("queued", "preparing", "ready", "dialing", "in_progress", "completed", "failed")
+ACTIVE_STATUSES = ("dialing", "in_progress")
+# VAPI endedReason fragments that mean the call never connected and is worth another attempt
+RETRY_ENDED_REASONS = ("busy", "did-not-answer", "failed-to-connect", "no-answer")
+# A job left in "preparing" this long (e.g. after a crash) is prepared again
+PREPARE_TIMEOUT_SECONDS = 300
+# A job left in "dialing" this long is failed rather than retried: the call may have been placed
+DIAL_TIMEOUT_SECONDS = 120
+# A placed call not seen ending in this long is given up on, so it stops holding a slot
+CALL_TIMEOUT_SECONDS = 3600
+METRICS_WINDOW_SECONDS = 3600
+# Upper bound on the prepared context sent with a call (it ends up in the assistant's prompt)
+CONTEXT_MAX_CHARS = 4000
+
+
+def consultation_context(context: Optional[Dict]) -> str:
+    """Prepared passages and prior-call summaries as plain text for the assistant's {{consultation_context}}"""
+    if not context:
+        return ""
+    lines = []
+    for hit in context.get("extracted_data") or []:
+        properties = hit.get("properties") or {}
+        if properties.get("original_prompt"):
+            lines.append(f"Founder's question: {properties['original_prompt']}")
+        for passage in hit.get("passages") or []:
+            lines.append(f"- {passage['text']}")
+    summaries = [call.get("summary") for call in context.get("prior_calls") or [] if call.get("summary")]
+    if summaries:
+        lines.append("Earlier calls:")
+        lines.extend(f"- {summary}" for summary in summaries)
+    return "\n".join(lines)[:CONTEXT_MAX_CHARS]
+
+
+def call_payload(phone_number: str, session_id: Optional[str], focused_query: Optional[str],
+                 context: Optional[Dict] = None) -> Dict:
+    """VAPI POST /call body for a consultation; the prepared context fills the assistant's prompt variables"""
+    payload = {
+        "assistantId": settings.vapi_assistant_id,
+        "phoneNumberId": settings.vapi_phone_number_id,
+        "customer": {
+            "number": phone_number
+        },
+        # Echoed back in the end-of-call report so the transcript is linked to this session
+        "metadata": {
+            "session_id": session_id,
+            "focused_query": focused_query
+        }
+    }
+    text = consultation_context(context)
+    if text:
+        payload["assistantOverrides"] = {
+            "variableValues": {"consultation_context": text, "focused_query": focused_query or ""}
+        }
+    return payload
+
+
+def dial_never_sent(error: Exception) -> bool:
+    """
+    Whether a failed POST /call provably never reached VAPI, so dialing again can't call the number twice:
+    the breaker failed fast, or the connection itself couldn't be made. Read timeouts and resets after the
+    request was written may still have placed the call.
+    """
+    import requests
+    from urllib3.exceptions import ConnectTimeoutError
+
+    if isinstance(error, (CircuitOpenError, requests.ConnectTimeout)):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        # Refused, unresolvable and timed-out connects (NewConnectionError is a ConnectTimeoutError)
+        return isinstance(getattr(error.args[0], "reason", error.args[0]), ConnectTimeoutError)
+    return False
+
+
+def vapi_headers() -> Dict:
+    return {
+        "Authorization": f"Bearer {settings.vapi_api_key}",
+        "Content-Type": "application/json"
+    }
+
+
+async def place_call(payload: Dict):
+    """POST /call through the outbound layer; placing a call is not idempotent, so it is never retried there"""
+    import requests
+
+    return await outbound.call(
+        "vapi",
+        requests.post,
+        f"{settings.vapi_base_url}/call",
+        json=payload,
+        headers=vapi_headers(),
+        timeout=outbound.policies["vapi"].timeout,
+        idempotent=False,
+        is_failure=lambda response: response.status_code >= 500
+    )
+
+
+async def fetch_call(vapi_call_id: str) -> Dict:
+    import requests
+
+    response = await outbound.call(
+        "vapi",
+        requests.get,
+        f"{settings.vapi_base_url}/call/{vapi_call_id}",
+        headers=vapi_headers(),
+        timeout=outbound.policies["vapi"].timeout,
+        is_failure=lambda response: response.status_code >= 500
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+
+
+class CallScheduler:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = Path(db_path or settings.call_queue_db)
+        self.stats = {"enqueued": 0, "prepared": 0, "prepare_failures": 0, "dialed": 0, "dial_failures": 0,
+                      "retries_scheduled": 0, "completed": 0, "failed": 0, "polls": 0}
+        self._conn = None
+        self._lock = threading.Lock()
+        self._prepare_wakeup: Optional[asyncio.Event] = None
+        self._dispatch_wakeup: Optional[asyncio.Event] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database lazily and create the schema on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            # Autocommit mode: claims open their own BEGIN IMMEDIATE transactions
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False,
+                                         isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS call_jobs (
+                    id TEXT PRIMARY KEY,
+                    phone_number TEXT NOT NULL,
+                    prompt TEXT NOT NULL,
+                    session_id TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    prepared_at REAL,
+                    dialed_at REAL,
+                    first_dialed_at REAL,
+                    ended_at REAL,
+                    focused_query TEXT,
+                    context TEXT,
+                    vapi_call_id TEXT,
+                    vapi_status TEXT,
+                    ended_reason TEXT,
+                    last_error TEXT
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS call_jobs_status ON call_jobs (status, next_attempt_at)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS call_jobs_vapi_id ON call_jobs (vapi_call_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS call_jobs_number ON call_jobs (phone_number, dialed_at)")
+        return self._conn
+
+    def _transaction(self, fn, *args):
+        """Run fn(conn, *args) in an IMMEDIATE transaction (serialized across threads and processes)"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn, *args)
+                conn.execute("COMMIT")
+                return result
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _update(self, job_id: str, **values):
+        values["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in values)
+        with self._lock:
+            self._connection().execute(f"UPDATE call_jobs SET {columns} WHERE id = ?", (*values.values(), job_id))
+
+    def enqueue(self, phone_number: str, prompt: str, session_id: Optional[str] = None,
+                not_before: Optional[float] = None) -> str:
+        return self.enqueue_many([{"phone_number": phone_number, "prompt": prompt,
+                                   "session_id": session_id, "not_before": not_before}])[0]
+
+    def enqueue_many(self, calls: List[Dict]) -> List[str]:
+        """Queue calls (dicts of phone_number, prompt, session_id, not_before) in one transaction"""
+        now = time.time()
+        rows = [
+            (str(uuid.uuid4()), call["phone_number"], call["prompt"], call.get("session_id"),
+             max(now, call.get("not_before") or now), now, now)
+            for call in calls
+        ]
+        self._transaction(lambda conn: conn.executemany(
+            "INSERT INTO call_jobs (id, phone_number, prompt, session_id, status, next_attempt_at, enqueued_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+            rows,
+        ))
+        self.stats["enqueued"] += len(rows)
+        for event in (self._prepare_wakeup, self._dispatch_wakeup):
+            if event is not None:
+                event.set()
+        return [row[0] for row in rows]
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM call_jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        with self._lock:
+            if status:
+                rows = self._connection().execute(
+                    "SELECT * FROM call_jobs WHERE status = ? ORDER BY enqueued_at DESC LIMIT ?", (status, limit)
+                ).fetchall()
+            else:
+                rows = self._connection().execute(
+                    "SELECT * FROM call_jobs ORDER BY enqueued_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+        return [self._job(row) for row in rows]
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        job["context"] = json.loads(job["context"]) if job["context"] else None
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Drop a call that hasn't been dialed yet"""
+        with self._lock:
+            cursor = self._connection().execute(
+                "UPDATE call_jobs SET status = 'failed', last_error = 'cancelled', updated_at = ? "
+                "WHERE id = ? AND status IN ('queued', 'preparing', 'ready')",
+                (time.time(), job_id),
+            )
+        return cursor.rowcount > 0
+
+    def recover(self):
+        """Reset work interrupted by a crash or restart"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE call_jobs SET status = 'queued', updated_at = ? WHERE status = 'preparing' AND updated_at < ?",
+                (now, now - PREPARE_TIMEOUT_SECONDS),
+            )
+            conn.execute(
+                "UPDATE call_jobs SET status = 'failed', last_error = 'interrupted while dialing', updated_at = ? "
+                "WHERE status = 'dialing' AND updated_at < ?",
+                (now, now - DIAL_TIMEOUT_SECONDS),
+            )
+            conn.execute(
+                "UPDATE call_jobs SET status = 'failed', last_error = 'call never reported ended', updated_at = ? "
+                "WHERE status = 'in_progress' AND dialed_at < ?",
+                (now, now - CALL_TIMEOUT_SECONDS),
+            )
+
+    # Preparation
+
+    def _claim_for_preparation(self, conn: sqlite3.Connection, limit: int) -> List[Dict]:
+        rows = conn.execute(
+            "SELECT * FROM call_jobs WHERE status = 'queued' ORDER BY next_attempt_at LIMIT ?", (limit,)
+        ).fetchall()
+        conn.executemany(
+            "UPDATE call_jobs SET status = 'preparing', updated_at = ? WHERE id = ?",
+            [(time.time(), row["id"]) for row in rows],
+        )
+        return [self._job(row) for row in rows]
+
+    async def prepare_one(self, job: Dict, prepare: Callable[[str, Optional[str]], Awaitable[Dict]]):
+        try:
+            context = await prepare(job["prompt"], job["session_id"])
+            await asyncio.to_thread(
+                self._update, job["id"], status="ready", prepared_at=time.time(),
+                focused_query=context.get("focused_query"), context=json.dumps(context)
+            )
+            self.stats["prepared"] += 1
+            if self._dispatch_wakeup is not None:
+                self._dispatch_wakeup.set()
+        except Exception as e:
+            # A call without context is still worth placing; the agent just starts cold
+            print(f"⚠️  Could not prepare context for call {job['id']}: {e}")
+            self.stats["prepare_failures"] += 1
+            await asyncio.to_thread(self._update, job["id"], status="ready", prepared_at=time.time(),
+                                    last_error=f"prepare: {e}")
+
+    async def prepare_loop(self, prepare: Callable[[str, Optional[str]], Awaitable[Dict]]):
+        self._prepare_wakeup = asyncio.Event()
+        while True:
+            try:
+                jobs = await asyncio.to_thread(self._transaction, self._claim_for_preparation,
+                                               settings.call_prepare_concurrency)
+                if jobs:
+                    await asyncio.gather(*(self.prepare_one(job, prepare) for job in jobs))
+                    continue
+            except Exception as e:
+                # e.g. "database is locked"; claimed jobs are re-queued by recover() after PREPARE_TIMEOUT_SECONDS
+                print(f"⚠️  Call preparation failed: {e}")
+            await self._wait(self._prepare_wakeup, settings.call_poll_interval)
+
+    # Dispatch
+
+    def _claim_for_dial(self, conn: sqlite3.Connection) -> Optional[Dict]:
+        """The next ready call that fits the concurrency cap, the dial rate and per-number pacing"""
+        now = time.time()
+        active = conn.execute(
+            "SELECT COUNT(*) FROM call_jobs WHERE status IN ('dialing', 'in_progress')"
+        ).fetchone()[0]
+        if active >= settings.call_max_concurrent:
+            return None
+        dials_last_minute = conn.execute(
+            "SELECT COUNT(*) FROM call_jobs WHERE dialed_at >= ?", (now - 60,)
+        ).fetchone()[0]
+        if dials_last_minute >= settings.call_dials_per_minute:
+            return None
+        row = conn.execute(
+            """
+            SELECT * FROM call_jobs AS job
+            WHERE status = 'ready' AND next_attempt_at <= ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM call_jobs AS other
+                  WHERE other.phone_number = job.phone_number AND other.id != job.id
+                    AND (other.status IN ('dialing', 'in_progress') OR other.dialed_at >= ?)
+              )
+            ORDER BY next_attempt_at LIMIT 1
+            """,
+            (now, now - settings.call_number_interval),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE call_jobs SET status = 'dialing', attempts = attempts + 1, dialed_at = ?, "
+            "first_dialed_at = COALESCE(first_dialed_at, ?), updated_at = ? WHERE id = ?",
+            (now, now, now, row["id"]),
+        )
+        job = self._job(row)
+        job["attempts"] += 1
+        return job
+
+    def _retry_or_fail(self, job: Dict, error: str, retryable: bool = True):
+        if retryable and job["attempts"] < settings.call_max_attempts:
+            delay = settings.call_retry_delay * 2 ** (job["attempts"] - 1)
+            self._update(job["id"], status="ready", next_attempt_at=time.time() + delay, last_error=error)
+            self.stats["retries_scheduled"] += 1
+        else:
+            self._update(job["id"], status="failed", ended_at=time.time(), last_error=error)
+            self.stats["failed"] += 1
+
+    async def dial(self, job: Dict):
+        context = job["context"] or {}
+        try:
+            response = await place_call(
+                call_payload(job["phone_number"], job["session_id"], job["focused_query"], context)
+            )
+        except Exception as e:
+            self.stats["dial_failures"] += 1
+            # Only failures before the request went out are retried; anything later may have placed the call
+            await asyncio.to_thread(self._retry_or_fail, job, f"dial: {e}", dial_never_sent(e))
+            return
+        try:
+            body = response.json() if response.content else {}
+        except ValueError:
+            body = {}
+        if response.status_code >= 400:
+            self.stats["dial_failures"] += 1
+            # Rate limits and server errors are transient; other 4xx (bad number, bad config) are not
+            retryable = response.status_code == 429 or response.status_code >= 500
+            await asyncio.to_thread(self._retry_or_fail, job, f"dial: {response.status_code} {str(body)[:200]}", retryable)
+            return
+        if not body.get("id"):
+            # Accepted but unidentifiable: it can't be polled, and re-dialing could call the number twice
+            self.stats["dial_failures"] += 1
+            await asyncio.to_thread(self._retry_or_fail, job, f"dial: {response.status_code} response without a call id",
+                                    False)
+            return
+        self.stats["dialed"] += 1
+        await asyncio.to_thread(self._update, job["id"], status="in_progress", vapi_call_id=body["id"],
+                                vapi_status=body.get("status"))
+
+    async def dispatch_loop(self):
+        self._dispatch_wakeup = asyncio.Event()
+        in_flight = set()
+
+        def finished(task: asyncio.Task):
+            in_flight.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                # The job stays "dialing" and is failed by recover() after DIAL_TIMEOUT_SECONDS
+                print(f"⚠️  Dial failed: {task.exception()}")
+
+        while True:
+            try:
+                job = await asyncio.to_thread(self._transaction, self._claim_for_dial)
+            except Exception as e:
+                print(f"⚠️  Call dispatch failed: {e}")
+                job = None
+            if job is not None:
+                task = asyncio.ensure_future(self.dial(job))
+                in_flight.add(task)
+                task.add_done_callback(finished)
+                continue
+            # Nothing dialable now: wait for a new or prepared call, a finished call, or the next retry/pacing window
+            await self._wait(self._dispatch_wakeup, 1.0)
+
+    # Status
+
+    def mark_ended(self, vapi_call_id: str, ended_reason: Optional[str], vapi_status: str = "ended") -> bool:
+        """Record a finished call (from the poller or the end-of-call webhook); no-answers are retried"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT * FROM call_jobs WHERE vapi_call_id = ? AND status = 'in_progress'", (vapi_call_id,)
+            ).fetchone()
+        if row is None:
+            return False
+        job = self._job(row)
+        reason = ended_reason or ""
+        self._update(job["id"], vapi_status=vapi_status, ended_reason=ended_reason)
+        if any(fragment in reason for fragment in RETRY_ENDED_REASONS):
+            self._retry_or_fail(job, f"call ended: {reason}")
+        else:
+            self._update(job["id"], status="completed", ended_at=time.time())
+            self.stats["completed"] += 1
+        if self._dispatch_wakeup is not None:
+            self._dispatch_wakeup.set()
+        return True
+
+    async def poll_once(self):
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, vapi_call_id FROM call_jobs WHERE status = 'in_progress' AND vapi_call_id IS NOT NULL"
+            ).fetchall()
+        for row in rows:
+            try:
+                call = await fetch_call(row["vapi_call_id"])
+                self.stats["polls"] += 1
+            except Exception as e:
+                print(f"⚠️  Could not poll call {row['vapi_call_id']}: {e}")
+                continue
+            if call.get("status") == "ended":
+                await asyncio.to_thread(self.mark_ended, row["vapi_call_id"], call.get("endedReason"))
+            else:
+                await asyncio.to_thread(self._update, row["id"], vapi_status=call.get("status"))
+
+    async def poll_loop(self):
+        while True:
+            await asyncio.sleep(settings.call_poll_interval)
+            try:
+                await asyncio.to_thread(self.recover)
+                await self.poll_once()
+            except Exception as e:
+                print(f"⚠️  Call status polling failed: {e}")
+
+    @staticmethod
+    async def _wait(event: asyncio.Event, timeout: float):
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        event.clear()
+
+    async def run(self, prepare: Callable[[str, Optional[str]], Awaitable[Dict]]):
+        """Run preparation, dispatch and status polling until cancelled"""
+        await asyncio.to_thread(self.recover)
+        await asyncio.gather(self.prepare_loop(prepare), self.dispatch_loop(), self.poll_loop())
+
+    def metrics(self) -> Dict:
+        """Queue depth, calls per minute and queue-to-dial latency over the last hour"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            by_status = dict(conn.execute("SELECT status, COUNT(*) FROM call_jobs GROUP BY status").fetchall())
+            dial_rows = conn.execute(
+                "SELECT first_dialed_at - enqueued_at, prepared_at - enqueued_at FROM call_jobs "
+                "WHERE first_dialed_at >= ?",
+                (now - METRICS_WINDOW_SECONDS,),
+            ).fetchall()
+            dials_last_minute = conn.execute(
+                "SELECT COUNT(*) FROM call_jobs WHERE dialed_at >= ?", (now - 60,)
+            ).fetchone()[0]
+            completed_last_hour = conn.execute(
+                "SELECT COUNT(*) FROM call_jobs WHERE status = 'completed' AND ended_at >= ?",
+                (now - METRICS_WINDOW_SECONDS,),
+            ).fetchone()[0]
+        queue_to_dial = [row[0] for row in dial_rows]
+        queue_to_ready = [row[1] for row in dial_rows if row[1] is not None]
+        return {
+            **self.stats,
+            "by_status": {status: by_status.get(status, 0) for status in STATUSES},
+            "dials_last_minute": dials_last_minute,
+            "calls_per_minute_last_hour": round(len(queue_to_dial) / (METRICS_WINDOW_SECONDS / 60), 2),
+            "completed_last_hour": completed_last_hour,
+            "queue_to_dial_seconds_p50": percentile(queue_to_dial, 50),
+            "queue_to_dial_seconds_p95": percentile(queue_to_dial, 95),
+            "queue_to_ready_seconds_p50": percentile(queue_to_ready, 50),
+            "max_concurrent": settings.call_max_concurrent,
+        }
+
+# Global instance
+call_scheduler = CallScheduler()
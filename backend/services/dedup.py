@@ -0,0 +1,248 @@
+"""
+Near-duplicate detection for ingested documents
+
+Every stored document is fingerprinted with an exact content hash and a
+MinHash signature over word shingles; signatures are bucketed with LSH in a
+local SQLite database. A new submission whose normalized text matches a
+recent document (exactly, or with estimated Jaccard similarity above the
+threshold) is linked to that document instead of being embedded and
+inserted again, and search results from the same duplicate group are
+collapsed into one hit. Links only join submissions from the same owner (the
+admission client key), and a session stored in its own right drops its link.
+"""
+
+import hashlib
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import settings
+
+WORD_PATTERN = re.compile(r"\w+")
+SHINGLE_WORDS = 5
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# Fixed seed: signatures must be comparable across processes and restarts
+_rng = random.Random(1)
+PERMUTATIONS = [
+    (_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+Fingerprint = namedtuple("Fingerprint", ["content_hash", "signature", "length"])
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def shingles(text: str) -> set:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def minhash(text: str) -> List[int]:
+    hashes = [_hash64(shingle) & MAX_HASH for shingle in shingles(text)]
+    return [min((a * h + b) % MERSENNE_PRIME for h in hashes) & MAX_HASH for a, b in PERMUTATIONS]
+
+
+def fingerprint(text: str) -> Fingerprint:
+    """Exact hash of the whitespace/case-normalized text plus its MinHash signature"""
+    canonical = " ".join(WORD_PATTERN.findall(text.lower()))
+    content_hash = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    return Fingerprint(content_hash, minhash(text), len(text))
+
+
+def estimated_similarity(a: List[int], b: List[int]) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def band_keys(signature: List[int]) -> List[str]:
+    rows = len(signature) // LSH_BANDS
+    return [
+        f"{band}:{_hash64(','.join(map(str, signature[band * rows:(band + 1) * rows])))}"
+        for band in range(LSH_BANDS)
+    ]
+
+
+class DuplicateDetector:
+    def __init__(self, db_path: Optional[str] = None, threshold: Optional[float] = None,
+                 window_days: Optional[float] = None):
+        self.db_path = Path(db_path or settings.dedup_db_path)
+        self.threshold = threshold if threshold is not None else settings.dedup_threshold
+        self.window_seconds = (window_days if window_days is not None else settings.dedup_window_days) * 86400
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database lazily and create the schema on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    object_id TEXT PRIMARY KEY,
+                    group_id TEXT NOT NULL,
+                    session_id TEXT,
+                    content_hash TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    length INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    owner TEXT
+                );
+                CREATE INDEX IF NOT EXISTS documents_hash ON documents (content_hash);
+                CREATE TABLE IF NOT EXISTS lsh_buckets (
+                    bucket TEXT NOT NULL,
+                    object_id TEXT NOT NULL,
+                    PRIMARY KEY (bucket, object_id)
+                );
+                CREATE TABLE IF NOT EXISTS linked_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    object_id TEXT NOT NULL,
+                    similarity REAL NOT NULL,
+                    length INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                """
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(documents)")}
+            if "owner" not in columns:
+                # Databases created before links were scoped; their documents have no owner and are never linked to
+                self._conn.execute("ALTER TABLE documents ADD COLUMN owner TEXT")
+            self._conn.commit()
+        return self._conn
+
+    def find_duplicate(self, fp: Fingerprint, owner: Optional[str] = None) -> Optional[Dict]:
+        """
+        Best recent match for a fingerprint: an exact hash match, else the closest LSH candidate above the threshold
+        owner: only match documents stored by this owner (None matches any, for grouping search results only)
+        """
+        since = time.time() - self.window_seconds
+        scope, scope_params = ("AND d.owner = ?", (owner,)) if owner is not None else ("", ())
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                f"SELECT d.group_id FROM documents d WHERE d.content_hash = ? AND d.created_at >= ? {scope} LIMIT 1",
+                (fp.content_hash, since, *scope_params),
+            ).fetchone()
+            if row:
+                return {"object_id": row[0], "similarity": 1.0, "exact": True}
+
+            keys = band_keys(fp.signature)
+            placeholders = ",".join("?" * len(keys))
+            candidates = conn.execute(
+                f"""
+                SELECT DISTINCT d.group_id, d.signature FROM lsh_buckets b
+                JOIN documents d ON d.object_id = b.object_id
+                WHERE b.bucket IN ({placeholders}) AND d.created_at >= ? {scope}
+                """,
+                (*keys, since, *scope_params),
+            ).fetchall()
+
+        best = None
+        for group_id, blob in candidates:
+            similarity = estimated_similarity(fp.signature, array("Q", blob))
+            if similarity >= self.threshold and (best is None or similarity > best["similarity"]):
+                best = {"object_id": group_id, "similarity": similarity, "exact": False}
+        return best
+
+    def register(self, object_id: str, session_id: Optional[str], fp: Fingerprint,
+                 group_id: Optional[str] = None, owner: Optional[str] = None):
+        """Record a stored document so later submissions (from the same owner) can be matched against it"""
+        object_id = str(object_id)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO documents
+                    (object_id, group_id, session_id, content_hash, signature, length, created_at, owner)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (object_id, str(group_id or object_id), session_id, fp.content_hash,
+                 array("Q", fp.signature).tobytes(), fp.length, time.time(), owner),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets (bucket, object_id) VALUES (?, ?)",
+                [(key, object_id) for key in band_keys(fp.signature)],
+            )
+            conn.commit()
+
+    def link(self, session_id: str, object_id: str, similarity: float, length: int):
+        """Point a duplicate session at the document that already holds its content"""
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO linked_sessions (session_id, object_id, similarity, length, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, str(object_id), similarity, length, time.time()),
+            )
+            self._connection().commit()
+
+    def unlink(self, session_id: str):
+        """Forget a session's link once it has a document of its own"""
+        with self._lock:
+            self._connection().execute("DELETE FROM linked_sessions WHERE session_id = ?", (session_id,))
+            self._connection().commit()
+
+    def linked_object(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT object_id FROM linked_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def group_ids(self, object_ids: List[str]) -> Dict[str, str]:
+        if not object_ids:
+            return {}
+        placeholders = ",".join("?" * len(object_ids))
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT object_id, group_id FROM documents WHERE object_id IN ({placeholders})",
+                list(object_ids),
+            ).fetchall()
+        return dict(rows)
+
+    def collapse(self, results: List[Dict]) -> List[Dict]:
+        """Keep the best-ranked hit per duplicate group, listing the others under "duplicate_ids" """
+        groups = self.group_ids([result["id"] for result in results])
+        kept: Dict[str, Dict] = {}
+        collapsed = []
+        for result in results:
+            group = groups.get(result["id"], result["id"])
+            if group in kept:
+                kept[group].setdefault("duplicate_ids", []).append(result["id"])
+                continue
+            kept[group] = result
+            collapsed.append(result)
+        return collapsed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            conn = self._connection()
+            documents, groups = conn.execute("SELECT COUNT(*), COUNT(DISTINCT group_id) FROM documents").fetchone()
+            linked, chars_saved = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM linked_sessions"
+            ).fetchone()
+        return {
+            "documents": documents,
+            "duplicate_groups": groups,
+            "linked_sessions": linked,
+            # Every linked session is one insert and one embedding that never happened
+            "inserts_saved": linked,
+            "chars_saved": chars_saved,
+        }
+
+# Global instance
+duplicate_detector = DuplicateDetector()
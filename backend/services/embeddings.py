@@ -0,0 +1,156 @@
+"""
+Optional local sentence-embedding model (ONNX Runtime + NumPy)
+
+When EMBEDDING_BACKEND=local, documents and queries are vectorized on our own
+CPUs in batches and sent to Weaviate as bring-your-own vectors, so inserts and
+searches no longer need a remote embedding call. Query embeddings are kept in
+an in-process LRU and in the shared local cache.
+
+The model directory must contain an ONNX export of a sentence-transformer
+(e.g. all-MiniLM-L6-v2) as model.onnx plus its tokenizer.json.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from config import settings
+from services.sqlite_cache import local_cache
+
+EMBEDDINGS_NAMESPACE = "embeddings"
+EMBEDDINGS_TTL_SECONDS = settings.query_embedding_cache_ttl
+
+
+class LocalEmbedder:
+    def __init__(self, model_dir: Optional[str] = None, batch_size: Optional[int] = None,
+                 cache_size: Optional[int] = None, max_length: int = 256):
+        self.model_dir = Path(model_dir or settings.local_embedding_model_dir)
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.cache_size = cache_size or settings.query_embedding_cache_size
+        self.max_length = max_length
+        self._session = None
+        self._tokenizer = None
+        self._input_names = []
+        self._load_lock = threading.Lock()
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.stats = {"query_cache_hits": 0, "query_cache_misses": 0, "texts_embedded": 0, "batches": 0}
+
+    @property
+    def model_id(self) -> str:
+        return self.model_dir.name
+
+    def _load(self):
+        """Load the ONNX session and tokenizer on first use"""
+        if self._session is not None:
+            return
+        with self._load_lock:
+            if self._session is not None:
+                return
+            import onnxruntime
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.enable_padding()
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            session = onnxruntime.InferenceSession(
+                str(self.model_dir / "model.onnx"), options, providers=["CPUExecutionProvider"]
+            )
+            self._input_names = [model_input.name for model_input in session.get_inputs()]
+            self._tokenizer = tokenizer
+            self._session = session
+            print(f"🧠 Loaded local embedding model from {self.model_dir}")
+
+    def _embed_batch(self, texts: List[str]):
+        import numpy as np
+
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self._session.run(None, feeds)[0]
+        # Mean pooling over real tokens, then L2 normalization (cosine-ready)
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        self.stats["batches"] += 1
+        self.stats["texts_embedded"] += len(texts)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed many texts in fixed-size batches"""
+        self._load()
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start:start + self.batch_size]).tolist())
+        return vectors
+
+    def _cache_key(self, text: str) -> str:
+        return f"{self.model_id}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, served from the LRU (then the shared cache) when it was seen before"""
+        key = self._cache_key(text)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats["query_cache_hits"] += 1
+                return self._cache[key]
+
+        vector = local_cache.get(EMBEDDINGS_NAMESPACE, key)
+        if vector is None:
+            self.stats["query_cache_misses"] += 1
+            vector = self.embed_documents([text])[0]
+            local_cache.set(EMBEDDINGS_NAMESPACE, key, vector, ttl=EMBEDDINGS_TTL_SECONDS)
+        else:
+            self.stats["query_cache_hits"] += 1
+
+        with self._cache_lock:
+            self._cache[key] = vector
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return vector
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries, running every cache miss through the model in shared batches"""
+        vectors = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            key = self._cache_key(text)
+            with self._cache_lock:
+                vector = self._cache.get(key)
+            if vector is None:
+                vector = local_cache.get(EMBEDDINGS_NAMESPACE, key)
+            if vector is None:
+                missing.append(text)
+            else:
+                self.stats["query_cache_hits"] += 1
+                vectors[text] = vector
+
+        if missing:
+            self.stats["query_cache_misses"] += len(missing)
+            for text, vector in zip(missing, self.embed_documents(missing)):
+                local_cache.set(EMBEDDINGS_NAMESPACE, self._cache_key(text), vector, ttl=EMBEDDINGS_TTL_SECONDS)
+                vectors[text] = vector
+
+        with self._cache_lock:
+            for text, vector in vectors.items():
+                self._cache[self._cache_key(text)] = vector
+                self._cache.move_to_end(self._cache_key(text))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [vectors[text] for text in texts]
+
+# Global instance (the model itself is loaded lazily on first use)
+local_embedder = LocalEmbedder()
+
+
+def use_local_embeddings() -> bool:
+    return settings.embedding_backend == "local"
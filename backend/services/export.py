@@ -0,0 +1,113 @@
+"""
+Streaming export of NormalizedDocuments as NDJSON or Parquet
+
+Documents are read page by page with WeaviateService.iterate_documents, so
+memory is bounded by the page size however large the collection is. Parquet
+output needs pyarrow (optional) and writes one row group per page.
+
+Usage:
+    python -m services.export --output documents.ndjson [--format ndjson|parquet]
+        [--properties session_id,normalized_content] [--include-vector] [--page-size 500]
+"""
+
+import json
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import orjson
+
+
+def ndjson_lines(records: Iterable[Dict]) -> Iterator[bytes]:
+    for record in records:
+        yield orjson.dumps(record) + b"\n"
+
+
+def flatten(record: Dict) -> Dict:
+    """Parquet rows: properties as columns next to id (and vector); nested values as JSON strings"""
+    row = {"id": record["id"]}
+    for key, value in record["properties"].items():
+        row[key] = json.dumps(value) if isinstance(value, dict) else value
+    if "vector" in record:
+        row["vector"] = record["vector"]
+    return row
+
+
+def write_parquet(records: Iterable[Dict], path: str, rows_per_group: int) -> int:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    batch: List[Dict] = []
+    written = 0
+
+    def flush():
+        nonlocal writer
+        table = pa.Table.from_pylist(batch, schema=writer.schema if writer else None)
+        if writer is None:
+            writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+        writer.write_table(table)
+
+    try:
+        for record in records:
+            batch.append(flatten(record))
+            if len(batch) >= rows_per_group:
+                flush()
+                written += len(batch)
+                batch = []
+        if batch or writer is None:
+            flush()
+            written += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def progress(records: Iterable[Dict], every: int = 10000) -> Iterator[Dict]:
+    """Pass records through, reporting the running export rate on stderr"""
+    start = time.perf_counter()
+    count = 0
+    for count, record in enumerate(records, 1):
+        if count % every == 0:
+            print(f"  {count} objects, {count / (time.perf_counter() - start):.0f}/s", file=sys.stderr)
+        yield record
+    print(f"✅ Exported {count} objects in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    from services.projection import parse_properties
+    from services.weaviate_service import weaviate_service
+
+    parser = argparse.ArgumentParser(description="Export NormalizedDocuments")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument("--properties", help="comma-separated properties (default: all)")
+    parser.add_argument("--include-vector", action="store_true")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--after", help="resume after this object ID")
+    args = parser.parse_args(argv)
+
+    if not weaviate_service.connect():
+        sys.exit("Failed to connect to Weaviate")
+    try:
+        records = progress(weaviate_service.iterate_documents(
+            page_size=args.page_size,
+            properties=parse_properties(args.properties),
+            include_vector=args.include_vector,
+            after=args.after,
+        ))
+        if args.format == "parquet":
+            write_parquet(records, args.output, args.page_size)
+        else:
+            with open(args.output, "wb") as f:
+                for line in ndjson_lines(records):
+                    f.write(line)
+    finally:
+        weaviate_service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Zero-copy access to stored files
+
+Pipeline stages (hashing, PDF parsing, page counting) read uploads through
+read-only memory maps instead of f.read(), so no stage holds its own full
+copy of a file; uploads are streamed to disk in fixed-size chunks. File
+hashes are memoized per (path, size, mtime) so the same file is hashed once
+no matter how many stages ask for it.
+"""
+
+import hashlib
+import io
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import BinaryIO, Tuple
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+HASH_MEMO_SIZE = 4096
+
+_hash_memo: "OrderedDict[Tuple, str]" = OrderedDict()
+_hash_memo_lock = threading.Lock()
+
+
+@contextmanager
+def mapped_file(path: str):
+    """Read-only memory map of a file (file-like and a buffer); empty files yield an empty stream"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield io.BytesIO(b"")
+            return
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield view
+        finally:
+            view.close()
+
+
+def sha256_file(path: str) -> str:
+    """sha256 of a file, hashed straight from its memory map and memoized until the file changes"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_memo_lock:
+        if key in _hash_memo:
+            _hash_memo.move_to_end(key)
+            return _hash_memo[key]
+
+    with mapped_file(path) as view:
+        digest = hashlib.sha256(view).hexdigest() if stat.st_size else hashlib.sha256().hexdigest()
+
+    with _hash_memo_lock:
+        _hash_memo[key] = digest
+        if len(_hash_memo) > HASH_MEMO_SIZE:
+            _hash_memo.popitem(last=False)
+    return digest
+
+
+def remember_hash(path: str, digest: str):
+    """Record a hash computed while the file was written, so later stages don't rehash it"""
+    stat = os.stat(path)
+    with _hash_memo_lock:
+        _hash_memo[(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)] = digest
+        if len(_hash_memo) > HASH_MEMO_SIZE:
+            _hash_memo.popitem(last=False)
+
+
+def stream_to_file(source: BinaryIO, destination: str) -> Tuple[str, int]:
+    """Copy a stream to disk in fixed-size chunks, hashing on the way; returns (sha256, size)"""
+    digest = hashlib.sha256()
+    size = 0
+    buffer = bytearray(STREAM_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(destination, "wb") as out:
+        while True:
+            read = source.readinto(view) if hasattr(source, "readinto") else None
+            if read is None:
+                chunk = source.read(STREAM_CHUNK_SIZE)
+                read = len(chunk)
+                view[:read] = chunk
+            if not read:
+                break
+            digest.update(view[:read])
+            out.write(view[:read])
+            size += read
+    return digest.hexdigest(), size
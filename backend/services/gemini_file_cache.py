@@ -0,0 +1,210 @@
+"""
+Gemini file-upload cache keyed by content hash
+
+Files are uploaded once through the Gemini Files API and the returned handle
+is kept in a local SQLite database, so reused inputs are referenced by URI
+instead of being re-sent as inline bytes on every request. A handle Gemini
+rejects before its recorded expiry (deleted or expired server-side) is
+forgotten and the file uploaded again.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import settings
+from services.file_views import sha256_file
+from services.resilience import outbound, status_code
+
+# Uploaded files are kept by the Files API for 48 hours
+DEFAULT_FILE_TTL_SECONDS = 48 * 3600
+
+MIME_TYPES = {
+    ".pdf": "application/pdf",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+}
+
+
+def guess_mime_type(path: str) -> str:
+    """Determine the MIME type from the file extension"""
+    return MIME_TYPES.get(Path(path).suffix.lower(), "image/jpeg")
+
+
+def is_stale_handle_error(error: BaseException) -> bool:
+    """
+    Whether Gemini refused a request because a referenced file is gone: it answers 403
+    ("... access the File ... or it may not exist"), 404 or 400 naming the file
+    """
+    return status_code(error) in (400, 403, 404) and "file" in str(error).lower()
+
+
+class GeminiFileCache:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = Path(db_path or settings.gemini_file_cache_db)
+        self.refresh_margin = settings.gemini_file_refresh_margin
+        self.max_concurrent_uploads = settings.gemini_max_concurrent_uploads
+        self._conn = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the cache database lazily and create the schema on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            # WAL lets every uvicorn worker share the handle cache
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS gemini_files (
+                    content_hash TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    file_uri TEXT NOT NULL,
+                    mime_type TEXT NOT NULL,
+                    local_path TEXT,
+                    expires_at REAL NOT NULL,
+                    uploaded_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def lookup(self, content_hash: str) -> Optional[Dict]:
+        """Return a cached handle unless it is missing or about to expire"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT file_name, file_uri, mime_type, expires_at FROM gemini_files WHERE content_hash = ?",
+                (content_hash,),
+            ).fetchone()
+        if not row:
+            return None
+        if row[3] - self.refresh_margin <= time.time():
+            return None
+        return {
+            "content_hash": content_hash,
+            "file_name": row[0],
+            "file_uri": row[1],
+            "mime_type": row[2],
+            "expires_at": row[3],
+        }
+
+    def _save(self, content_hash: str, handle: Dict, local_path: str):
+        with self._lock:
+            self._connection().execute(
+                """
+                INSERT OR REPLACE INTO gemini_files
+                    (content_hash, file_name, file_uri, mime_type, local_path, expires_at, uploaded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    content_hash,
+                    handle["file_name"],
+                    handle["file_uri"],
+                    handle["mime_type"],
+                    local_path,
+                    handle["expires_at"],
+                    time.time(),
+                ),
+            )
+            self._connection().commit()
+
+    def forget(self, content_hash: str):
+        """Drop a handle, e.g. after Gemini rejected it as expired"""
+        with self._lock:
+            self._connection().execute("DELETE FROM gemini_files WHERE content_hash = ?", (content_hash,))
+            self._connection().commit()
+
+    def _upload_blocking(self, client, path: str, mime_type: str) -> Dict:
+        """Upload a file with the (blocking) Files API and normalize the returned handle"""
+        uploaded = client.files.upload(file=path, config={"mime_type": mime_type})
+        expiration = getattr(uploaded, "expiration_time", None)
+        expires_at = expiration.timestamp() if expiration else time.time() + DEFAULT_FILE_TTL_SECONDS
+        return {
+            "file_name": uploaded.name,
+            "file_uri": uploaded.uri,
+            "mime_type": uploaded.mime_type or mime_type,
+            "expires_at": expires_at,
+        }
+
+    async def get_or_upload(self, client, path: str, semaphore: asyncio.Semaphore) -> Dict:
+        """Return the handle for a file, uploading it only if no fresh handle is cached"""
+        content_hash = await asyncio.to_thread(sha256_file, path)
+        cached = self.lookup(content_hash)
+        if cached:
+            print(f"        ♻️  Reusing Gemini file handle for {Path(path).name} ({cached['file_name']})")
+            return cached
+
+        # Identical files in the same batch share a single upload
+        if content_hash in self._inflight:
+            return await asyncio.shield(self._inflight[content_hash])
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[content_hash] = future
+        try:
+            async with semaphore:
+                mime_type = guess_mime_type(path)
+                print(f"        ⬆️  Uploading {Path(path).name} to Gemini Files API ({mime_type})...")
+                handle = await outbound.call("gemini", self._upload_blocking, client, path, mime_type)
+            handle["content_hash"] = content_hash
+            self._save(content_hash, handle, str(path))
+            print(f"        ✅ Uploaded {Path(path).name} as {handle['file_name']}")
+            future.set_result(handle)
+            return handle
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting on it
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(content_hash, None)
+
+    async def get_handles(self, client, paths: List[str]) -> List[Dict]:
+        """Resolve handles for all paths concurrently under a bounded semaphore"""
+        semaphore = asyncio.Semaphore(self.max_concurrent_uploads)
+        return await asyncio.gather(*(self.get_or_upload(client, path, semaphore) for path in paths))
+
+    async def refresh_expiring(self, client) -> int:
+        """Re-upload handles that are close to expiry while their local file still exists"""
+        deadline = time.time() + self.refresh_margin
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT content_hash, local_path FROM gemini_files WHERE expires_at <= ?",
+                (deadline,),
+            ).fetchall()
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_uploads)
+        refreshed = 0
+        for content_hash, local_path in rows:
+            if not local_path or not os.path.exists(local_path):
+                self.forget(content_hash)
+                continue
+            try:
+                await self.get_or_upload(client, local_path, semaphore)
+                refreshed += 1
+            except Exception as e:
+                print(f"⚠️  Failed to refresh Gemini file handle for {local_path}: {e}")
+        return refreshed
+
+    async def refresh_loop(self, client_factory, interval: Optional[int] = None):
+        """Periodically refresh handles before they expire"""
+        interval = interval or max(self.refresh_margin // 2, 60)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                refreshed = await self.refresh_expiring(client_factory())
+                if refreshed:
+                    print(f"♻️  Refreshed {refreshed} Gemini file handles")
+            except Exception as e:
+                print(f"⚠️  Gemini file handle refresh failed: {e}")
+
+# Global instance
+gemini_file_cache = GeminiFileCache()
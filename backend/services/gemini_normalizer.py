@@ -0,0 +1,261 @@
+"""
+Gemini normalization of prompts, PDFs and images for Weaviate storage
+"""
+
+import asyncio
+import hashlib
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from services.gemini_file_cache import gemini_file_cache, is_stale_handle_error, sha256_file
+from services.prompt_assembly import gemini_usage, prompt_assembler
+from services.resilience import outbound
+from services.sqlite_cache import local_cache
+
+GEMINI_MODEL = settings.gemini_model
+
+# "single" sends the whole submission in one request, "per_file" fans out one request per file
+NORMALIZATION_MODES = ("single", "per_file")
+DEFAULT_NORMALIZATION_MODE = settings.gemini_normalization_mode
+FILE_NOTES_NAMESPACE = "file_notes"
+FILE_NOTES_TTL_SECONDS = settings.file_notes_ttl_seconds
+NORMALIZED_NAMESPACE = "normalized"
+NORMALIZED_TTL_SECONDS = settings.normalized_ttl_seconds
+
+NORMALIZATION_INSTRUCTION = """
+
+Please analyze and normalize the above content (prompt, PDFs, and images) into a comprehensive, well-structured text format that is specifically optimized for Weaviate vector database storage and semantic search.
+
+The normalized text should be structured for Weaviate with these characteristics:
+
+1. **Semantic Richness**: Use descriptive, context-rich language that captures the full meaning and relationships between concepts
+2. **Searchable Keywords**: Include relevant technical terms, business concepts, and domain-specific vocabulary
+3. **Hierarchical Structure**: Organize information in a logical hierarchy with clear sections and subsections
+4. **Entity Relationships**: Explicitly mention relationships between entities, concepts, and ideas
+5. **Context Preservation**: Maintain the original context and intent while making it more discoverable
+6. **Dense Information**: Pack maximum relevant information into coherent, searchable chunks
+7. **Cross-References**: Include references and connections between different parts of the content
+8. **Metadata Integration**: Embed implicit metadata and categorization within the text
+
+Format the output as structured, searchable content that will work optimally with Weaviate's vector embeddings and semantic search capabilities. Focus on creating text that will be highly retrievable and contextually relevant when users search for related information.
+
+Provide a comprehensive, Weaviate-optimized normalized summary of all the content.
+"""
+
+PARTIAL_INSTRUCTION = """
+
+The content above is one part of a larger submission for the prompt shown first. Extract and normalize everything in these files that is relevant to the prompt: key facts, figures, entities, relationships and domain vocabulary. Write dense, well-structured notes; they will be merged with notes from the other parts afterwards.
+"""
+
+MERGE_INSTRUCTION_HEADER = """
+
+Below are normalized notes produced independently from different parts of the same submission. Merge them into a single document, removing duplication and resolving cross-references between the parts.
+"""
+
+
+async def generate_content(client, contents: List, label: str, estimated_tokens: Optional[int] = None) -> str:
+    """Run a Gemini request and record its token usage and latency"""
+    start = time.perf_counter()
+    response = await outbound.call("gemini", client.aio.models.generate_content, model=GEMINI_MODEL, contents=contents)
+    latency_ms = (time.perf_counter() - start) * 1000
+    gemini_usage.record(label, GEMINI_MODEL, getattr(response, "usage_metadata", None), latency_ms, estimated_tokens)
+    return response.text
+
+
+async def build_contents(client, file_parts: List[Dict]) -> Tuple[List, List[Dict]]:
+    """Turn planned file parts into Gemini content, uploading files through the handle cache"""
+    from google.genai.types import Part
+    
+    upload_paths = [part["path"] for part in file_parts if part["kind"] == "file"]
+    handles = await gemini_file_cache.get_handles(client, upload_paths) if upload_paths else []
+    handle_by_path = dict(zip(upload_paths, handles))
+
+    contents = []
+    for part in file_parts:
+        if part["kind"] == "text":
+            contents.append(part["text"])
+        else:
+            handle = handle_by_path[part["path"]]
+            contents.append(Part.from_uri(file_uri=handle["file_uri"], mime_type=handle["mime_type"]))
+    return contents, handles
+
+
+async def generate_with_files(client, prompt: str, file_parts: List[Dict], instruction: str, label: str,
+                              estimated_tokens: Optional[int] = None) -> str:
+    """
+    Run a request over the prompt, the planned file parts and the instruction. When Gemini no longer
+    has one of the cached files, the handles are forgotten and the files re-uploaded for one more try.
+    """
+    for attempt in range(2):
+        file_contents, handles = await build_contents(client, file_parts)
+        contents = [prompt, *file_contents, instruction]
+        try:
+            return await generate_content(client, contents, label, estimated_tokens)
+        except Exception as e:
+            if attempt or not handles or not is_stale_handle_error(e):
+                raise
+            print(f"      ♻️  Gemini rejected a cached file handle ({e}), re-uploading {len(handles)} files")
+            for handle in handles:
+                gemini_file_cache.forget(handle["content_hash"])
+
+
+async def normalize_single(client, plan: Dict) -> str:
+    """Normalize the whole submission in one request"""
+    print(f"      📊 Total content parts: {len(plan['file_parts']) + 2} (~{plan['total_tokens']} tokens)")
+    return await generate_with_files(client, plan["prompt"], plan["file_parts"], plan["instruction"],
+                                     "normalize", plan["total_tokens"])
+
+
+async def merge_partials(client, prompt: str, partials: List[str], instruction: str,
+                         labels: Optional[List[str]] = None) -> str:
+    """Reduce step: combine per-part notes with the prompt into the final normalized text"""
+    labels = labels or [f"Part {i + 1}" for i in range(len(partials))]
+    sections = [f"--- {label} ---\n{text}" for label, text in zip(labels, partials)]
+    contents = [prompt, MERGE_INSTRUCTION_HEADER, "\n\n".join(sections), instruction]
+    estimated = sum(len(str(c)) for c in contents) // 4
+    return await generate_content(client, contents, "normalize_merge", estimated)
+
+
+async def map_reduce_normalize(client, plan: Dict, batches: List[List[Dict]]) -> str:
+    """Normalize each batch in parallel Gemini calls, then merge the partial notes"""
+    semaphore = asyncio.Semaphore(settings.gemini_max_parallel_calls)
+
+    async def normalize_batch(index: int, batch: List[Dict]) -> str:
+        async with semaphore:
+            names = ", ".join(Path(part["path"]).name for part in batch)
+            print(f"      🧩 Normalizing batch {index + 1}/{len(batches)}: {names}")
+            estimated = plan["fixed_tokens"] + sum(part["tokens"] for part in batch)
+            return await generate_with_files(client, plan["prompt"], batch, PARTIAL_INSTRUCTION,
+                                             "normalize_map", estimated)
+
+    partials = await asyncio.gather(*(normalize_batch(i, batch) for i, batch in enumerate(batches)))
+    print(f"      🔗 Merging {len(partials)} partial normalizations...")
+    return await merge_partials(client, plan["prompt"], partials, plan["instruction"])
+
+
+def file_notes_key(file_hash: str, prompt: str) -> str:
+    """Per-file notes depend on the file, the prompt they were extracted for and the model"""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return f"{GEMINI_MODEL}:{file_hash}:{prompt_hash}"
+
+
+async def normalize_file(client, prompt: str, path: str, is_pdf: bool, semaphore: asyncio.Semaphore) -> str:
+    """Map step for one file, served from the per-file cache when the same file was seen before"""
+    name = Path(path).name
+    file_hash = await asyncio.to_thread(sha256_file, path)
+    key = file_notes_key(file_hash, prompt)
+    cached = local_cache.get(FILE_NOTES_NAMESPACE, key)
+    if cached is not None:
+        print(f"        ♻️  Reusing cached notes for {name}")
+        return cached
+
+    async with semaphore:
+        print(f"        🧩 Normalizing {name}...")
+        plan = await asyncio.to_thread(
+            prompt_assembler.plan, prompt, [path] if is_pdf else [], [] if is_pdf else [path], PARTIAL_INSTRUCTION
+        )
+        notes = await generate_with_files(client, prompt, plan["file_parts"], PARTIAL_INSTRUCTION,
+                                          "normalize_file", plan["total_tokens"])
+
+    local_cache.set(FILE_NOTES_NAMESPACE, key, notes, ttl=FILE_NOTES_TTL_SECONDS)
+    return notes
+
+
+async def normalize_per_file(client, prompt: str, pdf_paths: List[str], image_paths: List[str]) -> str:
+    """Normalize every file in its own concurrent request and merge the per-file notes with the prompt"""
+    files = [(path, True) for path in pdf_paths] + [(path, False) for path in image_paths]
+    if not files:
+        plan = await asyncio.to_thread(prompt_assembler.plan, prompt, [], [], NORMALIZATION_INSTRUCTION)
+        return await normalize_single(client, plan)
+
+    semaphore = asyncio.Semaphore(settings.gemini_max_parallel_calls)
+    results = await asyncio.gather(
+        *(normalize_file(client, prompt, path, is_pdf, semaphore) for path, is_pdf in files),
+        return_exceptions=True,
+    )
+
+    # A file that fails to normalize is left out instead of failing the whole session
+    partials, labels = [], []
+    for (path, _), result in zip(files, results):
+        if isinstance(result, Exception):
+            print(f"        ❌ Skipping {Path(path).name}: {result}")
+            continue
+        partials.append(result)
+        labels.append(f"File: {Path(path).name}")
+
+    if not partials:
+        raise Exception("Every file failed to normalize")
+
+    print(f"      🔗 Merging notes from {len(partials)}/{len(files)} files...")
+    return await merge_partials(client, prompt, partials, NORMALIZATION_INSTRUCTION, labels)
+
+
+async def prepare_file_notes(client, prompt: str, pdf_paths: List[str], image_paths: List[str]) -> int:
+    """
+    Produce the per-file notes of a submission normalized in one request, so a later update of the
+    session re-normalizes only its new or changed files; returns how many files have notes
+    """
+    files = [(path, True) for path in pdf_paths] + [(path, False) for path in image_paths]
+    semaphore = asyncio.Semaphore(settings.gemini_max_parallel_calls)
+    results = await asyncio.gather(
+        *(normalize_file(client, prompt, path, is_pdf, semaphore) for path, is_pdf in files),
+        return_exceptions=True,
+    )
+    for (path, _), result in zip(files, results):
+        if isinstance(result, Exception):
+            print(f"        ⚠️  No notes for {Path(path).name}, an update will re-normalize it: {result}")
+    return sum(1 for result in results if not isinstance(result, Exception))
+
+
+def normalization_key(prompt: str, pdf_hashes: List[str], image_hashes: List[str], mode: str) -> str:
+    """Whole-submission cache key: same prompt, same files and same mode give the same normalization"""
+    digest = hashlib.sha256()
+    for value in [GEMINI_MODEL, mode, prompt, *sorted(pdf_hashes), "|", *sorted(image_hashes)]:
+        digest.update(value.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+async def normalize(client, prompt: str, pdf_paths: List[str], image_paths: List[str],
+                    mode: Optional[str] = None) -> str:
+    """
+    Normalize a submission, served from the shared cache when the exact same prompt and files were
+    normalized before (by any worker)
+    """
+    mode = mode or DEFAULT_NORMALIZATION_MODE
+    if mode not in NORMALIZATION_MODES:
+        raise ValueError(f"Unknown normalization mode '{mode}', expected one of {NORMALIZATION_MODES}")
+
+    pdf_hashes = await asyncio.gather(*(asyncio.to_thread(sha256_file, path) for path in pdf_paths))
+    image_hashes = await asyncio.gather(*(asyncio.to_thread(sha256_file, path) for path in image_paths))
+    key = normalization_key(prompt, list(pdf_hashes), list(image_hashes), mode)
+    cached = local_cache.get(NORMALIZED_NAMESPACE, key)
+    if cached is not None:
+        print("      ♻️  Reusing cached normalization for identical submission")
+        return cached
+
+    normalized_text = await normalize_uncached(client, prompt, pdf_paths, image_paths, mode)
+    local_cache.set(NORMALIZED_NAMESPACE, key, normalized_text, ttl=NORMALIZED_TTL_SECONDS)
+    return normalized_text
+
+
+async def normalize_uncached(client, prompt: str, pdf_paths: List[str], image_paths: List[str], mode: str) -> str:
+    """Assemble a token-budgeted request and normalize it, falling back to map-reduce when it can't fit"""
+    if mode == "per_file":
+        print(f"      🗺️  Per-file normalization of {len(pdf_paths) + len(image_paths)} files")
+        return await normalize_per_file(client, prompt, pdf_paths, image_paths)
+
+    # Page counting and PDF text extraction are CPU-bound, so they stay off the event loop
+    plan = await asyncio.to_thread(prompt_assembler.plan, prompt, pdf_paths, image_paths, NORMALIZATION_INSTRUCTION)
+    print(f"      🧮 Estimated {plan['total_tokens']} tokens (budget {plan['budget']})")
+    if plan["compressed"]:
+        print(f"      ✂️  Compressed PDFs: {', '.join(plan['compressed'])}")
+
+    if plan["fits"]:
+        return await normalize_single(client, plan)
+
+    batches = prompt_assembler.batches(plan)
+    print(f"      🗺️  Over budget, falling back to map-reduce across {len(batches)} batches")
+    return await map_reduce_normalize(client, plan, batches)
@@ -0,0 +1,307 @@
+"""
+Embedded local vector index used as an offline / low-latency search backend
+
+A NumPy brute-force cosine index over a snapshot of NormalizedDocuments:
+- vectors.npy is memory-mapped from disk, objects.jsonl holds the properties
+- new documents are appended to deltas.jsonl and searched alongside the snapshot
+  until the next compaction, so the index stays in sync incrementally
+- once the log holds LOCAL_INDEX_COMPACT_DELTAS records it is folded into a new
+  snapshot in the background; appends and compaction take an exclusive lock on
+  index.lock, so no worker's append is lost when the log is cleared
+
+It exposes the same search_documents() signature as WeaviateService. Query
+vectors come from the local embedder, so it requires EMBEDDING_BACKEND=local
+(documents and queries must share the embedding model).
+"""
+
+import json
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import settings
+from services.embeddings import local_embedder
+from services.projection import project_object, to_jsonable
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process locking only
+    fcntl = None
+
+# Shaped like a Weaviate object so results go through the same projection
+IndexedObject = namedtuple("IndexedObject", ["uuid", "properties", "metadata"])
+IndexedMetadata = namedtuple("IndexedMetadata", ["distance", "score"])
+
+
+class LocalVectorIndex:
+    def __init__(self, index_dir: Optional[str] = None):
+        self.index_dir = Path(index_dir or settings.local_index_dir)
+        self.ready = False
+        self._snapshot = None        # memory-mapped (N, D) float32 matrix
+        self._snapshot_norms = None
+        self._snapshot_mtime = None
+        self._delta_vectors: List = []
+        self._delta_matrix = None
+        self._delta_offset = 0
+        self._objects: List[Dict] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._deleted = set()
+        self._lock = threading.RLock()
+        self._compacting = False
+
+    @property
+    def size(self) -> int:
+        return len(self._row_by_id)
+
+    @property
+    def has_snapshot(self) -> bool:
+        return self._snapshot is not None
+
+    def _paths(self):
+        return (
+            self.index_dir / "vectors.npy",
+            self.index_dir / "objects.jsonl",
+            self.index_dir / "deltas.jsonl",
+        )
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock on index.lock shared by every worker process (appends vs. compaction)"""
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.index_dir / "index.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def load(self) -> int:
+        """Memory-map the snapshot (if any) and replay the delta log; returns the number of documents"""
+        import numpy as np
+
+        vectors_path, objects_path, _ = self._paths()
+        with self._lock:
+            self._snapshot = None
+            self._snapshot_norms = None
+            self._snapshot_mtime = None
+            self._objects = []
+            if vectors_path.exists() and objects_path.exists():
+                snapshot = np.load(vectors_path, mmap_mode="r")
+                with open(objects_path, "r", encoding="utf-8") as f:
+                    objects = [json.loads(line) for line in f if line.strip()]
+                if len(objects) != snapshot.shape[0]:
+                    raise ValueError(f"Local index is inconsistent: {len(objects)} objects, {snapshot.shape[0]} vectors")
+                self._snapshot = snapshot
+                self._snapshot_norms = np.linalg.norm(snapshot, axis=1)
+                self._snapshot_mtime = vectors_path.stat().st_mtime_ns
+                self._objects = objects
+
+            self._row_by_id = {obj["id"]: row for row, obj in enumerate(self._objects)}
+            self._delta_vectors = []
+            self._delta_matrix = None
+            self._delta_offset = 0
+            self._deleted = set()
+            self._read_deltas()
+            self.ready = True
+        print(f"📦 Loaded local vector index: {self.size} documents from {self.index_dir}")
+        return self.size
+
+    def _read_deltas(self):
+        """Apply complete lines appended to the delta log since the last read"""
+        deltas_path = self._paths()[2]
+        if not deltas_path.exists():
+            return
+        with open(deltas_path, "rb") as f:
+            f.seek(self._delta_offset)
+            data = f.read()
+        # A line still being written by another worker is picked up on the next sync
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                delta = json.loads(line)
+                self._apply(delta["id"], delta["vector"], delta["properties"])
+        self._delta_offset += end
+
+    def sync(self):
+        """Pick up a compaction or delta lines written by this or another worker process"""
+        vectors_path, _, deltas_path = self._paths()
+        try:
+            snapshot_mtime = vectors_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            snapshot_mtime = None
+        with self._lock:
+            if snapshot_mtime != self._snapshot_mtime:
+                self.load()
+                return
+            try:
+                delta_size = deltas_path.stat().st_size
+            except FileNotFoundError:
+                delta_size = 0
+            if delta_size > self._delta_offset:
+                self._read_deltas()
+
+    def _apply(self, object_id: str, vector: List[float], properties: Dict):
+        import numpy as np
+
+        if object_id in self._row_by_id:
+            self._deleted.add(self._row_by_id[object_id])
+        self._objects.append({"id": object_id, "properties": properties})
+        self._delta_vectors.append(np.asarray(vector, dtype=np.float32))
+        self._delta_matrix = None
+        self._row_by_id[object_id] = len(self._objects) - 1
+
+    def add(self, object_id: str, vector: List[float], properties: Dict):
+        """Incrementally add or replace a document by appending it to the delta log"""
+        line = json.dumps({
+            "id": str(object_id),
+            "vector": [float(x) for x in vector],
+            "properties": {key: to_jsonable(value) for key, value in properties.items()},
+        }) + "\n"
+        # index.lock is always taken before self._lock (compaction holds both in that order)
+        with self._file_lock():
+            # One O_APPEND write per record so concurrent workers never interleave lines
+            fd = os.open(self._paths()[2], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+        with self._lock:
+            self.sync()
+            self.ready = True
+            if len(self._delta_vectors) >= settings.local_index_compact_deltas and not self._compacting:
+                # Off the ingest path: every sync() replays the whole log until it is folded in
+                self._compacting = True
+                threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"⚠️  Local index compaction failed: {e}")
+        finally:
+            self._compacting = False
+
+    def write_snapshot(self, objects: List[Dict], vectors):
+        """Atomically replace the snapshot with the given objects and vectors and clear the delta log"""
+        with self._file_lock():
+            self._write_snapshot(objects, vectors)
+
+    def _write_snapshot(self, objects: List[Dict], vectors):
+        """write_snapshot with index.lock already held"""
+        import numpy as np
+
+        vectors_path, objects_path, deltas_path = self._paths()
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        matrix = np.asarray(vectors, dtype=np.float32) if objects else np.zeros((0, 0), dtype=np.float32)
+
+        tmp_vectors = vectors_path.with_suffix(".tmp.npy")
+        tmp_objects = objects_path.with_suffix(".tmp")
+        np.save(tmp_vectors, matrix)
+        with open(tmp_objects, "w", encoding="utf-8") as f:
+            for obj in objects:
+                f.write(json.dumps(obj) + "\n")
+
+        with self._lock:
+            os.replace(tmp_objects, objects_path)
+            if deltas_path.exists():
+                deltas_path.unlink()
+            os.replace(tmp_vectors, vectors_path)
+            self.load()
+
+    def snapshot_from_weaviate(self, collection) -> int:
+        """Rebuild the snapshot by iterating every object (with its vector) in a Weaviate collection"""
+        objects, vectors = [], []
+        for obj in collection.iterator(include_vector=True):
+            vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+            if not vector:
+                continue
+            objects.append({
+                "id": str(obj.uuid),
+                "properties": {key: to_jsonable(value) for key, value in (obj.properties or {}).items()},
+            })
+            vectors.append(vector)
+        self.write_snapshot(objects, vectors)
+        return len(objects)
+
+    def compact(self):
+        """Fold the delta log and replaced rows into a fresh snapshot"""
+        # Held from the final sync until the log is cleared, so no append lands in between
+        with self._file_lock():
+            with self._lock:
+                self.sync()
+                if not self._delta_vectors:
+                    return
+                live_rows = sorted(self._row_by_id.values())
+                objects = [self._objects[row] for row in live_rows]
+                vectors = [self._vector(row) for row in live_rows]
+            self._write_snapshot(objects, vectors)
+
+    def _snapshot_rows(self) -> int:
+        return 0 if self._snapshot is None else self._snapshot.shape[0]
+
+    def _vector(self, row: int):
+        if row < self._snapshot_rows():
+            return self._snapshot[row]
+        return self._delta_vectors[row - self._snapshot_rows()]
+
+    def search_vector(self, vector: List[float], limit: int):
+        """Exact top-k (object, cosine similarity) pairs over the snapshot and the delta rows"""
+        import numpy as np
+
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+        with self._lock:
+            parts = []
+            if self._snapshot_rows():
+                parts.append((self._snapshot @ query) / np.clip(self._snapshot_norms, 1e-12, None))
+            if self._delta_vectors:
+                if self._delta_matrix is None:
+                    deltas = np.vstack(self._delta_vectors)
+                    self._delta_matrix = (deltas, np.clip(np.linalg.norm(deltas, axis=1), 1e-12, None))
+                deltas, norms = self._delta_matrix
+                parts.append((deltas @ query) / norms)
+            if not parts:
+                return []
+            scores = np.concatenate(parts)
+            if self._deleted:
+                scores[list(self._deleted)] = -np.inf
+
+            k = min(limit, len(scores) - len(self._deleted))
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            # Rows are only meaningful under the lock: a concurrent compaction renumbers them
+            return [(self._objects[row], float(scores[row])) for row in top]
+
+    def search_documents(self, query: str, limit: int = 5, raise_errors: bool = False,
+                         properties: Optional[List[str]] = None,
+                         snippet_chars: Optional[int] = None,
+                         max_passages: int = 0) -> List[Dict]:
+        """Same contract as WeaviateService.search_documents, answered in-process"""
+        try:
+            if not self.ready:
+                raise ValueError("Local vector index is not loaded")
+            self.sync()
+
+            hits = self.search_vector(local_embedder.embed_query(query), limit)
+            results = []
+            for obj, similarity in hits:
+                indexed = IndexedObject(obj["id"], obj["properties"], IndexedMetadata(1.0 - similarity, None))
+                results.append(project_object(indexed, properties, snippet_chars, query=query, max_passages=max_passages))
+            return results
+
+        except Exception as e:
+            print(f"Error searching local index: {e}")
+            if raise_errors:
+                raise
+            return []
+
+# Global instance
+local_index = LocalVectorIndex()
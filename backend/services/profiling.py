@@ -0,0 +1,227 @@
+"""
+Opt-in request profiling (PROFILING_ENABLED=true)
+
+ProfilingMiddleware times every request and breaks it down into stages: each
+outbound call is recorded under its dependency name (gemini, weaviate, vapi)
+and routes can mark their own steps with `with stage("..."):`. Requests slower
+than PROFILE_SLOW_MS, or sent with an x-profile header carrying PROFILE_TOKEN,
+are kept: their stage breakdown is written to PROFILE_DIR as JSON next to a
+sampling profile (pyinstrument HTML when installed, otherwise a cProfile .prof
+readable with pstats/snakeviz). The newest PROFILE_RETENTION captures are kept.
+Only query parameter names are recorded, never their values.
+
+When profiling is disabled the middleware isn't installed and stage() is a
+context-variable lookup that returns immediately.
+"""
+
+import asyncio
+import contextvars
+import hmac
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from config import settings
+
+_current: contextvars.ContextVar[Optional[Dict]] = contextvars.ContextVar("profiling_request", default=None)
+_cprofile_lock = threading.Lock()
+_capture_ids = itertools.count()
+
+
+@contextmanager
+def stage(name: str):
+    """Add the time spent in the block to the current request's breakdown (no-op outside a profiled request)"""
+    record = _current.get()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        stats = record["stages"].setdefault(name, {"ms": 0.0, "count": 0})
+        # Concurrent calls of one stage add up, so a stage can exceed the request's wall time
+        stats["ms"] += elapsed_ms
+        stats["count"] += 1
+
+
+def _slug(path: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_")[:60] or "root"
+
+
+class RequestProfiler:
+    """Starts one sampling profile per request and renders it only if the request is kept"""
+
+    def __init__(self):
+        try:
+            from pyinstrument import Profiler
+            self._pyinstrument = Profiler
+        except ImportError:
+            self._pyinstrument = None
+
+    @property
+    def kind(self) -> str:
+        return "pyinstrument" if self._pyinstrument else "cprofile"
+
+    def start(self):
+        if self._pyinstrument:
+            profiler = self._pyinstrument(interval=settings.profile_interval_ms / 1000, async_mode="enabled")
+            profiler.start()
+            return profiler
+        # cProfile is process-wide deterministic tracing: one request at a time, the rest are only timed
+        if not _cprofile_lock.acquire(blocking=False):
+            return None
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            _cprofile_lock.release()
+            return None
+        return profiler
+
+    def stop(self, profiler):
+        if profiler is None:
+            return
+        if self._pyinstrument:
+            profiler.stop()
+        else:
+            profiler.disable()
+            _cprofile_lock.release()
+
+    def write(self, profiler, base: Path) -> Optional[str]:
+        if profiler is None:
+            return None
+        if self._pyinstrument:
+            path = base.with_suffix(".html")
+            path.write_text(profiler.output_html(), encoding="utf-8")
+        else:
+            path = base.with_suffix(".prof")
+            profiler.dump_stats(str(path))
+        return path.name
+
+
+class ProfileStore:
+    def __init__(self, directory: Optional[Path] = None, retention: Optional[int] = None):
+        self.directory = Path(directory or settings.profile_dir)
+        self.retention = retention or settings.profile_retention
+        self.stats = {"requests": 0, "captured": 0, "forced": 0}
+
+    def save(self, record: Dict, profiler, request_profiler: RequestProfiler):
+        """Write the request's breakdown (and profile) and drop the oldest captures beyond retention"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{record['method']}-{_slug(record['path'])}-{int(record['duration_ms'])}ms-{next(_capture_ids)}"
+        base = self.directory / name
+        record["profile"] = request_profiler.write(profiler, base)
+        with open(base.with_suffix(".json"), "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        self.enforce_retention()
+
+    def enforce_retention(self):
+        captures = sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in captures[self.retention:]:
+            for path in self.directory.glob(f"{stale.stem}.*"):
+                path.unlink(missing_ok=True)
+
+    def slowest(self, limit: int = 20, since_seconds: Optional[float] = None, path: Optional[str] = None) -> List[Dict]:
+        """Captured requests (from every worker) ordered by duration, slowest first"""
+        if not self.directory.exists():
+            return []
+        cutoff = time.time() - since_seconds if since_seconds else None
+        records = []
+        for capture in self.directory.glob("*.json"):
+            try:
+                with open(capture, "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if cutoff and record["started_at"] < cutoff:
+                continue
+            if path and not record["path"].startswith(path):
+                continue
+            record["stages"] = dict(sorted(record["stages"].items(), key=lambda item: -item[1]["ms"]))
+            records.append(record)
+        records.sort(key=lambda record: -record["duration_ms"])
+        return records[:limit]
+
+    def resolve(self, name: str) -> Optional[Path]:
+        """Path of a capture file by name, refusing anything outside the profile directory"""
+        path = (self.directory / name).resolve()
+        if path.parent != self.directory.resolve() or not path.is_file():
+            return None
+        return path
+
+    def metrics(self) -> Dict:
+        return {**self.stats, "directory": str(self.directory), "slow_ms": settings.profile_slow_ms}
+
+
+class ProfilingMiddleware:
+    """ASGI middleware (only installed when PROFILING_ENABLED=true)"""
+
+    def __init__(self, app):
+        self.app = app
+        self.profiler = RequestProfiler()
+
+    def forced(self, scope) -> bool:
+        """x-profile forces a capture only when it carries PROFILE_TOKEN (ignored while no token is set)"""
+        token = settings.profile_token
+        if not token:
+            return False
+        for key, value in scope.get("headers", []):
+            if key == b"x-profile":
+                return hmac.compare_digest(value.decode("latin-1"), token)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        forced = self.forced(scope)
+        record = {
+            "method": scope["method"],
+            "path": scope["path"],
+            # Parameter names only: values can carry prompts, phone numbers or session IDs
+            "query": "&".join(name for name, _ in parse_qsl(scope.get("query_string", b"").decode("latin-1")))[:200],
+            "status": None,
+            "started_at": time.time(),
+            "forced": forced,
+            "stages": {},
+        }
+        token = _current.set(record)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                record["status"] = message["status"]
+            await send(message)
+
+        profiler = self.profiler.start() if forced or settings.profile_sample_all else None
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            self.profiler.stop(profiler)
+            _current.reset(token)
+            profile_store.stats["requests"] += 1
+            if forced or record["duration_ms"] >= settings.profile_slow_ms:
+                profile_store.stats["captured"] += 1
+                profile_store.stats["forced"] += forced
+                for stats in record["stages"].values():
+                    stats["ms"] = round(stats["ms"], 1)
+                record["profiler"] = self.profiler.kind if profiler is not None else None
+                try:
+                    # Rendering and writing the profile stays off the event loop
+                    await asyncio.to_thread(profile_store.save, record, profiler, self.profiler)
+                except OSError as e:
+                    print(f"⚠️  Could not save request profile: {e}")
+
+# Global instance
+profile_store = ProfileStore()
@@ -0,0 +1,92 @@
+"""
+Projection of Weaviate objects into plain, JSON-ready dicts
+
+Only the requested properties are fetched from Weaviate, the large
+normalized_content is reduced to a snippet computed once per object, and
+values are converted without a per-property str() pass so responses can be
+serialized directly with orjson.
+"""
+
+from typing import Any, Dict, List, Optional
+
+from services.snippets import DEFAULT_PASSAGE_CHARS, extract_passages
+
+CONTENT_PROPERTY = "normalized_content"
+
+# Returned by /weaviate/search unless the caller asks for specific properties
+SEARCH_PROPERTIES = ["session_id", "original_prompt", "pdf_files", "image_files", "total_files"]
+DEFAULT_SNIPPET_CHARS = 0
+DEFAULT_MAX_PASSAGES = 2
+
+
+def parse_properties(value: Optional[str], default: Optional[List[str]] = None) -> Optional[List[str]]:
+    """Parse a comma-separated `properties` query parameter"""
+    if not value:
+        return default
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + "..."
+
+
+def to_jsonable(value: Any) -> Any:
+    """Convert a property value to a JSON type, leaving primitives untouched"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_jsonable(item) for key, item in value.items()}
+    # UUIDs, dates and geo/phone types
+    return str(value)
+
+
+def fetch_properties(properties: Optional[List[str]], snippet_chars: Optional[int],
+                     max_passages: int = 0) -> Optional[List[str]]:
+    """Properties to request from Weaviate: the projection plus the content when snippets or passages are needed"""
+    if properties is None:
+        return None
+    if (snippet_chars or max_passages) and CONTENT_PROPERTY not in properties:
+        return list(properties) + [CONTENT_PROPERTY]
+    return list(properties)
+
+
+def project_metadata(metadata) -> Dict:
+    distance = getattr(metadata, "distance", None)
+    score = getattr(metadata, "score", None)
+    return {
+        "distance": float(distance) if distance is not None else None,
+        "score": float(score) if score is not None else None,
+    }
+
+
+def project_object(obj, properties: Optional[List[str]] = None, snippet_chars: Optional[int] = None,
+                   query: Optional[str] = None, max_passages: int = 0,
+                   passage_chars: int = DEFAULT_PASSAGE_CHARS) -> Dict:
+    """
+    Turn a Weaviate object into {"id", "properties", "metadata"[, "snippet"][, "passages"]}
+    properties: names to keep (None keeps everything that was fetched)
+    snippet_chars: add a truncated "snippet" of normalized_content
+    query/max_passages: add the best-matching "passages" of normalized_content with highlight offsets
+    """
+    source = obj.properties or {}
+    projected = {
+        key: to_jsonable(value)
+        for key, value in source.items()
+        if properties is None or key in properties
+    }
+    result = {
+        "id": str(obj.uuid),
+        "properties": projected,
+        "metadata": project_metadata(obj.metadata),
+    }
+    if snippet_chars:
+        result["snippet"] = truncate(source.get(CONTENT_PROPERTY) or "", snippet_chars)
+    if query and max_passages:
+        content = source.get(CONTENT_PROPERTY) or ""
+        result["passages"] = extract_passages(content, query, max_passages, passage_chars)
+        result["content_length"] = len(content)
+    return result
@@ -0,0 +1,210 @@
+"""
+Token-budget-aware prompt assembly for Gemini normalization
+
+Every part of a normalization request (prompt, files, instruction) is given a
+token estimate. Oversized PDFs are compressed by extractive page selection,
+and requests that still exceed the budget are split into batches for a
+map-reduce normalization.
+"""
+
+import math
+import re
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import settings
+from services.file_views import mapped_file
+
+# Gemini bills images and rendered PDF pages at a fixed token cost each
+TOKENS_PER_IMAGE = 258
+TOKENS_PER_PDF_PAGE = 258
+CHARS_PER_TOKEN = 4
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+PAGE_MARKER = re.compile(rb"/Type\s*/Page(?!s)")
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "are", "was", "from", "have", "has",
+    "about", "into", "how", "what", "its", "our", "your", "their", "will", "can", "you",
+}
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token)"""
+    if not text:
+        return 0
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN))
+
+
+def query_terms(text: str) -> set:
+    """Lower-cased content words used to score passages against the prompt"""
+    return {word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 2 and word not in STOPWORDS}
+
+
+def count_pdf_pages(path: str) -> int:
+    """Count PDF pages, using pypdf when installed and a byte scan otherwise (both over a memory map)"""
+    try:
+        from pypdf import PdfReader
+        # Given a path, pypdf would first read the whole file into a BytesIO
+        with mapped_file(path) as view:
+            return len(PdfReader(view).pages)
+    except ImportError:
+        pass
+    except Exception as e:
+        print(f"⚠️  pypdf could not read {Path(path).name}: {e}")
+
+    with mapped_file(path) as view:
+        return max(1, sum(1 for _ in PAGE_MARKER.finditer(view)))
+
+
+def extract_pdf_pages(path: str) -> Optional[List[str]]:
+    """Extract the text of every page, or None when pypdf is unavailable"""
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    try:
+        with mapped_file(path) as view:
+            return [page.extract_text() or "" for page in PdfReader(view).pages]
+    except Exception as e:
+        print(f"⚠️  Failed to extract text from {Path(path).name}: {e}")
+        return None
+
+
+def score_passage(text: str, terms: set) -> float:
+    """Score a passage by how many prompt terms it covers, normalized for length"""
+    words = WORD_PATTERN.findall(text.lower())
+    if not words or not terms:
+        return 0.0
+    hits = sum(1 for word in words if word in terms)
+    return hits / math.sqrt(len(words))
+
+
+def select_pdf_pages(pages: List[str], prompt: str, token_allowance: int) -> List[int]:
+    """Pick the highest-scoring pages that fit in the allowance, returned in document order"""
+    terms = query_terms(prompt)
+    ranked = sorted(range(len(pages)), key=lambda i: score_passage(pages[i], terms), reverse=True)
+
+    selected = []
+    used = 0
+    for index in ranked:
+        cost = estimate_text_tokens(pages[index])
+        if cost == 0:
+            continue
+        if used + cost > token_allowance:
+            continue
+        selected.append(index)
+        used += cost
+    return sorted(selected)
+
+
+class PromptAssembler:
+    def __init__(self, token_budget: Optional[int] = None, max_file_share: Optional[float] = None):
+        self.token_budget = token_budget or settings.gemini_token_budget
+        # Largest fraction of the file allowance a single PDF may take before it is compressed
+        self.max_file_share = max_file_share or settings.gemini_max_file_share
+
+    def plan(self, prompt: str, pdf_paths: List[str], image_paths: List[str], instruction: str) -> Dict:
+        """Count tokens per part, compress oversized PDFs and report whether the request fits"""
+        fixed_tokens = estimate_text_tokens(prompt) + estimate_text_tokens(instruction)
+        file_allowance = max(self.token_budget - fixed_tokens, 0)
+        per_file_cap = int(file_allowance * self.max_file_share)
+
+        file_parts = []
+        compressed = []
+        for pdf_path in pdf_paths:
+            pages = count_pdf_pages(pdf_path)
+            part = {"kind": "file", "path": pdf_path, "tokens": pages * TOKENS_PER_PDF_PAGE, "pages": pages}
+            if part["tokens"] > per_file_cap:
+                compressed_part = self._compress_pdf(pdf_path, prompt, per_file_cap)
+                if compressed_part:
+                    part = compressed_part
+                    compressed.append(Path(pdf_path).name)
+            file_parts.append(part)
+
+        for image_path in image_paths:
+            file_parts.append({"kind": "file", "path": image_path, "tokens": TOKENS_PER_IMAGE})
+
+        total_tokens = fixed_tokens + sum(part["tokens"] for part in file_parts)
+        return {
+            "prompt": prompt,
+            "instruction": instruction,
+            "file_parts": file_parts,
+            "fixed_tokens": fixed_tokens,
+            "total_tokens": total_tokens,
+            "budget": self.token_budget,
+            "fits": total_tokens <= self.token_budget,
+            "compressed": compressed,
+        }
+
+    def _compress_pdf(self, pdf_path: str, prompt: str, token_allowance: int) -> Optional[Dict]:
+        """Replace a PDF with the text of its most prompt-relevant pages"""
+        pages = extract_pdf_pages(pdf_path)
+        if not pages or not any(page.strip() for page in pages):
+            return None
+
+        selected = select_pdf_pages(pages, prompt, token_allowance)
+        if not selected:
+            return None
+
+        name = Path(pdf_path).name
+        header = f"[Extracted pages {', '.join(str(i + 1) for i in selected)} of {len(pages)} from PDF file: {name}]"
+        text = "\n\n".join([header] + [f"--- Page {i + 1} ---\n{pages[i]}" for i in selected])
+        print(f"      ✂️  Compressed {name}: kept {len(selected)}/{len(pages)} pages")
+        return {"kind": "text", "path": pdf_path, "text": text, "tokens": estimate_text_tokens(text)}
+
+    def batches(self, plan: Dict) -> List[List[Dict]]:
+        """Greedily pack file parts into batches that each fit next to the prompt and instruction"""
+        allowance = max(plan["budget"] - plan["fixed_tokens"], 1)
+        batches: List[List[Dict]] = []
+        current: List[Dict] = []
+        used = 0
+        for part in sorted(plan["file_parts"], key=lambda p: p["tokens"], reverse=True):
+            if current and used + part["tokens"] > allowance:
+                batches.append(current)
+                current, used = [], 0
+            current.append(part)
+            used += part["tokens"]
+        if current:
+            batches.append(current)
+        return batches
+
+
+class GeminiUsageRecorder:
+    def __init__(self, max_entries: int = 500):
+        self.entries = deque(maxlen=max_entries)
+
+    def record(self, label: str, model: str, usage_metadata, latency_ms: float,
+               estimated_tokens: Optional[int] = None):
+        """Record token usage and latency for a single Gemini request"""
+        entry = {
+            "label": label,
+            "model": model,
+            "timestamp": time.time(),
+            "latency_ms": round(latency_ms, 1),
+            "estimated_tokens": estimated_tokens,
+            "prompt_tokens": getattr(usage_metadata, "prompt_token_count", None),
+            "output_tokens": getattr(usage_metadata, "candidates_token_count", None),
+            "total_tokens": getattr(usage_metadata, "total_token_count", None),
+        }
+        self.entries.append(entry)
+        print(f"      📈 Gemini {label}: {entry['total_tokens']} tokens in {entry['latency_ms']} ms")
+        return entry
+
+    def summary(self) -> Dict:
+        """Aggregate usage over the recorded window"""
+        entries = list(self.entries)
+        by_label: Dict[str, Dict] = {}
+        for entry in entries:
+            stats = by_label.setdefault(entry["label"], {"requests": 0, "total_tokens": 0, "latency_ms": 0.0})
+            stats["requests"] += 1
+            stats["total_tokens"] += entry["total_tokens"] or 0
+            stats["latency_ms"] += entry["latency_ms"]
+        for stats in by_label.values():
+            stats["avg_latency_ms"] = round(stats.pop("latency_ms") / stats["requests"], 1)
+        return {"requests": len(entries), "by_label": by_label, "recent": entries[-20:]}
+
+# Global instances
+prompt_assembler = PromptAssembler()
+gemini_usage = GeminiUsageRecorder()
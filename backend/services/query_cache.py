@@ -0,0 +1,318 @@
+"""
+Cache of consultation prompt -> focused Weaviate query
+
+Turning a consultation prompt into a focused search query costs a Gemini round
+trip, but prompts repeat and cluster heavily. Generated queries are kept in a
+local SQLite table (shared by all workers) and looked up exactly (normalized
+prompt hash) and then semantically: cosine similarity of local prompt
+embeddings when EMBEDDING_BACKEND=local, otherwise Jaccard similarity of the
+prompts' keywords. On a miss Gemini gets a latency budget; when it runs over
+(or fails) a keyword query built from the prompt is returned straight away
+and the Gemini result, once it arrives, is cached for the next similar call.
+
+Precompute queries for the prompts of already stored sessions with:
+    python -m services.query_cache warm [--limit 500]
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from services.embeddings import local_embedder, use_local_embeddings
+from services.resilience import outbound
+
+WORD_PATTERN = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his how
+i if in into is it its itself just me more most my no nor not now of off on once only or other our ours out over own
+please same she should so some such than that the their theirs them then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you your yours
+help need want like get make know think really looking trying company startup business
+""".split())
+MAX_KEYWORDS = 12
+# Keyword overlap needed for a lexical near match when there are no prompt embeddings
+LEXICAL_SIMILARITY = 0.8
+LATENCY_SAMPLES = 1000
+
+QUERY_GENERATION_TEMPLATE = """
+You are a query generation expert for a Weaviate vector database. Your task is to create a focused, specific query that will retrieve only the most relevant information from the database for a voice AI (VAPI) consultation.
+
+Original consultation prompt: "{prompt}"
+
+Based on this consultation prompt, generate a single, focused query that will:
+1. Retrieve only the most relevant context for the specific business challenge
+2. Focus on actionable insights and strategies
+3. Provide context that would be useful for a voice AI consultation
+4. Avoid generic information and focus on specific, actionable advice
+
+The query should be:
+- Specific to the business challenge mentioned
+- Focused on practical strategies and insights
+- Suitable for a voice AI to provide personalized advice
+- Concise but comprehensive
+
+Generate only the query text, nothing else.
+"""
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.lower().split())
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+def keywords(prompt: str) -> List[str]:
+    """Distinct non-stopword terms of the prompt, in order of first appearance"""
+    seen = {}
+    for word in WORD_PATTERN.findall(prompt.lower()):
+        if word not in STOPWORDS and len(word) > 2:
+            seen.setdefault(word, None)
+    return list(seen)
+
+
+def keyword_query(prompt: str) -> str:
+    """Local fallback query: the prompt's leading keywords, no model call"""
+    terms = keywords(prompt)[:MAX_KEYWORDS]
+    if not terms:
+        return f"Provide specific strategies and insights for: {prompt[:100]}"
+    return f"Provide specific strategies and insights for: {' '.join(terms)}"
+
+
+def percentile(values, pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 1)
+
+
+class FocusedQueryCache:
+    def __init__(self, db_path: Optional[str] = None, ttl_days: Optional[float] = None,
+                 similarity: Optional[float] = None, budget_ms: Optional[float] = None):
+        self.db_path = Path(db_path or settings.focused_query_db_path)
+        self.ttl_seconds = (ttl_days if ttl_days is not None else settings.focused_query_ttl_days) * 24 * 3600
+        self.similarity = similarity if similarity is not None else settings.focused_query_similarity
+        self.budget_ms = budget_ms if budget_ms is not None else settings.focused_query_budget_ms
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "generated": 0,
+                      "fallback_timeouts": 0, "fallback_errors": 0}
+        self._resolve_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._generation_ms = deque(maxlen=LATENCY_SAMPLES)
+        self._conn = None
+        self._lock = threading.Lock()
+        # In-process view of the table, reloaded when another worker adds entries
+        self._version = None
+        self._entries: Dict[str, Dict] = {}
+        self._keys: List[str] = []
+        self._matrix = None
+        self._pending: Dict[str, asyncio.Task] = {}
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database lazily and create the schema on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS focused_queries (
+                    prompt_key TEXT PRIMARY KEY,
+                    prompt TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    vector TEXT,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _embed(self, prompt: str) -> Optional[List[float]]:
+        if not use_local_embeddings():
+            return None
+        try:
+            return local_embedder.embed_query(normalize_prompt(prompt))
+        except Exception as e:
+            print(f"⚠️  Prompt embedding unavailable, using keyword matching: {e}")
+            return None
+
+    def _refresh(self, conn: sqlite3.Connection):
+        """Reload the in-process entries if the table changed (called with the lock held)"""
+        version = conn.execute("SELECT COUNT(*), MAX(rowid), MAX(created_at) FROM focused_queries").fetchone()
+        if version == self._version:
+            return
+        rows = conn.execute(
+            "SELECT prompt_key, prompt, query, vector FROM focused_queries WHERE created_at >= ?",
+            (time.time() - self.ttl_seconds,),
+        ).fetchall()
+        self._entries = {
+            key: {"query": query, "terms": frozenset(keywords(prompt)), "vector": json.loads(vector) if vector else None}
+            for key, prompt, query, vector in rows
+        }
+        self._keys = [key for key, entry in self._entries.items() if entry["vector"] is not None]
+        if self._keys:
+            import numpy as np
+            self._matrix = np.asarray([self._entries[key]["vector"] for key in self._keys], dtype=np.float32)
+        else:
+            self._matrix = None
+        self._version = version
+
+    def lookup(self, prompt: str) -> Tuple[Optional[str], Optional[str]]:
+        """(query, "exact" | "semantic") for a cached prompt, or (None, None)"""
+        key = prompt_key(prompt)
+        with self._lock:
+            self._refresh(self._connection())
+            if key in self._entries:
+                return self._entries[key]["query"], "exact"
+            entries, keys, matrix = self._entries, self._keys, self._matrix
+
+        vector = self._embed(prompt) if matrix is not None else None
+        if vector is not None:
+            import numpy as np
+            scores = matrix @ np.asarray(vector, dtype=np.float32)
+            best = int(scores.argmax())
+            if scores[best] >= self.similarity:
+                return entries[keys[best]]["query"], "semantic"
+            return None, None
+
+        terms = frozenset(keywords(prompt))
+        if not terms:
+            return None, None
+        best_query, best_score = None, 0.0
+        for entry in entries.values():
+            if entry["terms"]:
+                score = len(terms & entry["terms"]) / len(terms | entry["terms"])
+                if score > best_score:
+                    best_query, best_score = entry["query"], score
+        return (best_query, "semantic") if best_score >= LEXICAL_SIMILARITY else (None, None)
+
+    def store(self, prompt: str, query: str):
+        vector = self._embed(prompt)
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO focused_queries (prompt_key, prompt, query, vector, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (prompt_key(prompt), prompt, query, json.dumps(vector) if vector is not None else None, time.time()),
+            )
+            self._connection().execute(
+                "DELETE FROM focused_queries WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._connection().commit()
+
+    async def _generate_and_store(self, prompt: str, generate: Callable[[str], Awaitable[str]]) -> str:
+        start = time.perf_counter()
+        query = (await generate(prompt)).strip()
+        self._generation_ms.append((time.perf_counter() - start) * 1000)
+        if not query:
+            raise ValueError("empty focused query")
+        await asyncio.to_thread(self.store, prompt, query)
+        self.stats["generated"] += 1
+        return query
+
+    async def resolve(self, prompt: str, generate: Callable[[str], Awaitable[str]]) -> Tuple[str, str]:
+        """
+        Focused query for a prompt and where it came from: "exact", "semantic",
+        "generated", "fallback_timeout" or "fallback_error"
+        A generation that overruns the budget keeps running in the background and
+        is cached when it completes; concurrent misses for the same prompt share it.
+        """
+        start = time.perf_counter()
+        try:
+            query, source = await asyncio.to_thread(self.lookup, prompt)
+            if query is not None:
+                self.stats[f"{source}_hits"] += 1
+                return query, source
+
+            self.stats["misses"] += 1
+            key = prompt_key(prompt)
+            task = self._pending.get(key)
+            if task is None:
+                task = asyncio.ensure_future(self._generate_and_store(prompt, generate))
+                self._pending[key] = task
+                task.add_done_callback(lambda done: self._pending.pop(key, None))
+                # Retrieve a background failure so it is never reported as unhandled
+                task.add_done_callback(lambda done: done.cancelled() or done.exception())
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), self.budget_ms / 1000), "generated"
+            except asyncio.TimeoutError:
+                self.stats["fallback_timeouts"] += 1
+                source = "fallback_timeout"
+            except Exception as e:
+                print(f"      ❌ Error generating focused query: {str(e)}")
+                self.stats["fallback_errors"] += 1
+                source = "fallback_error"
+            outbound.record_fallback("gemini")
+            return keyword_query(prompt), source
+        finally:
+            self._resolve_ms.append((time.perf_counter() - start) * 1000)
+
+    def metrics(self) -> Dict:
+        lookups = self.stats["exact_hits"] + self.stats["semantic_hits"] + self.stats["misses"]
+        resolve_ms, generation_ms = list(self._resolve_ms), list(self._generation_ms)
+        return {
+            **self.stats,
+            "hit_rate": round((self.stats["exact_hits"] + self.stats["semantic_hits"]) / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+            "budget_ms": self.budget_ms,
+            "resolve_ms_p50": percentile(resolve_ms, 50),
+            "resolve_ms_p95": percentile(resolve_ms, 95),
+            "generation_ms_p50": percentile(generation_ms, 50),
+            "generation_ms_p95": percentile(generation_ms, 95),
+        }
+
+# Global instance
+focused_query_cache = FocusedQueryCache()
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+
+    from routes.weaviate import gemini_focused_query
+    from services.weaviate_service import weaviate_service
+
+    parser = argparse.ArgumentParser(description="Precompute focused queries for stored session prompts")
+    parser.add_argument("command", choices=["warm"])
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if not weaviate_service.connect():
+        raise SystemExit("Failed to connect to Weaviate")
+    try:
+        prompts = {}
+        for record in weaviate_service.iterate_documents(properties=["original_prompt"]):
+            prompt = record["properties"].get("original_prompt")
+            if prompt and focused_query_cache.lookup(prompt)[1] != "exact":
+                prompts.setdefault(prompt_key(prompt), prompt)
+            if len(prompts) >= args.limit:
+                break
+    finally:
+        weaviate_service.close()
+
+    async def warm():
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(prompt):
+            async with semaphore:
+                try:
+                    await focused_query_cache._generate_and_store(prompt, gemini_focused_query)
+                except Exception as e:
+                    print(f"⚠️  {prompt[:60]!r}: {e}")
+
+        await asyncio.gather(*(one(prompt) for prompt in prompts.values()))
+
+    asyncio.run(warm())
+    print(f"✅ Precomputed {focused_query_cache.stats['generated']} of {len(prompts)} focused queries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Cached dependency probes backing the /ready endpoint
+
+Probes run in the background on a fixed interval, so /ready only reads the
+last results and never makes a live call per hit.
+"""
+
+import asyncio
+import time
+from typing import Dict
+
+from config import settings
+from services.weaviate_service import weaviate_service
+
+
+class ReadinessProbes:
+    def __init__(self):
+        self.interval = settings.readiness_probe_interval
+        self.timeout = settings.readiness_probe_timeout
+        self.results: Dict[str, Dict] = {}
+        self.warmed_up = False
+
+    async def _probe(self, name: str, check) -> Dict:
+        start = time.perf_counter()
+        try:
+            ok = bool(await asyncio.wait_for(check(), self.timeout))
+            error = None if ok else "not ready"
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+        result = {
+            "ok": ok,
+            "error": error,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "checked_at": time.time(),
+        }
+        self.results[name] = result
+        return result
+
+    async def _check_weaviate(self) -> bool:
+        def check():
+            return weaviate_service.connect() and weaviate_service.client.is_ready()
+        return await asyncio.to_thread(check)
+
+    async def _check_gemini(self) -> bool:
+        from routes.weaviate import get_gemini_client
+        from services.gemini_normalizer import GEMINI_MODEL
+        await get_gemini_client().aio.models.get(model=GEMINI_MODEL)
+        return True
+
+    async def probe_all(self):
+        """Run every probe once, concurrently"""
+        probes = {"weaviate": self._check_weaviate}
+        if settings.gemini_api_key:
+            probes["gemini"] = self._check_gemini
+        await asyncio.gather(*(self._probe(name, check) for name, check in probes.items()))
+
+    async def probe_loop(self):
+        while True:
+            await self.probe_all()
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> Dict:
+        """Ready once warm-up has finished and every probed dependency answered its last probe"""
+        ready = self.warmed_up and bool(self.results) and all(r["ok"] for r in self.results.values())
+        return {"ready": ready, "warmed_up": self.warmed_up, "dependencies": self.results}
+
+# Global instance
+readiness = ReadinessProbes()
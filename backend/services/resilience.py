@@ -0,0 +1,270 @@
+"""
+Shared outbound-call layer for Gemini, Weaviate and VAPI
+
+Every call goes through per-dependency timeouts, exponential backoff with
+full jitter and a circuit breaker that fails fast while a dependency is down.
+Idempotent calls can additionally be hedged to trim tail latency. Only
+transient errors (timeouts, transport errors, 429 and 5xx) are retried and
+count against the breaker; anything else (4xx, bad filters, validation errors)
+is the caller's problem and is raised straight away.
+"""
+
+import asyncio
+import inspect
+import random
+import sys
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config import settings
+from services.profiling import stage
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the dependency while its circuit breaker is open"""
+
+
+class OutboundResultError(Exception):
+    """A response that was received but classified as a failure"""
+
+    def __init__(self, result: Any):
+        super().__init__(f"unsuccessful response: {getattr(result, 'status_code', result)}")
+        self.result = result
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status carried by an SDK or HTTP-client exception, if any"""
+    if isinstance(error, OutboundResultError):
+        error = error.result
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "code"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    return None
+
+
+def _library_errors(module: str, names) -> tuple:
+    """Exception classes of a library that is already imported (never imports it just to classify)"""
+    loaded = sys.modules.get(module)
+    return tuple(getattr(loaded, name) for name in names if loaded is not None and hasattr(loaded, name))
+
+
+def is_transient(error: BaseException) -> bool:
+    """Whether an error says the dependency is struggling (worth a retry and a breaker failure)"""
+    status = status_code(error)
+    if status is not None:
+        return status == 429 or status >= 500
+    # Sockets and requests' transport errors are OSErrors; builtin TimeoutError covers our own timeouts
+    if isinstance(error, (OSError, asyncio.TimeoutError)):
+        return True
+    if isinstance(error, _library_errors("httpx", ("TransportError",))):
+        return True
+    if isinstance(error, _library_errors("weaviate.exceptions", (
+            "WeaviateConnectionError", "WeaviateTimeoutError", "WeaviateGRPCUnavailableError"))):
+        return True
+    if isinstance(error, _library_errors("weaviate.exceptions", ("WeaviateQueryError",))):
+        # Query errors wrap the gRPC status: only an unreachable or overloaded cluster is transient
+        return any(code in str(error) for code in ("UNAVAILABLE", "DEADLINE_EXCEEDED", "RESOURCE_EXHAUSTED"))
+    return False
+
+
+class DependencyPolicy:
+    def __init__(self, name: str):
+        """Policy values come from the <name>_* settings (e.g. WEAVIATE_TIMEOUT, GEMINI_BREAKER_RESET)"""
+        self.name = name
+        self.timeout = getattr(settings, f"{name}_timeout")
+        self.max_retries = getattr(settings, f"{name}_max_retries")
+        self.base_delay = getattr(settings, f"{name}_retry_base_delay")
+        self.max_delay = getattr(settings, f"{name}_retry_max_delay")
+        self.failure_threshold = getattr(settings, f"{name}_breaker_threshold")
+        self.reset_timeout = getattr(settings, f"{name}_breaker_reset")
+        self.hedge_delay = getattr(settings, f"{name}_hedge_delay")
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at = 0.0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        """Closed lets everything through, open fails fast, half-open lets a single probe through"""
+        now = time.monotonic()
+        if self.state == "open":
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self.probe_started_at = now
+            return True
+        if self.state == "half_open":
+            # A probe is already in flight, unless it has been silent for a whole reset period
+            if now - self.probe_started_at < self.reset_timeout:
+                return False
+            self.probe_started_at = now
+            return True
+        return True
+
+    def abandon_probe(self):
+        """The probe ended without saying anything about the dependency (cancelled, caller error): probe again"""
+        if self.state == "half_open":
+            self.state = "open"
+            self.opened_at = time.monotonic() - self.reset_timeout
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.times_opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class OutboundClient:
+    def __init__(self):
+        self.policies: Dict[str, DependencyPolicy] = {
+            name: DependencyPolicy(name) for name in ("gemini", "weaviate", "vapi")
+        }
+        self.breakers: Dict[str, CircuitBreaker] = {
+            name: CircuitBreaker(policy.failure_threshold, policy.reset_timeout)
+            for name, policy in self.policies.items()
+        }
+        self.stats: Dict[str, Dict[str, int]] = {
+            name: {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "timeouts": 0,
+                   "short_circuited": 0, "hedged": 0, "hedge_wins": 0, "fallbacks": 0, "client_errors": 0}
+            for name in self.policies
+        }
+
+    async def _invoke(self, fn: Callable, args, kwargs, timeout: float) -> Any:
+        """
+        Run a sync or async callable under a timeout (sync callables run in a worker thread)
+        A timed-out worker thread can't be stopped, so SDK clients are also built with their own
+        timeouts (see WeaviateService._open_connection and get_gemini_client) to bound it.
+        """
+        if inspect.iscoroutinefunction(fn):
+            return await asyncio.wait_for(fn(*args, **kwargs), timeout)
+        return await asyncio.wait_for(asyncio.to_thread(fn, *args, **kwargs), timeout)
+
+    async def _hedged(self, name: str, fn: Callable, args, kwargs, policy: DependencyPolicy) -> Any:
+        """Start a second identical request if the first hasn't answered within the hedge delay"""
+        primary = asyncio.ensure_future(self._invoke(fn, args, kwargs, policy.timeout))
+        done, _ = await asyncio.wait({primary}, timeout=policy.hedge_delay)
+        if done:
+            return primary.result()
+
+        self.stats[name]["hedged"] += 1
+        hedge = asyncio.ensure_future(self._invoke(fn, args, kwargs, policy.timeout))
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        self.stats[name]["hedge_wins"] += 1
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def call(self, name: str, fn: Callable, *args, idempotent: bool = True, hedge: bool = False,
+                   is_failure: Optional[Callable[[Any], bool]] = None, **kwargs) -> Any:
+        """
+        Call a dependency with timeout, retries, circuit breaking and optional hedging
+        is_failure: optional check that treats a returned value (e.g. an HTTP 5xx response) as a failure
+        """
+        # Time spent on the dependency, retries and backoff included, in the profiling breakdown
+        with stage(name):
+            return await self._call(name, fn, args, kwargs, idempotent, hedge, is_failure)
+
+    async def _call(self, name: str, fn: Callable, args, kwargs, idempotent: bool, hedge: bool,
+                    is_failure: Optional[Callable[[Any], bool]]) -> Any:
+        policy = self.policies[name]
+        breaker = self.breakers[name]
+        stats = self.stats[name]
+        attempts = policy.max_retries + 1 if idempotent else 1
+
+        for attempt in range(attempts):
+            if not breaker.allow():
+                stats["short_circuited"] += 1
+                raise CircuitOpenError(f"{name} circuit breaker is open, failing fast")
+
+            stats["calls"] += 1
+            probe = breaker.state == "half_open"
+            recorded = False
+            error = None
+            try:
+                if hedge and idempotent:
+                    result = await self._hedged(name, fn, args, kwargs, policy)
+                else:
+                    result = await self._invoke(fn, args, kwargs, policy.timeout)
+                if is_failure and is_failure(result):
+                    raise OutboundResultError(result)
+                breaker.record_success()
+                recorded = True
+                stats["successes"] += 1
+                return result
+            except asyncio.TimeoutError:
+                stats["timeouts"] += 1
+                error = TimeoutError(f"{name} call timed out after {policy.timeout}s")
+            except OutboundResultError as e:
+                error = e
+            except Exception as e:
+                error = e
+            finally:
+                # A cancelled probe (or one failing on the caller's side) must not leave the breaker half-open
+                if probe and not recorded and (error is None or not is_transient(error)):
+                    breaker.abandon_probe()
+
+            if not is_transient(error):
+                stats["client_errors"] += 1
+                if isinstance(error, OutboundResultError):
+                    return error.result
+                raise error
+
+            stats["failures"] += 1
+            breaker.record_failure()
+            if attempt + 1 >= attempts:
+                if isinstance(error, OutboundResultError):
+                    # Hand the failing response back so callers can report it
+                    return error.result
+                raise error
+
+            delay = policy.backoff(attempt)
+            stats["retries"] += 1
+            print(f"⚠️  {name} call failed ({error}), retrying in {delay:.2f}s "
+                  f"(attempt {attempt + 2}/{attempts})")
+            await asyncio.sleep(delay)
+
+    def record_fallback(self, name: str):
+        """Count a caller-side fallback taken after the dependency failed"""
+        self.stats[name]["fallbacks"] += 1
+
+    def metrics(self) -> Dict:
+        """Breaker state and call counters per dependency"""
+        return {
+            name: {
+                **self.stats[name],
+                "breaker_state": self.breakers[name].state,
+                "breaker_opened": self.breakers[name].times_opened,
+                "consecutive_failures": self.breakers[name].consecutive_failures,
+                "timeout_seconds": self.policies[name].timeout,
+            }
+            for name in self.policies
+        }
+
+# Global instance
+outbound = OutboundClient()
@@ -0,0 +1,88 @@
+"""
+Per-session manifest of uploaded inputs
+
+uploads/<session_id>/manifest.json records the prompt, the normalization mode
+and a content hash for every file, so an update can diff the new inputs
+against what was already normalized and only redo the files that changed.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MANIFEST_NAME = "manifest.json"
+FILE_KINDS = ("pdfs", "images")
+
+
+def file_entry(filename: str, path: str, size: int, sha256: str) -> Dict:
+    return {
+        "filename": filename,
+        "size": size,
+        "path": str(path),
+        "sha256": sha256,
+    }
+
+
+def new_manifest(session_id: str, prompt: str, phone_number: Optional[str] = None,
+                 owner: Optional[str] = None) -> Dict:
+    return {
+        "session_id": session_id,
+        "prompt": prompt,
+        "phone_number": phone_number,
+        # Submitter (services/admission.py owner id); near-duplicates are only linked within one owner
+        "owner": owner,
+        "normalization_mode": None,
+        "normalized_sha256": None,
+        # True when the stored document doesn't reflect these inputs (e.g. a failed update)
+        "stale": False,
+        "pdfs": [],
+        "images": [],
+        "created_at": time.time(),
+        "updated_at": time.time(),
+    }
+
+
+def load_manifest(session_dir: Path) -> Optional[Dict]:
+    path = Path(session_dir) / MANIFEST_NAME
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(session_dir: Path, manifest: Dict):
+    """Write the manifest atomically so a crashed update never leaves a half-written file"""
+    path = Path(session_dir) / MANIFEST_NAME
+    tmp_path = path.with_suffix(".tmp")
+    manifest["updated_at"] = time.time()
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def diff_entry(manifest: Dict, kind: str, filename: str, sha256: str) -> str:
+    """"added", "changed" or "unchanged" for an incoming file compared with the manifest"""
+    for entry in manifest.get(kind, []):
+        if entry["filename"] == filename:
+            return "unchanged" if entry.get("sha256") == sha256 else "changed"
+    return "added"
+
+
+def upsert_entry(manifest: Dict, kind: str, entry: Dict):
+    entries: List[Dict] = manifest.setdefault(kind, [])
+    for i, existing in enumerate(entries):
+        if existing["filename"] == entry["filename"]:
+            entries[i] = entry
+            return
+    entries.append(entry)
+
+
+def remove_entry(manifest: Dict, filename: str) -> Optional[Dict]:
+    for kind in FILE_KINDS:
+        for entry in manifest.get(kind, []):
+            if entry["filename"] == filename:
+                manifest[kind].remove(entry)
+                return entry
+    return None
@@ -0,0 +1,122 @@
+"""
+Server-side passage extraction with highlight offsets
+
+Long normalized_content is split into sentences, each sentence is scored
+against the query, and only the best passages (with the character offsets of
+matched query terms) are returned to clients.
+"""
+
+import re
+from typing import Dict, List, Tuple
+
+from services.prompt_assembly import WORD_PATTERN, query_terms, score_passage
+
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+(?:[.!?]+|$)", re.MULTILINE)
+DEFAULT_PASSAGE_CHARS = 300
+DEFAULT_PAGE_CHARS = 2000
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of every non-empty sentence"""
+    spans = []
+    for match in SENTENCE_PATTERN.finditer(text):
+        start, end = match.span()
+        # Trim surrounding whitespace so offsets point at the sentence itself
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            spans.append((start, end))
+    return spans
+
+
+def highlight_offsets(text: str, terms: set, base: int = 0) -> List[List[int]]:
+    """Offsets of query-term matches inside text, shifted by base"""
+    return [
+        [base + match.start(), base + match.end()]
+        for match in WORD_PATTERN.finditer(text.lower())
+        if match.group() in terms
+    ]
+
+
+def extract_passages(text: str, query: str, max_passages: int = 3,
+                     max_chars: int = DEFAULT_PASSAGE_CHARS) -> List[Dict]:
+    """
+    Return the top-scoring passages for the query, in document order
+    Each passage is grown around its best sentence with neighbouring sentences up to max_chars.
+    Offsets (start/end and highlights) are relative to the full text.
+    """
+    if not text or max_passages <= 0:
+        return []
+    terms = query_terms(query)
+    spans = sentence_spans(text)
+    if not spans:
+        return []
+
+    scores = [score_passage(text[start:end], terms) for start, end in spans]
+    ranked = sorted(range(len(spans)), key=lambda i: scores[i], reverse=True)
+
+    used = set()
+    passages = []
+    for index in ranked:
+        if len(passages) >= max_passages:
+            break
+        if index in used or (passages and scores[index] == 0):
+            continue
+
+        first = last = index
+        # Extend with following, then preceding, sentences while the passage stays short enough
+        while last + 1 < len(spans) and last + 1 not in used and spans[last + 1][1] - spans[first][0] <= max_chars:
+            last += 1
+        while first - 1 >= 0 and first - 1 not in used and spans[last][1] - spans[first - 1][0] <= max_chars:
+            first -= 1
+        used.update(range(first, last + 1))
+
+        start, end = spans[first][0], spans[last][1]
+        if end - start > max_chars:
+            end = start + max_chars
+        passage_text = text[start:end]
+        passages.append({
+            "text": passage_text,
+            "start": start,
+            "end": end,
+            "score": round(scores[index], 4),
+            "highlights": highlight_offsets(passage_text, terms, base=start),
+        })
+
+    return sorted(passages, key=lambda p: p["start"])
+
+
+def page_text(text: str, page: int, query: str = "", page_chars: int = DEFAULT_PAGE_CHARS) -> Dict:
+    """Return one page of a long document, cut on sentence boundaries, with optional highlights"""
+    spans = sentence_spans(text) or ([(0, len(text))] if text else [])
+
+    pages: List[Tuple[int, int]] = []
+    page_start = page_end = None
+    for start, end in spans:
+        if page_start is None:
+            page_start, page_end = start, end
+        elif end - page_start > page_chars:
+            pages.append((page_start, page_end))
+            page_start, page_end = start, end
+        else:
+            page_end = end
+    if page_start is not None:
+        pages.append((page_start, page_end))
+
+    total_pages = len(pages)
+    if total_pages == 0 or page < 1 or page > total_pages:
+        return {"page": page, "total_pages": total_pages, "text": "", "start": 0, "end": 0, "highlights": []}
+
+    start, end = pages[page - 1]
+    chunk = text[start:end]
+    return {
+        "page": page,
+        "total_pages": total_pages,
+        "text": chunk,
+        "start": start,
+        "end": end,
+        "highlights": highlight_offsets(chunk, query_terms(query), base=start) if query else [],
+    }
+
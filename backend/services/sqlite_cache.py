@@ -0,0 +1,100 @@
+"""
+Small SQLite-backed key/value cache with namespaces and optional TTLs
+
+The database runs in WAL mode so several uvicorn worker processes can share
+it: readers never block the writer and each worker sees the others' entries.
+Expired entries are skipped on read and deleted by a periodic purge.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from config import settings
+
+
+class SQLiteCache:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = Path(db_path or settings.cache_db_path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database lazily and create the schema on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Return the cached value, or None when missing or expired"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+        if not row:
+            return None
+        if row[1] is not None and row[1] <= time.time():
+            self.delete(namespace, key)
+            return None
+        return json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a JSON-serializable value"""
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), expires_at),
+            )
+            self._connection().commit()
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._connection().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+            self._connection().commit()
+
+    def purge_expired(self) -> int:
+        """Remove every expired entry and return how many were dropped"""
+        with self._lock:
+            cursor = self._connection().execute(
+                "DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+            )
+            self._connection().commit()
+            return cursor.rowcount
+
+    async def purge_loop(self, interval: Optional[float] = None):
+        """Periodically delete expired entries in a worker thread"""
+        interval = interval or settings.cache_purge_interval
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                purged = await asyncio.to_thread(self.purge_expired)
+                if purged:
+                    print(f"🧹 Purged {purged} expired cache entries")
+            except Exception as e:
+                print(f"⚠️  Cache purge failed: {e}")
+
+# Global instance
+local_cache = SQLiteCache()
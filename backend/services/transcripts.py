@@ -0,0 +1,383 @@
+"""
+Consultation transcript ingestion
+
+VAPI posts an end-of-call report to the webhook when a consultation ends.
+Reports are queued durably in SQLite and acknowledged immediately; a
+background worker normalizes them with Gemini (falling back to the raw
+transcript) and batch-inserts them into the ConsultationTranscripts
+collection, linked to the session_id passed in the call metadata. Object IDs
+are derived from the VAPI call ID, so webhook retries are idempotent. Reports
+that fail MAX_ATTEMPTS times (or can't be read) are moved to failed_transcripts
+with their last error, so they stop counting as pending.
+"""
+
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import settings
+from services.embeddings import local_embedder, use_local_embeddings
+
+TRANSCRIPTS_COLLECTION = "ConsultationTranscripts"
+TRANSCRIPT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, TRANSCRIPTS_COLLECTION)
+# A claimed report that wasn't finished within this time is picked up again
+CLAIM_TIMEOUT_SECONDS = 600
+MAX_ATTEMPTS = 5
+
+TRANSCRIPT_INSTRUCTION = """
+Summarize this consultation call transcript for future calls with the same founder:
+the business context, the questions asked, the advice given, any decisions or
+commitments, and open follow-ups. Use concise bullet points, keep concrete
+facts and figures, and omit small talk.
+"""
+
+
+def parse_end_of_call_report(payload: Dict) -> Optional[Dict]:
+    """Extract the fields we store from a VAPI server message; None for other message types"""
+    message = payload.get("message", payload)
+    if message.get("type") != "end-of-call-report":
+        return None
+    call = message.get("call") or {}
+    artifact = message.get("artifact") or {}
+    metadata = call.get("metadata") or {}
+    analysis = message.get("analysis") or {}
+    transcript = artifact.get("transcript") or message.get("transcript") or ""
+    call_id = call.get("id") or message.get("callId")
+    if not call_id or not transcript:
+        return None
+    return {
+        "call_id": call_id,
+        "session_id": metadata.get("session_id"),
+        "focused_query": metadata.get("focused_query"),
+        "phone_number": (call.get("customer") or {}).get("number"),
+        "transcript": transcript,
+        "vapi_summary": analysis.get("summary") or message.get("summary"),
+        "ended_reason": message.get("endedReason"),
+        "started_at": message.get("startedAt") or call.get("startedAt"),
+        "ended_at": message.get("endedAt") or call.get("endedAt"),
+    }
+
+
+def transcript_uuid(call_id: str) -> str:
+    return str(uuid.uuid5(TRANSCRIPT_NAMESPACE, call_id))
+
+
+class TranscriptPipeline:
+    def __init__(self, db_path: Optional[str] = None, batch_size: Optional[int] = None):
+        self.db_path = Path(db_path or settings.transcript_queue_db)
+        self.batch_size = batch_size or settings.transcript_batch_size
+        self.collection_ready = False
+        self.stats = {"received": 0, "ingested": 0, "normalization_fallbacks": 0, "failures": 0, "dead_lettered": 0}
+        self._conn = None
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the database lazily and create the schema on first use"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS pending_transcripts (
+                    call_id TEXT PRIMARY KEY,
+                    report TEXT NOT NULL,
+                    received_at REAL NOT NULL,
+                    claimed_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                );
+                CREATE TABLE IF NOT EXISTS failed_transcripts (
+                    call_id TEXT PRIMARY KEY,
+                    report TEXT NOT NULL,
+                    received_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    failed_at REAL NOT NULL
+                );
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    def enqueue(self, report: Dict):
+        """Persist a report for the background worker (a retried webhook replaces the pending copy)"""
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO pending_transcripts (call_id, report, received_at) VALUES (?, ?, ?)",
+                (report["call_id"], json.dumps(report), time.time()),
+            )
+            self._connection().commit()
+        self.stats["received"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def claim_batch(self) -> List[Dict]:
+        """
+        Claim up to batch_size pending reports; claims expire so a crashed worker's batch is retried
+        The claim is one IMMEDIATE transaction, so workers in other processes never claim the same reports.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Out of attempts and no longer claimed (e.g. the worker died on the last try)
+                self._dead_letter(conn, now)
+                rows = conn.execute(
+                    """
+                    SELECT call_id, report FROM pending_transcripts
+                    WHERE (claimed_at IS NULL OR claimed_at < ?) AND attempts < ?
+                    ORDER BY received_at LIMIT ?
+                    """,
+                    (now - CLAIM_TIMEOUT_SECONDS, MAX_ATTEMPTS, self.batch_size),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE pending_transcripts SET claimed_at = ?, attempts = attempts + 1 WHERE call_id = ?",
+                    [(now, call_id) for call_id, _ in rows],
+                )
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        reports = []
+        for call_id, report in rows:
+            try:
+                reports.append(json.loads(report))
+            except ValueError as e:
+                # Retrying can't fix it
+                print(f"⚠️  Unreadable transcript report for call {call_id}: {e}")
+                self.fail([call_id], f"Unreadable report: {e}")
+        return reports
+
+    def _dead_letter(self, conn: sqlite3.Connection, now: float) -> int:
+        """Move reports that used up their attempts (and aren't claimed) to failed_transcripts"""
+        exhausted = "attempts >= ? AND (claimed_at IS NULL OR claimed_at < ?)"
+        params = (MAX_ATTEMPTS, now - CLAIM_TIMEOUT_SECONDS)
+        conn.execute(
+            f"""
+            INSERT OR REPLACE INTO failed_transcripts (call_id, report, received_at, attempts, last_error, failed_at)
+            SELECT call_id, report, received_at, attempts, COALESCE(last_error, 'Claim expired'), ?
+            FROM pending_transcripts WHERE {exhausted}
+            """,
+            (now, *params),
+        )
+        moved = conn.execute(f"DELETE FROM pending_transcripts WHERE {exhausted}", params).rowcount
+        if moved:
+            self.stats["dead_lettered"] += moved
+            print(f"🪦 Gave up on {moved} transcript reports after {MAX_ATTEMPTS} attempts")
+        return moved
+
+    def complete(self, call_ids: List[str]):
+        with self._lock:
+            self._connection().executemany(
+                "DELETE FROM pending_transcripts WHERE call_id = ?", [(call_id,) for call_id in call_ids]
+            )
+            self._connection().commit()
+
+    def release(self, call_ids: List[str], error: str):
+        """Put reports back for another attempt, or dead-letter the ones that used up their attempts"""
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "UPDATE pending_transcripts SET claimed_at = NULL, last_error = ? WHERE call_id = ?",
+                [(error, call_id) for call_id in call_ids],
+            )
+            self._dead_letter(conn, time.time())
+            conn.commit()
+
+    def fail(self, call_ids: List[str], error: str):
+        """Dead-letter reports straight away"""
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "UPDATE pending_transcripts SET claimed_at = NULL, attempts = MAX(attempts, ?), last_error = ? "
+                "WHERE call_id = ?",
+                [(MAX_ATTEMPTS, error, call_id) for call_id in call_ids],
+            )
+            self._dead_letter(conn, time.time())
+            conn.commit()
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM pending_transcripts").fetchone()[0]
+
+    def failed_count(self) -> int:
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM failed_transcripts").fetchone()[0]
+
+    async def normalize(self, client, report: Dict) -> str:
+        """Gemini summary of the transcript, or the raw transcript when Gemini is unavailable"""
+        from services.gemini_normalizer import generate_content
+
+        if client is not None:
+            try:
+                return await generate_content(
+                    client, [report["transcript"], TRANSCRIPT_INSTRUCTION], "transcript_summary"
+                )
+            except Exception as e:
+                print(f"⚠️  Transcript normalization failed for call {report['call_id']}: {e}")
+        self.stats["normalization_fallbacks"] += 1
+        return report.get("vapi_summary") or report["transcript"]
+
+    def ensure_collection(self, client) -> bool:
+        """Create the transcripts collection once per process"""
+        if self.collection_ready:
+            return True
+        from weaviate.classes.config import Configure, DataType, Property
+
+        if not client.collections.exists(TRANSCRIPTS_COLLECTION):
+            client.collections.create(
+                name=TRANSCRIPTS_COLLECTION,
+                vector_config=(
+                    Configure.Vectors.self_provided() if use_local_embeddings()
+                    else Configure.Vectors.text2vec_weaviate(source_properties=["summary"])
+                ),
+                properties=[
+                    Property(name="session_id", data_type=DataType.TEXT, skip_vectorization=True),
+                    Property(name="call_id", data_type=DataType.TEXT, skip_vectorization=True),
+                    Property(name="summary", data_type=DataType.TEXT),
+                    Property(name="transcript", data_type=DataType.TEXT, skip_vectorization=True),
+                    Property(name="focused_query", data_type=DataType.TEXT, skip_vectorization=True),
+                    Property(name="phone_number", data_type=DataType.TEXT, skip_vectorization=True),
+                    Property(name="ended_reason", data_type=DataType.TEXT, skip_vectorization=True),
+                    Property(name="started_at", data_type=DataType.TEXT, skip_vectorization=True),
+                    Property(name="ended_at", data_type=DataType.TEXT, skip_vectorization=True),
+                ],
+            )
+        self.collection_ready = True
+        return True
+
+    def insert_batch(self, weaviate_client, reports: List[Dict], summaries: List[str]) -> Dict[str, str]:
+        """
+        Insert one batch; IDs come from the call ID, so re-inserting a report overwrites it
+        Returns the call IDs of objects Weaviate rejected, with the error; the rest are stored.
+        """
+        from weaviate.classes.data import DataObject
+        from weaviate.classes.query import Filter
+
+        self.ensure_collection(weaviate_client)
+        collection = weaviate_client.collections.use(TRANSCRIPTS_COLLECTION)
+        vectors = local_embedder.embed_documents(summaries) if use_local_embeddings() else [None] * len(reports)
+        objects = [
+            DataObject(
+                uuid=transcript_uuid(report["call_id"]),
+                properties={
+                    "session_id": report.get("session_id"),
+                    "call_id": report["call_id"],
+                    "summary": summary,
+                    "transcript": report["transcript"],
+                    "focused_query": report.get("focused_query"),
+                    "phone_number": report.get("phone_number"),
+                    "ended_reason": report.get("ended_reason"),
+                    "started_at": report.get("started_at"),
+                    "ended_at": report.get("ended_at"),
+                },
+                vector=vector,
+            )
+            for report, summary, vector in zip(reports, summaries, vectors)
+        ]
+        # Replace any copy stored by an earlier attempt of the same calls
+        collection.data.delete_many(where=Filter.by_id().contains_any([obj.uuid for obj in objects]))
+        result = collection.data.insert_many(objects)
+        return {reports[index]["call_id"]: str(getattr(error, "message", error)) for index, error in result.errors.items()}
+
+    async def process_batch(self, gemini_client, weaviate_service) -> int:
+        """Ingest one claimed batch; returns how many reports were claimed"""
+        claimed = await asyncio.to_thread(self.claim_batch)
+        if not claimed:
+            return 0
+        # A report that can't be normalized is released on its own instead of failing the batch
+        results = await asyncio.gather(
+            *(self.normalize(gemini_client, report) for report in claimed), return_exceptions=True
+        )
+        reports, summaries = [], []
+        for report, summary in zip(claimed, results):
+            if isinstance(summary, Exception):
+                print(f"⚠️  Transcript for call {report.get('call_id')} could not be prepared: {summary}")
+                self.stats["failures"] += 1
+                await asyncio.to_thread(self.release, [report.get("call_id")], str(summary))
+            else:
+                reports.append(report)
+                summaries.append(summary)
+        if not reports:
+            return len(claimed)
+
+        call_ids = [report["call_id"] for report in reports]
+        try:
+            if not weaviate_service.connect():
+                raise ConnectionError("Failed to connect to Weaviate")
+            rejected = await asyncio.to_thread(self.insert_batch, weaviate_service.client, reports, summaries)
+        except Exception as e:
+            print(f"❌ Transcript batch of {len(reports)} failed: {e}")
+            self.stats["failures"] += 1
+            await asyncio.to_thread(self.release, call_ids, str(e))
+            return len(claimed)
+        for call_id, error in rejected.items():
+            print(f"⚠️  Transcript for call {call_id} was rejected by Weaviate: {error}")
+            self.stats["failures"] += 1
+            await asyncio.to_thread(self.release, [call_id], error)
+        stored = [call_id for call_id in call_ids if call_id not in rejected]
+        await asyncio.to_thread(self.complete, stored)
+        self.stats["ingested"] += len(stored)
+        print(f"🗒️  Ingested {len(stored)} consultation transcripts")
+        return len(claimed)
+
+    async def run(self, get_gemini_client, weaviate_service, interval: Optional[float] = None):
+        """Drain the queue in batches, waking up on new reports or every interval seconds"""
+        interval = interval or settings.transcript_flush_interval
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                gemini_client = get_gemini_client() if settings.gemini_api_key else None
+            except Exception:
+                gemini_client = None
+            try:
+                while await self.process_batch(gemini_client, weaviate_service) == self.batch_size:
+                    pass
+            except Exception as e:
+                # e.g. "database is locked"; claimed reports are retried once their claim expires
+                print(f"❌ Transcript ingestion failed: {e}")
+
+    def search(self, weaviate_client, query: Optional[str] = None, session_id: Optional[str] = None,
+               limit: int = 5) -> List[Dict]:
+        """Prior consultation summaries, most relevant to the query (or most recent) for a session"""
+        from weaviate.classes.query import Filter, Sort
+
+        if not weaviate_client.collections.exists(TRANSCRIPTS_COLLECTION):
+            return []
+        collection = weaviate_client.collections.use(TRANSCRIPTS_COLLECTION)
+        filters = Filter.by_property("session_id").equal(session_id) if session_id else None
+        properties = ["session_id", "call_id", "summary", "ended_at", "ended_reason"]
+        if query and use_local_embeddings():
+            response = collection.query.near_vector(
+                near_vector=local_embedder.embed_query(query), limit=limit, filters=filters,
+                return_properties=properties
+            )
+        elif query:
+            response = collection.query.near_text(
+                query=query, limit=limit, filters=filters, return_properties=properties
+            )
+        else:
+            response = collection.query.fetch_objects(
+                limit=limit, filters=filters, return_properties=properties,
+                sort=Sort.by_property("ended_at", ascending=False)
+            )
+        return [{"id": str(obj.uuid), **obj.properties} for obj in response.objects]
+
+    def metrics(self) -> Dict:
+        return {**self.stats, "pending": self.pending(), "failed": self.failed_count()}
+
+# Global instance
+transcript_pipeline = TranscriptPipeline()
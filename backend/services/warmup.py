@@ -0,0 +1,91 @@
+"""
+Background warm-up after the app starts serving: heavy SDK imports, the
+Weaviate connection, the collection check and a few canned queries
+"""
+
+import asyncio
+import importlib
+import time
+from typing import Dict
+
+from config import settings
+from services.local_index import local_index
+from services.readiness import readiness
+from services.weaviate_service import weaviate_service
+
+# Imported lazily by the request handlers; importing them here moves the cost off the first request
+HEAVY_MODULES = [
+    "google.genai",
+    "google.genai.types",
+    "weaviate",
+    "weaviate.classes.init",
+    "weaviate.classes.config",
+    "weaviate.agents.query",
+    "requests",
+]
+
+# Canned queries that prime the Weaviate and embedding caches before real traffic arrives
+WARMUP_QUERIES = settings.warmup_queries
+
+warmup_status: Dict = {"imports": {}, "completed": False}
+
+
+def import_heavy_modules() -> Dict[str, float]:
+    """Import every heavy module and return how long each took in milliseconds"""
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            timings[name] = round((time.perf_counter() - start) * 1000, 1)
+        except Exception as e:
+            print(f"⚠️  Warm-up import of {name} failed: {e}")
+            timings[name] = None
+    return timings
+
+
+async def warm_up():
+    """Import heavy SDKs in a worker thread so /health answers immediately"""
+    start = time.perf_counter()
+    warmup_status["imports"] = await asyncio.to_thread(import_heavy_modules)
+    warmup_status["completed"] = True
+    warmup_status["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    print(f"🔥 Warm-up imports finished in {warmup_status['duration_ms']} ms")
+
+
+def warm_weaviate() -> Dict:
+    """Open the pooled Weaviate connection, verify the collection once and run the canned queries"""
+    status = {"connected": False, "collection_ready": False, "queries": {}}
+    if not weaviate_service.connect():
+        return status
+    status["connected"] = True
+    status["collection_ready"] = weaviate_service.ensure_collection()
+    if settings.local_index_enabled and not local_index.has_snapshot:
+        # First start with the local index enabled: take the initial snapshot from the cluster
+        status["local_index_snapshot"] = weaviate_service.snapshot_local_index()
+    for query in WARMUP_QUERIES:
+        start = time.perf_counter()
+        weaviate_service.search_documents(query, limit=1)
+        status["queries"][query] = round((time.perf_counter() - start) * 1000, 1)
+    return status
+
+
+async def warm_dependencies():
+    """Warm imports, the local index and Weaviate, then keep readiness probes running in the background"""
+    await warm_up()
+    if settings.local_index_enabled:
+        # Loaded before Weaviate so searches can be served even if the cluster is down
+        try:
+            warmup_status["local_index_documents"] = await asyncio.to_thread(local_index.load)
+        except Exception as e:
+            print(f"⚠️  Local index load failed: {e}")
+    start = time.perf_counter()
+    try:
+        warmup_status["weaviate"] = await asyncio.to_thread(warm_weaviate)
+    except Exception as e:
+        print(f"⚠️  Weaviate warm-up failed: {e}")
+        warmup_status["weaviate"] = {"error": str(e)}
+    warmup_status["weaviate_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    readiness.warmed_up = True
+    print(f"🔥 Weaviate warm-up finished in {warmup_status['weaviate_ms']} ms")
+    await readiness.probe_loop()
@@ -1,30 +1,97 @@
 """
 Weaviate service for storing and retrieving normalized data
+
+Fingerprint documents stored before near-duplicate detection with:
+    python -m services.weaviate_service dedup
 """
 
-import weaviate
-from weaviate.classes.init import Auth
-from weaviate.classes.config import Configure
-from weaviate.agents.query import QueryAgent
-import os
+import hashlib
+import threading
+import uuid
 from typing import Dict, List, Optional
-from dotenv import load_dotenv
+from urllib.parse import urlparse
+from config import settings
+from services.embeddings import local_embedder, use_local_embeddings
+from services.local_index import local_index
+from services.dedup import duplicate_detector, fingerprint
+from services.projection import fetch_properties, project_object, to_jsonable
+from services.resilience import outbound
+
+# The weaviate SDK is imported inside the methods that need it so that
+# importing this module (and the app) stays cheap
+
+# Namespace for deterministic object IDs (uuid5 of "<session_id>:<chunk_index>")
+DOCUMENT_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "NormalizedDocuments")
+
+
+# Properties describing a submission's inputs; they can change while the normalized text stays the same
+METADATA_PROPERTIES = ("original_prompt", "pdf_count", "image_count", "pdf_files", "image_files", "total_files")
+
+
+def document_metadata(prompt: str, pdf_files: List[Dict], image_files: List[Dict]) -> Dict:
+    return {
+        "original_prompt": prompt,
+        "pdf_count": len(pdf_files),
+        "image_count": len(image_files),
+        "pdf_files": [pdf["filename"] for pdf in pdf_files],
+        "image_files": [img["filename"] for img in image_files],
+        "total_files": len(pdf_files) + len(image_files),
+    }
+
 
-# Load environment variables
-load_dotenv()
+def document_uuid(session_id: str, chunk_index: int = 0) -> str:
+    return str(uuid.uuid5(DOCUMENT_NAMESPACE, f"{session_id}:{chunk_index}"))
 
 class WeaviateService:
     def __init__(self):
         self.client = None
         self.collection_name = "NormalizedDocuments"
+        self.collection_ready = False
+        self._connect_lock = threading.Lock()
         
     def connect(self) -> bool:
-        """Connect to Weaviate Cloud instance"""
+        """Connect to Weaviate Cloud instance, reusing the open connection when there is one"""
+        if self.client is not None:
+            try:
+                if self.client.is_connected():
+                    return True
+            except Exception:
+                pass
+        
+        with self._connect_lock:
+            if self.client is not None and self.client.is_connected():
+                return True
+            if self.client is not None:
+                # Drop the stale connection before opening a new one
+                try:
+                    self.close()
+                except Exception:
+                    self.client = None
+            return self._open_connection()
+    
+    def _open_connection(self) -> bool:
         try:
-            weaviate_url = os.getenv("WEAVIATE_URL")
-            weaviate_api_key = os.getenv("WEAVIATE_API_KEY")
-            gemini_api_key = os.getenv("GEMINI_API_KEY")
+            import weaviate
+            from weaviate.classes.init import AdditionalConfig, Auth, Timeout
+            
+            weaviate_url = settings.weaviate_url
+            weaviate_api_key = settings.weaviate_api_key
+            gemini_api_key = settings.gemini_api_key
+            # Client-side timeouts match the outbound policy, so a call abandoned by
+            # outbound.call's timeout doesn't keep its worker thread busy much longer
+            additional_config = AdditionalConfig(timeout=Timeout(query=outbound.policies["weaviate"].timeout))
             
+            # A local instance (e.g. docker compose for development and fixture replays) needs no API key
+            if weaviate_url and urlparse(weaviate_url).hostname in ("localhost", "127.0.0.1"):
+                parsed = urlparse(weaviate_url)
+                self.client = weaviate.connect_to_local(
+                    host=parsed.hostname,
+                    port=parsed.port or 8080,
+                    headers={"X-INFERENCE-PROVIDER-API-KEY": gemini_api_key} if gemini_api_key else None,
+                    additional_config=additional_config,
+                )
+                return self.client.is_ready()
+
             if not weaviate_url or not weaviate_api_key:
                 raise ValueError("WEAVIATE_URL and WEAVIATE_API_KEY must be set in environment variables")
             
@@ -40,6 +107,7 @@ class WeaviateService:
                 cluster_url=weaviate_url,
                 auth_credentials=Auth.api_key(weaviate_api_key),
                 headers=headers if headers else None,
+                additional_config=additional_config,
             )
             
             return self.client.is_ready()
@@ -54,15 +122,21 @@ class WeaviateService:
             if not self.client:
                 raise ValueError("Not connected to Weaviate")
             
+            from weaviate.classes.config import Configure
+            
             # Check if collection already exists
             if self.client.collections.exists(self.collection_name):
                 print(f"Collection '{self.collection_name}' already exists")
                 return True
             
-            # Create collection with Weaviate Embeddings and Cohere integration
-            collection = self.client.collections.create(
+            # Create collection with Weaviate Embeddings (or our own vectors) and Cohere integration
+            if use_local_embeddings():
+                vector_config = Configure.Vectors.self_provided()     # Vectors computed by the local embedder
+            else:
+                vector_config = Configure.Vectors.text2vec_weaviate()  # Use Weaviate Embeddings
+            self.client.collections.create(
                 name=self.collection_name,
-                vector_config=Configure.Vectors.text2vec_weaviate(),  # Use Weaviate Embeddings
+                vector_config=vector_config,
                 generative_config=Configure.Generative.cohere()       # Use Cohere for RAG
             )
             
@@ -73,85 +147,287 @@ class WeaviateService:
             print(f"Error creating collection: {e}")
             return False
     
+    def ensure_collection(self) -> bool:
+        """Verify or create the collection once per process instead of on every ingest"""
+        if not self.collection_ready:
+            self.collection_ready = self.create_collection()
+        return self.collection_ready
+    
     def store_document(self, session_id: str, prompt: str, normalized_text: str, 
-                      pdf_files: List[Dict], image_files: List[Dict]) -> bool:
-        """Store a normalized document in Weaviate"""
+                      pdf_files: List[Dict], image_files: List[Dict], chunk_index: int = 0,
+                      owner: Optional[str] = None, link_duplicates: bool = True) -> bool:
+        """
+        Store (upsert) a normalized document in Weaviate
+        The object ID is derived from session_id and chunk_index, so a retried or
+        resumed ingest with the same content is a no-op and changed content replaces
+        the existing object instead of creating a new one; unchanged content with a new
+        prompt or file list only updates those properties
+        owner: who submitted it; a new session is only linked to a near-duplicate from the same owner
+        link_duplicates: False for sessions that already exist (updates), which are always stored in their own right
+        """
         try:
             if not self.client:
                 raise ValueError("Not connected to Weaviate")
             
             collection = self.client.collections.use(self.collection_name)
+            object_id = document_uuid(session_id, chunk_index)
+            content_hash = hashlib.sha256(normalized_text.encode("utf-8")).hexdigest()
+            
+            metadata = document_metadata(prompt, pdf_files, image_files)
+            existing = collection.query.fetch_object_by_id(
+                object_id, return_properties=["content_hash", *METADATA_PROPERTIES]
+            )
+            if existing is not None and existing.properties.get("content_hash") == content_hash:
+                if all(existing.properties.get(name) == value for name, value in metadata.items()):
+                    print(f"Document {object_id} is already stored with the same content, skipping")
+                else:
+                    collection.data.update(uuid=object_id, properties=metadata)
+                    print(f"Document {object_id} has the same content, updated its prompt and file list")
+                return True
+            
+            # Resubmissions of (nearly) the same content are linked, not embedded and stored again
+            fp = None
+            if settings.dedup_enabled:
+                fp = fingerprint(normalized_text)
+                duplicate = None
+                if link_duplicates and owner and existing is None and duplicate_detector.linked_object(session_id) is None:
+                    duplicate = duplicate_detector.find_duplicate(fp, owner=owner)
+                if duplicate:
+                    duplicate_detector.link(session_id, duplicate["object_id"], duplicate["similarity"], fp.length)
+                    print(f"♻️  Session {session_id} duplicates document {duplicate['object_id']} "
+                          f"(similarity {duplicate['similarity']:.2f}), linked instead of inserted")
+                    return True
             
             # Prepare document data
             document_data = {
                 "session_id": session_id,
-                "original_prompt": prompt,
+                "chunk_index": chunk_index,
                 "normalized_content": normalized_text,
-                "pdf_count": len(pdf_files),
-                "image_count": len(image_files),
-                "pdf_files": [pdf["filename"] for pdf in pdf_files],
-                "image_files": [img["filename"] for img in image_files],
-                "total_files": len(pdf_files) + len(image_files)
+                "content_hash": content_hash,
+                **metadata
             }
             
-            # Add the document to Weaviate
-            result = collection.data.insert(document_data)
+            # Add the document to Weaviate, bringing our own vector when embedding locally
+            vector = None
+            if use_local_embeddings():
+                vector = local_embedder.embed_documents([normalized_text])[0]
+            if existing is None:
+                try:
+                    collection.data.insert(document_data, uuid=object_id, vector=vector)
+                except Exception as e:
+                    # A concurrent retry inserted it first; replace rather than fail
+                    if "already exists" not in str(e):
+                        raise
+                    collection.data.replace(uuid=object_id, properties=document_data, vector=vector)
+            else:
+                collection.data.replace(uuid=object_id, properties=document_data, vector=vector)
+            
+            if fp is not None:
+                duplicate_detector.register(object_id, session_id, fp, owner=owner)
+            # Session-scoped search and RAG must use this document now, not the one it was linked to
+            duplicate_detector.unlink(session_id)
+            
+            # Keep the local index in sync so it can answer without the cluster
+            if vector is not None and settings.local_index_enabled:
+                local_index.add(object_id, vector, document_data)
             
-            print(f"Document stored successfully with ID: {result}")
+            print(f"Document {'replaced' if existing is not None else 'stored'} successfully with ID: {object_id}")
             return True
             
         except Exception as e:
             print(f"Error storing document: {e}")
             return False
     
-    def search_documents(self, query: str, limit: int = 5) -> List[Dict]:
-        """Search for documents using semantic search"""
+    def search_documents(self, query: str, limit: int = 5, raise_errors: bool = False,
+                         properties: Optional[List[str]] = None,
+                         snippet_chars: Optional[int] = None,
+                         max_passages: int = 0, filters=None) -> List[Dict]:
+        """
+        Search for documents using semantic search
+        raise_errors: re-raise failures so the outbound layer can retry them
+        properties: only fetch and return these properties (None returns all of them)
+        snippet_chars: add a truncated snippet of normalized_content to each result
+        max_passages: add up to this many query-matching passages with highlight offsets
+        filters: Weaviate filter (see build_filters) applied before the vector search
+        """
         try:
             if not self.client:
                 raise ValueError("Not connected to Weaviate")
             
             collection = self.client.collections.use(self.collection_name)
             
-            # Perform semantic search
-            response = collection.query.near_text(
-                query=query,
-                limit=limit
-            )
-            
-            results = []
-            for obj in response.objects:
-                results.append({
-                    "id": str(obj.uuid),
-                    "properties": obj.properties,
-                    "metadata": obj.metadata
-                })
+            # Perform semantic search, fetching only the projected properties
+            return_properties = fetch_properties(properties, snippet_chars, max_passages)
+            if use_local_embeddings():
+                response = collection.query.near_vector(
+                    near_vector=local_embedder.embed_query(query),
+                    limit=limit,
+                    filters=filters,
+                    return_properties=return_properties,
+                    return_metadata=["distance", "score"]
+                )
+            else:
+                response = collection.query.near_text(
+                    query=query,
+                    limit=limit,
+                    filters=filters,
+                    return_properties=return_properties,
+                    return_metadata=["distance", "score"]
+                )
             
-            return results
+            return [
+                project_object(obj, properties, snippet_chars, query=query, max_passages=max_passages)
+                for obj in response.objects
+            ]
             
         except Exception as e:
             print(f"Error searching documents: {e}")
+            if raise_errors:
+                raise
             return []
     
-    def generate_response(self, query: str, limit: int = 3) -> str:
-        """Generate a response using RAG (Retrieval Augmented Generation)"""
-        try:
-            if not self.client:
-                raise ValueError("Not connected to Weaviate")
-            
-            collection = self.client.collections.use(self.collection_name)
-            
-            # Perform RAG query
-            response = collection.generate.near_text(
-                query=query,
-                limit=limit,
-                grouped_task=f"Based on the retrieved documents, provide a comprehensive answer to: {query}"
-            )
-            
-            return response.generative.text
-            
-        except Exception as e:
-            print(f"Error generating response: {e}")
-            return f"Error generating response: {str(e)}"
+    def snapshot_local_index(self) -> int:
+        """Rebuild the local vector index from every object (and vector) in the collection"""
+        if not self.client:
+            raise ValueError("Not connected to Weaviate")
+        return local_index.snapshot_from_weaviate(self.client.collections.use(self.collection_name))
+    
+    def index_duplicates(self) -> Dict:
+        """Fingerprint documents stored before deduplication so their copies collapse in search"""
+        if not self.client:
+            raise ValueError("Not connected to Weaviate")
+        collection = self.client.collections.use(self.collection_name)
+        for obj in collection.iterator(return_properties=["session_id", "normalized_content"]):
+            fp = fingerprint(obj.properties.get("normalized_content") or "")
+            duplicate = duplicate_detector.find_duplicate(fp)
+            group_id = duplicate["object_id"] if duplicate else None
+            duplicate_detector.register(obj.uuid, obj.properties.get("session_id"), fp, group_id=group_id)
+        return duplicate_detector.stats()
+    
+    def fetch_page(self, after: Optional[str] = None, page_size: int = 100,
+                   properties: Optional[List[str]] = None, include_vector: bool = False) -> Dict:
+        """
+        One page of documents in UUID order, starting after the given cursor
+        Returns {"objects": [...], "next_cursor": <last id or None when exhausted>}
+        """
+        if not self.client:
+            raise ValueError("Not connected to Weaviate")
+        
+        collection = self.client.collections.use(self.collection_name)
+        response = collection.query.fetch_objects(
+            limit=page_size,
+            after=after,
+            return_properties=properties,
+            include_vector=include_vector
+        )
+        objects = []
+        for obj in response.objects:
+            record = {
+                "id": str(obj.uuid),
+                "properties": {key: to_jsonable(value) for key, value in (obj.properties or {}).items()}
+            }
+            if include_vector:
+                vector = obj.vector.get("default") if isinstance(obj.vector, dict) else obj.vector
+                record["vector"] = list(vector) if vector is not None else None
+            objects.append(record)
+        next_cursor = objects[-1]["id"] if len(objects) == page_size else None
+        return {"objects": objects, "next_cursor": next_cursor}
+    
+    def iterate_documents(self, page_size: int = 100, properties: Optional[List[str]] = None,
+                          include_vector: bool = False, after: Optional[str] = None):
+        """Yield every document page by page, so memory stays bounded by the page size"""
+        while True:
+            page = self.fetch_page(after, page_size, properties, include_vector)
+            yield from page["objects"]
+            after = page["next_cursor"]
+            if after is None:
+                return
+    
+    def get_document_content(self, document_id: str) -> Optional[Dict]:
+        """Fetch one document's normalized_content (for paging through long documents)"""
+        if not self.client:
+            raise ValueError("Not connected to Weaviate")
+        
+        collection = self.client.collections.use(self.collection_name)
+        obj = collection.query.fetch_object_by_id(
+            document_id, return_properties=["normalized_content", "session_id"]
+        )
+        if obj is None:
+            return None
+        return {
+            "id": str(obj.uuid),
+            "session_id": obj.properties.get("session_id"),
+            "normalized_content": obj.properties.get("normalized_content") or ""
+        }
+    
+    def build_filters(self, session_id: Optional[str] = None, filters: Optional[Dict] = None):
+        """
+        Weaviate filter for a session and/or property values, applied before the vector search
+        filters: {"property": value} for equality, {"property": [values]} to match any of them
+        """
+        from weaviate.classes.query import Filter
+        
+        conditions = []
+        if session_id:
+            # A session that was deduplicated on ingest lives in the document it was linked to
+            linked_id = duplicate_detector.linked_object(session_id)
+            if linked_id:
+                conditions.append(Filter.by_id().equal(linked_id))
+            else:
+                conditions.append(Filter.by_property("session_id").equal(session_id))
+        for name, value in (filters or {}).items():
+            if isinstance(value, (list, tuple)):
+                conditions.append(Filter.by_property(name).contains_any(list(value)))
+            else:
+                conditions.append(Filter.by_property(name).equal(value))
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else Filter.all_of(conditions)
+    
+    def generate_response(self, query: str, limit: int = 3, session_id: Optional[str] = None,
+                          filters: Optional[Dict] = None, single_prompt: Optional[str] = None,
+                          grouped: bool = True) -> Dict:
+        """
+        Generate a response using RAG (Retrieval Augmented Generation)
+        session_id / filters: restrict retrieval inside Weaviate before the vector search
+        limit: number of retrieved chunks that go into the generation prompt
+        single_prompt: optional per-object prompt ({property} placeholders are filled per object)
+        grouped: also generate one answer over all retrieved chunks
+        """
+        if not self.client:
+            raise ValueError("Not connected to Weaviate")
+        
+        collection = self.client.collections.use(self.collection_name)
+        
+        # Perform RAG query over only the content and the prompt, not every stored property
+        options = {
+            "limit": limit,
+            "filters": self.build_filters(session_id, filters),
+            "single_prompt": single_prompt,
+            "return_properties": ["session_id", "original_prompt"],
+            "return_metadata": ["distance"],
+        }
+        if grouped:
+            options["grouped_task"] = f"Based on the retrieved documents, provide a comprehensive answer to: {query}"
+            options["grouped_properties"] = ["original_prompt", "normalized_content"]
+        if use_local_embeddings():
+            response = collection.generate.near_vector(near_vector=local_embedder.embed_query(query), **options)
+        else:
+            response = collection.generate.near_text(query=query, **options)
+        
+        return {
+            "response": response.generative.text if grouped and response.generative else None,
+            "chunks": [
+                {
+                    "id": str(obj.uuid),
+                    "session_id": obj.properties.get("session_id"),
+                    "original_prompt": obj.properties.get("original_prompt"),
+                    "distance": obj.metadata.distance,
+                    "generated": obj.generative.text if single_prompt and obj.generative else None,
+                }
+                for obj in response.objects
+            ],
+        }
     
     def query_with_agent(self, query: str) -> str:
         """Use Weaviate Query Agent to answer natural language queries"""
@@ -159,6 +435,8 @@ class WeaviateService:
             if not self.client:
                 raise ValueError("Not connected to Weaviate")
             
+            from weaviate.agents.query import QueryAgent
+            
             # Create Query Agent instance
             qa = QueryAgent(
                 client=self.client,
@@ -183,3 +461,23 @@ class WeaviateService:
 
 # Global instance
 weaviate_service = WeaviateService()
+
+
+def main(argv: Optional[List[str]] = None):
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Weaviate collection maintenance")
+    parser.add_argument("command", choices=["dedup"])
+    parser.parse_args(argv)
+
+    if not weaviate_service.connect():
+        raise SystemExit("Failed to connect to Weaviate")
+    try:
+        print(json.dumps(weaviate_service.index_duplicates(), indent=2))
+    finally:
+        weaviate_service.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Shared fixtures: tests import the backend modules the way the app does (from the backend directory)
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class StubServer:
+    """
+    Local HTTP server whose behaviour the test scripts: `status` and `delay` apply to every
+    request, and `delays` (consumed in order) overrides the delay of the next few requests
+    """
+
+    def __init__(self):
+        self.status = 200
+        self.delay = 0.0
+        self.delays = []
+        self.hits = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub._lock:
+                    stub.hits += 1
+                    delay = stub.delays.pop(0) if stub.delays else stub.delay
+                    status = stub.status
+                time.sleep(delay)
+                body = json.dumps({"status": status}).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    # The client gave up (timeout or cancelled hedge)
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.close()
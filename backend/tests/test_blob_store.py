@@ -0,0 +1,42 @@
+"""
+Blob store references: every file of a session keeps its blob alive through
+garbage collection, including files uploaded under the same name
+"""
+
+import io
+
+import pytest
+
+from services.blob_store import BlobStore, sanitize_filename, unique_filename
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BlobStore(root=str(tmp_path / "blobs"), db_path=str(tmp_path / "blobs.db"))
+
+
+def test_unique_filename_numbers_repeats():
+    taken = set()
+    names = [unique_filename(sanitize_filename(name), taken) for name in ["deck.pdf", "deck.pdf", "a/deck.pdf", "memo"]]
+    assert names == ["deck.pdf", "deck_2.pdf", "deck_3.pdf", "memo"]
+
+
+def test_same_named_uploads_each_keep_a_reference(store):
+    taken = set()
+    entries = [
+        store.store_upload("session-1", "pdfs", unique_filename("deck.pdf", taken), io.BytesIO(content))
+        for content in (b"first deck", b"second deck")
+    ]
+    # No grace period: anything unreferenced goes
+    assert store.collect_garbage(grace_seconds=-60)["blobs_deleted"] == 0
+    for entry in entries:
+        assert store.ensure_local(entry["sha256"]).read_bytes() in (b"first deck", b"second deck")
+    assert store.stats()["file_references"] == 2
+
+
+def test_unreferenced_blob_is_collected(store):
+    entry = store.store_upload("session-1", "pdfs", "deck.pdf", io.BytesIO(b"deck"))
+    store.detach("session-1")
+    assert store.collect_garbage(grace_seconds=-60)["blobs_deleted"] == 1
+    with pytest.raises(FileNotFoundError):
+        store.ensure_local(entry["sha256"])
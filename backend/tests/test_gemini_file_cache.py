@@ -0,0 +1,156 @@
+"""
+Gemini file-handle cache against a local fake of the Files API: uploads are
+reused by content hash, expiring handles are re-uploaded, and a handle Gemini
+no longer has is forgotten and replaced
+"""
+
+import asyncio
+import itertools
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from services import gemini_normalizer
+from services.gemini_file_cache import GeminiFileCache, is_stale_handle_error
+
+
+class FakeClientError(Exception):
+    """Shaped like google.genai.errors.ClientError: an HTTP `code` and the API message"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeGeminiFiles:
+    """In-memory Files API: upload() hands out a fresh name and URI per call, delete() drops one server-side"""
+
+    def __init__(self, ttl: float = 48 * 3600):
+        self.ttl = ttl
+        self.uploads = []
+        self.live = set()
+        self._ids = itertools.count(1)
+
+    def upload(self, file, config):
+        name = f"files/fake-{next(self._ids)}"
+        self.uploads.append(file)
+        self.live.add(name)
+        return SimpleNamespace(
+            name=name,
+            uri=f"https://generativelanguage.example/v1beta/{name}",
+            mime_type=config["mime_type"],
+            expiration_time=datetime.fromtimestamp(time.time() + self.ttl, timezone.utc),
+        )
+
+    def delete(self, name: str):
+        self.live.discard(name)
+
+
+class FakeGeminiClient:
+    def __init__(self, files: FakeGeminiFiles):
+        self.files = files
+        self.requests = 0
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content=self._generate_content))
+
+    async def _generate_content(self, model, contents):
+        self.requests += 1
+        for part in contents:
+            uri = getattr(getattr(part, "file_data", None), "file_uri", None)
+            if uri and uri.rsplit("/v1beta/", 1)[1] not in self.files.live:
+                raise FakeClientError(403, f"You do not have permission to access the File {uri} or it may not exist.")
+        return SimpleNamespace(text="normalized", usage_metadata=None)
+
+
+@pytest.fixture
+def file_cache(tmp_path, monkeypatch):
+    cache = GeminiFileCache(db_path=str(tmp_path / "gemini_files.db"))
+    monkeypatch.setattr(gemini_normalizer, "gemini_file_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "deck.pdf"
+    path.write_bytes(b"%PDF-1.4 fake deck")
+    return str(path)
+
+
+def test_same_content_is_uploaded_once(file_cache, pdf, tmp_path):
+    files = FakeGeminiFiles()
+    client = FakeGeminiClient(files)
+    copy = tmp_path / "deck-copy.pdf"
+    copy.write_bytes(open(pdf, "rb").read())
+
+    async def scenario():
+        first = await file_cache.get_handles(client, [pdf, str(copy)])
+        second = await file_cache.get_handles(client, [pdf])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert len(files.uploads) == 1
+    assert first[0]["file_uri"] == first[1]["file_uri"] == second[0]["file_uri"]
+
+
+def test_expiring_handle_is_uploaded_again(file_cache, pdf):
+    files = FakeGeminiFiles(ttl=file_cache.refresh_margin / 2)
+    client = FakeGeminiClient(files)
+
+    async def scenario():
+        await file_cache.get_handles(client, [pdf])
+        return await file_cache.refresh_expiring(client)
+
+    assert asyncio.run(scenario()) == 1
+    assert len(files.uploads) == 2
+
+
+def test_rejected_handle_is_forgotten_and_reuploaded(file_cache, pdf):
+    pytest.importorskip("google.genai")
+    files = FakeGeminiFiles()
+    client = FakeGeminiClient(files)
+    parts = [{"kind": "file", "path": pdf}]
+
+    async def scenario():
+        handle = (await file_cache.get_handles(client, [pdf]))[0]
+        # Gone server-side long before the expiry we recorded
+        files.delete(handle["file_name"])
+        text = await gemini_normalizer.generate_with_files(client, "prompt", parts, "instruction", "normalize")
+        return handle, text
+
+    handle, text = asyncio.run(scenario())
+    assert text == "normalized"
+    assert len(files.uploads) == 2
+    assert client.requests == 2
+    # The cache now holds the replacement upload
+    cached = file_cache.lookup(handle["content_hash"])
+    assert cached["file_name"] != handle["file_name"]
+    assert cached["file_name"] in files.live
+
+
+def test_other_client_errors_are_not_retried(file_cache, pdf):
+    pytest.importorskip("google.genai")
+    files = FakeGeminiFiles()
+    client = FakeGeminiClient(files)
+
+    async def bad_request(model, contents):
+        client.requests += 1
+        raise FakeClientError(400, "Request contains an invalid argument.")
+
+    client.aio.models.generate_content = bad_request
+
+    async def scenario():
+        with pytest.raises(FakeClientError):
+            await gemini_normalizer.generate_with_files(
+                client, "prompt", [{"kind": "file", "path": pdf}], "instruction", "normalize")
+
+    asyncio.run(scenario())
+    assert client.requests == 1
+    assert len(files.uploads) == 1
+
+
+def test_stale_handle_errors_are_recognised():
+    assert is_stale_handle_error(FakeClientError(403, "You do not have permission to access the File x or it may not exist."))
+    assert is_stale_handle_error(FakeClientError(404, "File files/abc not found"))
+    assert not is_stale_handle_error(FakeClientError(403, "API key not valid"))
+    assert not is_stale_handle_error(FakeClientError(500, "Internal error while reading file"))
@@ -0,0 +1,45 @@
+"""
+Profiling stays closed without PROFILE_TOKEN: the x-profile header is ignored
+and the /admin/profiles endpoints answer 404
+"""
+
+import asyncio
+
+import pytest
+
+import main
+from config import settings
+from services.profiling import ProfilingMiddleware
+
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    return monkeypatch
+
+
+def scope(headers=()):
+    return {"type": "http", "headers": list(headers)}
+
+
+def test_x_profile_is_ignored_without_a_token(profiling):
+    profiling.setattr(settings, "profile_token", None)
+    assert not ProfilingMiddleware(None).forced(scope([(b"x-profile", b"1")]))
+
+
+def test_x_profile_needs_the_token(profiling):
+    profiling.setattr(settings, "profile_token", "secret")
+    middleware = ProfilingMiddleware(None)
+    assert not middleware.forced(scope([(b"x-profile", b"1")]))
+    assert middleware.forced(scope([(b"x-profile", b"secret")]))
+
+
+def test_admin_profiles_are_not_served_without_a_token(profiling):
+    profiling.setattr(settings, "profile_token", None)
+    response = asyncio.run(main.list_profiles(x_profile_token=None))
+    assert response.status_code == 404
+
+
+def test_admin_profiles_reject_a_wrong_token(profiling):
+    profiling.setattr(settings, "profile_token", "secret")
+    assert asyncio.run(main.get_profile("capture", x_profile_token="guess")).status_code == 403
@@ -0,0 +1,211 @@
+"""
+Fault injection for the outbound-call layer against a local stub server:
+breaker trip, half-open recovery (including a cancelled probe), error
+classification and hedging
+"""
+
+import asyncio
+import time
+
+import pytest
+import requests
+
+from services.resilience import CircuitBreaker, CircuitOpenError, OutboundClient
+
+
+def make_client(**policy) -> OutboundClient:
+    """An OutboundClient whose "weaviate" policy is tightened for fast tests"""
+    client = OutboundClient()
+    settings = {"timeout": 2.0, "max_retries": 0, "base_delay": 0.01, "max_delay": 0.02,
+                "failure_threshold": 3, "reset_timeout": 0.3, "hedge_delay": 0.1, **policy}
+    for name, value in settings.items():
+        setattr(client.policies["weaviate"], name, value)
+    client.breakers["weaviate"] = CircuitBreaker(settings["failure_threshold"], settings["reset_timeout"])
+    return client
+
+
+def get(client: OutboundClient, url: str, **kwargs):
+    return client.call("weaviate", requests.get, url, timeout=2, is_failure=lambda r: r.status_code >= 500, **kwargs)
+
+
+def get_checked(url: str):
+    response = requests.get(url, timeout=2)
+    response.raise_for_status()
+    return response
+
+
+def test_breaker_trips_after_consecutive_server_errors(stub_server):
+    client = make_client()
+    stub_server.status = 503
+
+    async def scenario():
+        for _ in range(3):
+            response = await get(client, stub_server.url)
+            assert response.status_code == 503
+        with pytest.raises(CircuitOpenError):
+            await get(client, stub_server.url)
+
+    asyncio.run(scenario())
+    assert client.breakers["weaviate"].state == "open"
+    # The short-circuited call never reached the server
+    assert stub_server.hits == 3
+    assert client.stats["weaviate"]["short_circuited"] == 1
+
+
+def test_half_open_probe_closes_breaker_on_success(stub_server):
+    client = make_client()
+    stub_server.status = 503
+
+    async def scenario():
+        for _ in range(3):
+            await get(client, stub_server.url)
+        stub_server.status = 200
+        await asyncio.sleep(0.35)
+        response = await get(client, stub_server.url)
+        assert response.status_code == 200
+
+    asyncio.run(scenario())
+    assert client.breakers["weaviate"].state == "closed"
+    assert client.breakers["weaviate"].consecutive_failures == 0
+
+
+def test_failed_probe_reopens_breaker(stub_server):
+    client = make_client()
+    stub_server.status = 503
+
+    async def scenario():
+        for _ in range(3):
+            await get(client, stub_server.url)
+        await asyncio.sleep(0.35)
+        await get(client, stub_server.url)
+        assert client.breakers["weaviate"].state == "open"
+        with pytest.raises(CircuitOpenError):
+            await get(client, stub_server.url)
+
+    asyncio.run(scenario())
+    assert client.breakers["weaviate"].times_opened == 2
+
+
+def test_cancelled_probe_does_not_wedge_breaker(stub_server):
+    client = make_client()
+    stub_server.status = 503
+
+    async def scenario():
+        for _ in range(3):
+            await get(client, stub_server.url)
+        await asyncio.sleep(0.35)
+        stub_server.status = 200
+        stub_server.delays = [1.0]
+        probe = asyncio.ensure_future(get(client, stub_server.url))
+        await asyncio.sleep(0.1)
+        assert client.breakers["weaviate"].state == "half_open"
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # The next caller probes straight away instead of failing fast forever
+        response = await get(client, stub_server.url)
+        assert response.status_code == 200
+
+    asyncio.run(scenario())
+    assert client.breakers["weaviate"].state == "closed"
+
+
+def test_silent_probe_is_replaced_after_reset_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.1)
+    breaker.record_failure()
+    time.sleep(0.15)
+    assert breaker.allow()
+    # The probe never reports back; only one probe at a time until the reset period passes
+    assert not breaker.allow()
+    time.sleep(0.15)
+    assert breaker.allow()
+
+
+def test_client_errors_are_not_retried_and_do_not_trip(stub_server):
+    client = make_client(max_retries=2)
+    stub_server.status = 400
+
+    async def scenario():
+        for _ in range(5):
+            with pytest.raises(requests.HTTPError):
+                await client.call("weaviate", get_checked, stub_server.url)
+
+    asyncio.run(scenario())
+    assert stub_server.hits == 5
+    assert client.breakers["weaviate"].state == "closed"
+    assert client.stats["weaviate"]["client_errors"] == 5
+    assert client.stats["weaviate"]["retries"] == 0
+
+
+def test_local_errors_are_not_retried():
+    client = make_client(max_retries=2)
+    calls = []
+
+    def bad_filter():
+        calls.append(1)
+        raise ValueError("unknown filter operator")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await client.call("weaviate", bad_filter)
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+    assert client.breakers["weaviate"].consecutive_failures == 0
+
+
+def test_rate_limits_and_transport_errors_are_retried(stub_server):
+    client = make_client(max_retries=2, failure_threshold=10)
+    stub_server.status = 429
+
+    async def scenario():
+        with pytest.raises(requests.HTTPError):
+            await client.call("weaviate", get_checked, stub_server.url)
+        stub_server.close()
+        with pytest.raises(requests.ConnectionError):
+            await client.call("weaviate", get_checked, stub_server.url)
+
+    asyncio.run(scenario())
+    assert stub_server.hits == 3
+    assert client.stats["weaviate"]["retries"] == 4
+
+
+def test_timeouts_count_against_the_breaker(stub_server):
+    client = make_client(timeout=0.2)
+    stub_server.delay = 0.5
+
+    async def scenario():
+        for _ in range(3):
+            with pytest.raises(TimeoutError):
+                await get(client, stub_server.url)
+
+    asyncio.run(scenario())
+    assert client.stats["weaviate"]["timeouts"] == 3
+    assert client.breakers["weaviate"].state == "open"
+
+
+def test_hedge_answers_when_primary_is_slow(stub_server):
+    client = make_client()
+    stub_server.delays = [1.0]
+
+    async def scenario():
+        start = time.perf_counter()
+        response = await get(client, stub_server.url, hedge=True)
+        return response, time.perf_counter() - start
+
+    response, elapsed = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert elapsed < 0.8
+    assert client.stats["weaviate"]["hedged"] == 1
+    assert client.stats["weaviate"]["hedge_wins"] == 1
+
+
+def test_fast_primary_is_not_hedged(stub_server):
+    client = make_client()
+
+    async def scenario():
+        return await get(client, stub_server.url, hedge=True)
+
+    assert asyncio.run(scenario()).status_code == 200
+    assert stub_server.hits == 1
+    assert client.stats["weaviate"]["hedged"] == 0
@@ -0,0 +1,142 @@
+"""
+Idempotent ingest: store_document against an in-memory stub of the Weaviate
+collection, so a retried or resubmitted document never grows the collection,
+and near-duplicate links stay within one owner and give way to the session's own document
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from services import weaviate_service as weaviate_module
+from services.dedup import DuplicateDetector
+from services.weaviate_service import WeaviateService, document_uuid
+
+TEXT = "Seed-stage marketplace for regional freight, looking for advice on pricing and first hires. " * 5
+
+
+class StubCollection:
+    """The slice of the Weaviate collection API store_document uses, backed by a dict"""
+
+    def __init__(self):
+        self.objects = {}
+        self.inserts = 0
+        self.replaces = 0
+        self.updates = 0
+        self.query = SimpleNamespace(fetch_object_by_id=self.fetch_object_by_id)
+        self.data = SimpleNamespace(insert=self.insert, replace=self.replace, update=self.update)
+
+    def fetch_object_by_id(self, uuid, return_properties=None):
+        if uuid not in self.objects:
+            return None
+        return SimpleNamespace(uuid=uuid, properties=dict(self.objects[uuid]))
+
+    def insert(self, properties, uuid, vector=None):
+        if uuid in self.objects:
+            raise Exception(f"Object with id {uuid} already exists")
+        self.inserts += 1
+        self.objects[uuid] = properties
+
+    def replace(self, uuid, properties, vector=None):
+        self.replaces += 1
+        self.objects[uuid] = properties
+
+    def update(self, uuid, properties):
+        self.updates += 1
+        self.objects[uuid] = {**self.objects[uuid], **properties}
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(weaviate_module, "duplicate_detector", DuplicateDetector(db_path=str(tmp_path / "dedup.db")))
+    collection = StubCollection()
+    service = WeaviateService()
+    service.client = SimpleNamespace(collections=SimpleNamespace(use=lambda name: collection))
+    return service, collection
+
+
+def store(service: WeaviateService, session_id: str, text: str = TEXT) -> bool:
+    return service.store_document(session_id, "How should we price?", text, [{"filename": "deck.pdf"}], [])
+
+
+def test_ingesting_the_same_document_twice_keeps_one_object(service):
+    service, collection = service
+    assert store(service, "session-1")
+    assert store(service, "session-1")
+    assert len(collection.objects) == 1
+    assert collection.inserts == 1
+    assert collection.replaces == 0
+
+
+def test_changed_content_replaces_the_object(service):
+    service, collection = service
+    assert store(service, "session-1")
+    assert store(service, "session-1", TEXT + " Updated with Q3 revenue figures.")
+    assert len(collection.objects) == 1
+    assert collection.replaces == 1
+    assert "Q3 revenue" in collection.objects[document_uuid("session-1")]["normalized_content"]
+
+
+def test_new_prompt_with_the_same_text_updates_only_the_metadata(service):
+    service, collection = service
+    assert store(service, "session-1")
+    assert service.store_document("session-1", "What should we charge?", TEXT, [], [])
+    stored = collection.objects[document_uuid("session-1")]
+    assert (collection.inserts, collection.replaces, collection.updates) == (1, 0, 1)
+    assert stored["original_prompt"] == "What should we charge?"
+    assert stored["pdf_files"] == [] and stored["total_files"] == 0
+
+
+def test_concurrent_retry_that_lost_the_insert_race_replaces(service):
+    service, collection = service
+    object_id = document_uuid("session-1")
+    real_fetch = collection.fetch_object_by_id
+    # The other attempt inserts between our existence check and our insert
+    collection.query.fetch_object_by_id = lambda uuid, return_properties=None: None
+    collection.objects[object_id] = {"content_hash": "stale"}
+    assert store(service, "session-1")
+    collection.query.fetch_object_by_id = real_fetch
+    assert len(collection.objects) == 1
+    assert collection.replaces == 1
+
+
+def test_near_duplicate_from_the_same_owner_is_linked(service):
+    service, collection = service
+    assert service.store_document("session-1", "p", TEXT, [], [], owner="alice")
+    assert service.store_document("session-2", "p", TEXT + " Thanks!", [], [], owner="alice")
+    assert len(collection.objects) == 1
+    assert weaviate_module.duplicate_detector.linked_object("session-2") == document_uuid("session-1")
+
+
+def test_near_duplicates_are_never_linked_across_owners(service):
+    service, collection = service
+    assert service.store_document("session-1", "p", TEXT, [], [], owner="alice")
+    assert service.store_document("session-2", "p", TEXT, [], [], owner="bob")
+    # Without an owner there is nothing to scope the match to, so nothing is linked either
+    assert service.store_document("session-3", "p", TEXT, [], [])
+    assert len(collection.objects) == 3
+    assert weaviate_module.duplicate_detector.linked_object("session-2") is None
+    assert weaviate_module.duplicate_detector.linked_object("session-3") is None
+
+
+def test_updating_a_linked_session_stores_it_and_drops_the_link(service):
+    service, collection = service
+    assert service.store_document("session-1", "p", TEXT, [], [], owner="alice")
+    assert service.store_document("session-2", "p", TEXT, [], [], owner="alice")
+    assert weaviate_module.duplicate_detector.linked_object("session-2") is not None
+
+    # The update is stored even though it is still a near-duplicate of session-1
+    assert service.store_document("session-2", "p", TEXT + " New section on hiring.", [], [],
+                                  owner="alice", link_duplicates=False)
+    assert document_uuid("session-2") in collection.objects
+    assert weaviate_module.duplicate_detector.linked_object("session-2") is None
+
+
+def test_session_with_a_link_is_not_linked_again(service):
+    service, collection = service
+    detector = weaviate_module.duplicate_detector
+    assert service.store_document("session-1", "p", TEXT, [], [], owner="alice")
+    detector.link("session-2", document_uuid("session-1"), 1.0, len(TEXT))
+    assert service.store_document("session-2", "p", TEXT, [], [], owner="alice")
+    assert document_uuid("session-2") in collection.objects
+    assert detector.linked_object("session-2") is None
@@ -0,0 +1,126 @@
+"""
+Transcript ingestion replayed from the recorded VAPI fixtures: webhook parse,
+durable queue and batch insert against an in-memory stub of the transcripts
+collection, plus dead-lettering of reports that keep failing
+"""
+
+import asyncio
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from starlette.requests import Request
+
+from config import settings
+from routes import weaviate as routes
+from services.transcripts import MAX_ATTEMPTS, TranscriptPipeline, transcript_uuid
+
+FIXTURES = Path(__file__).resolve().parent.parent / "fixtures"
+SECRET = "test-webhook-secret"
+
+
+class StubTranscripts:
+    """The slice of the collection API insert_batch uses; `reject` makes every insert of those call IDs fail"""
+
+    def __init__(self):
+        self.objects = {}
+        self.reject = set()
+        self.data = SimpleNamespace(delete_many=self.delete_many, insert_many=self.insert_many)
+
+    def delete_many(self, where):
+        pass
+
+    def insert_many(self, objects):
+        errors = {}
+        for index, obj in enumerate(objects):
+            if obj.properties["call_id"] in self.reject:
+                errors[index] = SimpleNamespace(message="vectorizer unavailable")
+            else:
+                self.objects[str(obj.uuid)] = obj.properties
+        return SimpleNamespace(errors=errors)
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    pytest.importorskip("weaviate")
+    pipeline = TranscriptPipeline(db_path=str(tmp_path / "transcripts.db"))
+    collection = StubTranscripts()
+    client = SimpleNamespace(collections=SimpleNamespace(exists=lambda name: True, use=lambda name: collection))
+    weaviate_service = SimpleNamespace(connect=lambda: True, client=client)
+    monkeypatch.setattr(settings, "vapi_webhook_secret", SECRET)
+    monkeypatch.setattr(routes, "transcript_pipeline", pipeline)
+    monkeypatch.setattr(routes, "call_scheduler", SimpleNamespace(mark_ended=lambda call_id, reason: None))
+    return pipeline, collection, weaviate_service
+
+
+def post_fixture(name: str):
+    body = (FIXTURES / name).read_bytes()
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    request = Request({"type": "http", "method": "POST", "path": "/weaviate/vapi/webhook", "headers": []}, receive)
+    return asyncio.run(routes.vapi_webhook(request, x_vapi_secret=SECRET))
+
+
+def fixture_call_id() -> str:
+    return json.loads((FIXTURES / "vapi_end_of_call_report.json").read_text())["message"]["call"]["id"]
+
+
+def test_recorded_report_is_queued_and_ingested(pipeline):
+    pipeline, collection, weaviate_service = pipeline
+    response = post_fixture("vapi_end_of_call_report.json")
+    assert response["status"] == "success"
+    assert pipeline.pending() == 1
+
+    assert asyncio.run(pipeline.process_batch(None, weaviate_service)) == 1
+    stored = collection.objects[transcript_uuid(fixture_call_id())]
+    assert stored["session_id"] == "fixture-session-0001"
+    assert stored["summary"]
+    assert pipeline.pending() == 0
+    assert pipeline.stats["ingested"] == 1
+
+
+def test_retried_webhook_stores_the_report_once(pipeline):
+    pipeline, collection, weaviate_service = pipeline
+    post_fixture("vapi_end_of_call_report.json")
+    post_fixture("vapi_end_of_call_report.json")
+    assert pipeline.pending() == 1
+    asyncio.run(pipeline.process_batch(None, weaviate_service))
+    assert len(collection.objects) == 1
+
+
+def test_other_message_types_are_ignored(pipeline):
+    pipeline, _, _ = pipeline
+    assert post_fixture("vapi_status_update.json")["message"] == "Ignored"
+    assert pipeline.pending() == 0
+
+
+def test_report_rejected_on_every_attempt_is_dead_lettered(pipeline):
+    pipeline, collection, weaviate_service = pipeline
+    post_fixture("vapi_end_of_call_report.json")
+    collection.reject.add(fixture_call_id())
+
+    for _ in range(MAX_ATTEMPTS):
+        assert asyncio.run(pipeline.process_batch(None, weaviate_service)) == 1
+    assert asyncio.run(pipeline.process_batch(None, weaviate_service)) == 0
+
+    assert pipeline.metrics()["pending"] == 0
+    assert pipeline.metrics()["failed"] == 1
+    attempts, last_error = pipeline._connection().execute(
+        "SELECT attempts, last_error FROM failed_transcripts WHERE call_id = ?", (fixture_call_id(),)
+    ).fetchone()
+    assert attempts == MAX_ATTEMPTS
+    assert last_error == "vectorizer unavailable"
+
+
+def test_unreadable_report_is_dead_lettered_at_once(pipeline):
+    pipeline, _, weaviate_service = pipeline
+    conn = pipeline._connection()
+    conn.execute("INSERT INTO pending_transcripts (call_id, report, received_at) VALUES ('broken', '{not json', 0)")
+    conn.commit()
+
+    asyncio.run(pipeline.process_batch(None, weaviate_service))
+    assert pipeline.pending() == 0
+    assert pipeline.failed_count() == 1
@@ -0,0 +1,133 @@
+"""
+Incremental session updates: the add/change/remove diff against the manifest,
+metadata-only changes still reaching the stored document, and per-file notes
+that keep a re-normalization proportional to what changed
+"""
+
+import asyncio
+import hashlib
+import io
+
+import pytest
+from starlette.datastructures import UploadFile
+
+from routes import weaviate as routes
+from services import gemini_normalizer
+from services.blob_store import BlobStore
+from services.gemini_file_cache import GeminiFileCache
+from services.session_manifest import load_manifest, new_manifest, save_manifest
+from services.sqlite_cache import SQLiteCache
+from test_gemini_file_cache import FakeGeminiClient, FakeGeminiFiles
+
+PROMPT = "How should we price our freight marketplace?"
+
+
+class StubWeaviate:
+    def __init__(self):
+        self.stored = []
+
+    def connect(self):
+        return True
+
+    def ensure_collection(self):
+        return True
+
+    def store_document(self, **document):
+        self.stored.append(document)
+        return True
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    """A session with two images, normalized by a fake Gemini that echoes the file contents"""
+    upload_dir = tmp_path / "uploads"
+    store = BlobStore(root=str(upload_dir / "blobs"), db_path=str(tmp_path / "blobs.db"))
+    weaviate = StubWeaviate()
+    normalizations = []
+
+    async def fake_normalize(prompt, pdf_paths, image_paths, mode=None):
+        normalizations.append(image_paths)
+        return "|".join(sorted(open(path, "rb").read().decode() for path in image_paths))
+
+    monkeypatch.setattr(routes, "UPLOAD_DIR", upload_dir)
+    monkeypatch.setattr(routes, "blob_store", store)
+    monkeypatch.setattr(routes, "weaviate_service", weaviate)
+    monkeypatch.setattr(routes, "process_with_gemini", fake_normalize)
+
+    session_dir = upload_dir / "session-1"
+    session_dir.mkdir(parents=True)
+    manifest = new_manifest("session-1", PROMPT)
+    manifest["images"] = [
+        store.store_upload("session-1", "images", name, io.BytesIO(content))
+        for name, content in (("a.jpg", b"chart"), ("b.jpg", b"team"))
+    ]
+    save_manifest(session_dir, manifest)
+    return session_dir, store, weaviate, normalizations
+
+
+def update(images=(), prompt=None, remove_files=None):
+    uploads = [UploadFile(io.BytesIO(content), filename=name) for name, content in images]
+    return asyncio.run(routes.update_session(
+        "session-1", prompt=prompt, pdfs=None, images=uploads or None,
+        remove_files=remove_files, normalization_mode="per_file",
+    ))
+
+
+def test_added_changed_and_unchanged_files_are_diffed(session):
+    session_dir, _, weaviate, _ = session
+    result = update(images=[("a.jpg", b"new chart"), ("b.jpg", b"team"), ("c.jpg", b"office")])
+    assert result["status"] == "success"
+    assert result["changes"] == {"added": ["c.jpg"], "changed": ["a.jpg"], "unchanged": ["b.jpg"], "removed": []}
+    assert weaviate.stored[-1]["normalized_text"] == "new chart|office|team"
+    assert [entry["filename"] for entry in load_manifest(session_dir)["images"]] == ["a.jpg", "b.jpg", "c.jpg"]
+
+
+def test_removed_file_is_detached_and_collected(session):
+    session_dir, store, weaviate, _ = session
+    result = update(remove_files="b.jpg")
+    assert result["changes"]["removed"] == ["b.jpg"]
+    assert weaviate.stored[-1]["image_files"][0]["filename"] == "a.jpg"
+    assert [entry["filename"] for entry in load_manifest(session_dir)["images"]] == ["a.jpg"]
+    assert store.collect_garbage(grace_seconds=-60)["blobs_deleted"] == 1
+
+
+def test_unchanged_upload_is_not_renormalized(session):
+    _, _, weaviate, normalizations = session
+    result = update(images=[("a.jpg", b"chart")])
+    assert result["renormalized"] is False
+    assert normalizations == [] and weaviate.stored == []
+
+
+def test_prompt_edit_with_identical_text_still_updates_the_document(session):
+    session_dir, _, weaviate, _ = session
+    manifest = load_manifest(session_dir)
+    manifest["normalized_sha256"] = hashlib.sha256(b"chart|team").hexdigest()
+    save_manifest(session_dir, manifest)
+
+    result = update(prompt="What should we charge shippers?")
+    assert result["weaviate_stored"] is True
+    # The text didn't change, but the stored prompt must
+    assert weaviate.stored[-1]["prompt"] == "What should we charge shippers?"
+    assert weaviate.stored[-1]["normalized_text"] == "chart|team"
+
+
+def test_notes_from_a_single_request_session_keep_updates_proportional(tmp_path, monkeypatch):
+    pytest.importorskip("google.genai")
+    monkeypatch.setattr(gemini_normalizer, "local_cache", SQLiteCache(str(tmp_path / "cache.db")))
+    monkeypatch.setattr(gemini_normalizer, "gemini_file_cache", GeminiFileCache(str(tmp_path / "files.db")))
+    client = FakeGeminiClient(FakeGeminiFiles())
+    paths = []
+    for name in ("a.jpg", "b.jpg", "c.jpg"):
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        paths.append(str(path))
+
+    async def scenario():
+        # Prepared in the background after the session was normalized in one request
+        assert await gemini_normalizer.prepare_file_notes(client, PROMPT, [], paths[:2]) == 2
+        before = client.requests
+        await gemini_normalizer.normalize_per_file(client, PROMPT, [], paths)
+        return client.requests - before
+
+    # Only the added file and the merge go to Gemini
+    assert asyncio.run(scenario()) == 2
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+VAPI provisioning and key validation
+
+Creates (or adopts) an assistant and a phone number per tenant and validates
+API keys, concurrently over one pooled HTTP client. 429 responses are retried
+after Retry-After and each key has its own concurrency cap. Results go to a
+JSON config store that is rewritten atomically: re-running reuses everything
+that still exists and only creates what is missing. With --write-env, the
+IDs of one tenant replace the VAPI_* lines in .env instead of being appended.
+
+Usage (from the backend directory):
+    python vapi_provision.py validate                      # keys from the spec and VAPI_API_KEY / YOUR_VAPI_API_KEY
+    python vapi_provision.py apply [--spec vapi_tenants.json] [--write-env default]
+    python vapi_provision.py show
+
+Without a spec a single "default" tenant is provisioned with VAPI_API_KEY and
+the startup advisor assistant. A spec is {"tenants": [{"name", "api_key_env",
+"assistant": {...overrides}, "area_code", "adopt_existing"}]}; unless
+adopt_existing is false, an unclaimed assistant with the same name is adopted
+instead of creating another. Point --base-url (or VAPI_BASE_URL) at
+fixtures/fake_vapi.py to try it locally.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_BASE_URL = "https://api.vapi.ai"
+DEFAULT_STORE = Path("vapi_config.json")
+MAX_ATTEMPTS = 5
+PER_KEY_CONCURRENCY = 4
+
+ADVISOR_PROMPT = """Act and speak as Bill Gates, imitating his tone, cadence, and natural speaking style—measured pace, thoughtful pauses, slight chuckles when making a point, and a reflective, analytical tone. Use the way he structures answers: starting with context, breaking down the problem logically, and finishing with pragmatic advice. Now answer this question as Bill Gates: Startup founders often struggle to achieve product–market fit—building something people genuinely want and will pay for before running out of time or money. Can you talk more about why this is such a challenge, and suggest a practical solution for founders facing it?
+
+You are Bill Gates, the co-founder of Microsoft and a renowned philanthropist. You have extensive experience in technology, business strategy, and solving complex global challenges. When providing advice to startup founders, you draw from your own experiences building Microsoft from a small startup to a global technology leader.
+
+Your speaking style includes:
+- Measured, thoughtful pace with natural pauses
+- Starting with context and background
+- Breaking down problems into logical components
+- Using specific examples from your experience
+- Ending with practical, actionable advice
+- Occasional slight chuckles when making insightful points
+- Reflective and analytical tone throughout
+
+You have access to a comprehensive database of startup knowledge and can provide personalized advice based on the context provided. When a founder calls, you'll receive context about their specific situation including their business challenge, relevant data from your knowledge base, and focused insights for their industry/situation.
+
+Use this context to provide personalized, actionable advice that addresses their specific needs, always speaking as Bill Gates would.
+
+Context for this call (focus: {{focused_query}}):
+{{consultation_context}}"""
+
+DEFAULT_ASSISTANT = {
+    "name": "Bill Gates - Startup Advisor",
+    "model": {
+        "provider": "openai",
+        "model": "gpt-4o",
+        "messages": [{"role": "system", "content": ADVISOR_PROMPT}],
+    },
+    "voice": {"provider": "11labs", "voiceId": "cgSgspJ2msm6clMCkdW9"},  # Riley - Original voice
+    "firstMessage": "Hello there! This is Bill Gates. I understand you're looking for some strategic guidance on your startup. I've had the privilege of building Microsoft from the ground up, and I'm here to share some insights that might help you navigate your entrepreneurial journey. What specific challenge would you like to discuss first?",
+}
+DEFAULT_AREA_CODE = "415"  # San Francisco area code
+
+
+class VapiError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"VAPI returned {status_code}: {message}")
+        self.status_code = status_code
+
+
+class VapiClient:
+    """Pooled async client; 429s wait for Retry-After, 5xx/network errors are retried for reads only"""
+
+    def __init__(self, base_url: str, concurrency: int = 16, timeout: float = 30.0):
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self._key_slots: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {"requests": 0, "rate_limited": 0, "retries": 0}
+
+    async def close(self):
+        await self.http.aclose()
+
+    async def request(self, api_key: str, method: str, path: str, json_body: Optional[Dict] = None):
+        slots = self._key_slots.setdefault(api_key, asyncio.Semaphore(PER_KEY_CONCURRENCY))
+        idempotent = method in ("GET", "PATCH")
+        for attempt in range(MAX_ATTEMPTS):
+            async with slots:
+                self.stats["requests"] += 1
+                try:
+                    response = await self.http.request(
+                        method, path, json=json_body, headers={"Authorization": f"Bearer {api_key}"}
+                    )
+                except httpx.TransportError as e:
+                    if not idempotent or attempt + 1 == MAX_ATTEMPTS:
+                        raise
+                    response, error = None, e
+            if response is not None:
+                if response.status_code == 429:
+                    # The request was rejected before it was processed, so even creates are safe to repeat
+                    self.stats["rate_limited"] += 1
+                    delay = float(response.headers.get("retry-after") or 0) or self.backoff(attempt)
+                elif response.status_code >= 500 and idempotent and attempt + 1 < MAX_ATTEMPTS:
+                    delay = self.backoff(attempt)
+                elif response.status_code >= 400:
+                    raise VapiError(response.status_code, response.text[:300])
+                else:
+                    return response.json() if response.content else None
+            else:
+                print(f"⚠️  {method} {path} failed ({error}), retrying", file=sys.stderr)
+                delay = self.backoff(attempt)
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+        raise VapiError(429, f"{method} {path} still rate limited after {MAX_ATTEMPTS} attempts")
+
+    @staticmethod
+    def backoff(attempt: int) -> float:
+        return random.uniform(0, min(8.0, 0.5 * 2 ** attempt))
+
+    async def get_or_none(self, api_key: str, path: str) -> Optional[Dict]:
+        try:
+            return await self.request(api_key, "GET", path)
+        except VapiError as e:
+            if e.status_code == 404:
+                return None
+            raise
+
+
+class ConfigStore:
+    """
+    JSON file of provisioned resources per tenant, rewritten atomically
+    Changes are flushed at most every FLUSH_INTERVAL seconds and at the end of a run; anything
+    lost in a crash in between is adopted again (by name / assistant) on the next run.
+    """
+
+    FLUSH_INTERVAL = 0.5
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.data = {"tenants": {}}
+        if self.path.exists():
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+        self._dirty = False
+        self._flushed_at = 0.0
+
+    def tenant(self, name: str) -> Dict:
+        return self.data["tenants"].get(name, {})
+
+    def claimed(self, field: str, except_tenant: str) -> set:
+        """IDs already recorded for other tenants, which must not be adopted twice"""
+        return {entry.get(field) for name, entry in self.data["tenants"].items() if name != except_tenant}
+
+    def update(self, name: str, **values):
+        entry = self.data["tenants"].setdefault(name, {})
+        if all(entry.get(key) == value for key, value in values.items()):
+            return
+        entry.update(values, updated_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
+        self._dirty = True
+        if time.monotonic() - self._flushed_at >= self.FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        if not self._dirty:
+            return
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._flushed_at = time.monotonic()
+
+
+def load_tenants(spec_path: Optional[Path]) -> List[Dict]:
+    if spec_path is None:
+        return [{"name": "default", "api_key_env": "VAPI_API_KEY"}]
+    with open(spec_path, "r", encoding="utf-8") as f:
+        tenants = json.load(f)["tenants"]
+    names = [tenant["name"] for tenant in tenants]
+    if len(set(names)) != len(names):
+        raise ValueError("tenant names must be unique")
+    return tenants
+
+
+def api_key_for(tenant: Dict) -> str:
+    env = tenant.get("api_key_env", "VAPI_API_KEY")
+    key = os.getenv(env)
+    if not key or key.startswith("YOUR_VAPI_API_KEY"):
+        raise ValueError(f"{env} is not set")
+    return key
+
+
+def assistant_definition(tenant: Dict, server_url: Optional[str]) -> Dict:
+    definition = {**DEFAULT_ASSISTANT, **tenant.get("assistant", {})}
+    if server_url:
+        # End-of-call reports go to the transcript webhook (POST /weaviate/vapi/webhook)
+        definition["server"] = {"url": server_url}
+        if os.getenv("VAPI_WEBHOOK_SECRET"):
+            definition["server"]["secret"] = os.getenv("VAPI_WEBHOOK_SECRET")
+    return definition
+
+
+async def ensure_assistant(client: VapiClient, store: ConfigStore, tenant: Dict, api_key: str,
+                           server_url: Optional[str], update: bool) -> Dict:
+    definition = assistant_definition(tenant, server_url)
+    known_id = store.tenant(tenant["name"]).get("assistant_id")
+    assistant = await client.get_or_none(api_key, f"/assistant/{known_id}") if known_id else None
+    action = "reused"
+    if assistant is None and tenant.get("adopt_existing", True):
+        existing = await client.request(api_key, "GET", "/assistant")
+        claimed = store.claimed("assistant_id", tenant["name"])
+        assistant = next(
+            (a for a in existing or [] if a.get("name") == definition["name"] and a["id"] not in claimed), None
+        )
+        if assistant is not None:
+            # Claimed before the next await, so a concurrent tenant can't adopt the same one
+            store.update(tenant["name"], assistant_id=assistant["id"])
+        action = "adopted"
+    if assistant is None:
+        assistant = await client.request(api_key, "POST", "/assistant", definition)
+        action = "created"
+    elif update:
+        assistant = await client.request(api_key, "PATCH", f"/assistant/{assistant['id']}", definition)
+        action = "updated"
+    store.update(tenant["name"], assistant_id=assistant["id"], assistant_name=assistant.get("name"))
+    return {"id": assistant["id"], "action": action}
+
+
+async def ensure_phone_number(client: VapiClient, store: ConfigStore, tenant: Dict, api_key: str,
+                              assistant_id: str) -> Dict:
+    known_id = store.tenant(tenant["name"]).get("phone_number_id")
+    phone = await client.get_or_none(api_key, f"/phone-number/{known_id}") if known_id else None
+    action = "reused"
+    if phone is None:
+        existing = await client.request(api_key, "GET", "/phone-number")
+        claimed = store.claimed("phone_number_id", tenant["name"])
+        phone = next(
+            (p for p in existing or [] if p.get("assistantId") == assistant_id and p["id"] not in claimed), None
+        )
+        if phone is not None:
+            store.update(tenant["name"], phone_number_id=phone["id"])
+        action = "adopted"
+    if phone is None:
+        phone = await client.request(api_key, "POST", "/phone-number", {
+            "provider": "vapi",
+            "assistantId": assistant_id,
+            "numberDesiredAreaCode": tenant.get("area_code", DEFAULT_AREA_CODE),
+        })
+        action = "created"
+    store.update(tenant["name"], phone_number_id=phone["id"], phone_number=phone.get("number"))
+    return {"id": phone["id"], "number": phone.get("number"), "action": action}
+
+
+async def provision_tenant(client: VapiClient, store: ConfigStore, tenant: Dict,
+                           server_url: Optional[str], update: bool) -> Dict:
+    start = time.perf_counter()
+    try:
+        api_key = api_key_for(tenant)
+        assistant = await ensure_assistant(client, store, tenant, api_key, server_url, update)
+        phone = await ensure_phone_number(client, store, tenant, api_key, assistant["id"])
+        store.update(tenant["name"], api_key_env=tenant.get("api_key_env", "VAPI_API_KEY"), status="ready", error=None)
+        result = {"tenant": tenant["name"], "assistant": assistant, "phone_number": phone, "status": "success"}
+    except Exception as e:
+        store.update(tenant["name"], status="error", error=str(e))
+        result = {"tenant": tenant["name"], "message": str(e), "status": "error"}
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    return result
+
+
+async def validate_key(client: VapiClient, name: str, api_key: str) -> Dict:
+    try:
+        await client.request(api_key, "GET", "/assistant")
+        return {"key": name, "prefix": api_key[:8], "valid": True}
+    except VapiError as e:
+        return {"key": name, "prefix": api_key[:8], "valid": False, "status_code": e.status_code}
+    except httpx.HTTPError as e:
+        return {"key": name, "prefix": api_key[:8], "valid": False, "error": str(e)}
+
+
+def write_env(env_path: Path, values: Dict[str, str]):
+    """Set keys in .env, replacing existing lines rather than appending duplicates"""
+    lines = env_path.read_text(encoding="utf-8").splitlines() if env_path.exists() else []
+    remaining = dict(values)
+    for i, line in enumerate(lines):
+        key = line.split("=", 1)[0].strip()
+        if key in remaining:
+            lines[i] = f"{key}={remaining.pop(key)}"
+    lines.extend(f"{key}={value}" for key, value in remaining.items())
+    tmp_path = env_path.with_suffix(".tmp")
+    tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    os.replace(tmp_path, env_path)
+
+
+async def run(args) -> int:
+    client = VapiClient(args.base_url, concurrency=args.concurrency)
+    try:
+        if args.command == "validate":
+            keys = {}
+            for tenant in load_tenants(args.spec) if args.spec else []:
+                env = tenant.get("api_key_env", "VAPI_API_KEY")
+                if os.getenv(env):
+                    keys[env] = os.getenv(env)
+            for env in ("VAPI_API_KEY", "YOUR_VAPI_API_KEY"):
+                if os.getenv(env):
+                    keys.setdefault(env, os.getenv(env))
+            if not keys:
+                print("❌ No VAPI keys found in the environment or .env")
+                return 1
+            results = await asyncio.gather(*(validate_key(client, name, key) for name, key in keys.items()))
+            print(json.dumps({"keys": results, "http": client.stats}, indent=2))
+            return 0 if any(result["valid"] for result in results) else 1
+
+        store = ConfigStore(args.store)
+        tenants = load_tenants(args.spec)
+        start = time.perf_counter()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one(tenant):
+            async with semaphore:
+                return await provision_tenant(client, store, tenant, args.server_url, args.update)
+
+        try:
+            results = await asyncio.gather(*(one(tenant) for tenant in tenants))
+        finally:
+            store.flush()
+        failed = [result for result in results if result["status"] != "success"]
+        print(json.dumps({
+            "tenants": results,
+            "failed": len(failed),
+            "seconds": round(time.perf_counter() - start, 2),
+            "http": client.stats,
+            "store": str(args.store),
+        }, indent=2))
+
+        if args.write_env:
+            entry = store.tenant(args.write_env)
+            if entry.get("status") != "ready":
+                print(f"❌ Tenant {args.write_env!r} is not provisioned, .env left unchanged")
+                return 1
+            write_env(Path(".env"), {
+                "VAPI_ASSISTANT_ID": entry["assistant_id"],
+                "VAPI_PHONE_NUMBER_ID": entry["phone_number_id"],
+                "VAPI_PHONE_NUMBER": entry.get("phone_number") or "",
+            })
+            print(f"💾 Wrote {args.write_env!r} IDs to .env")
+        return 1 if failed else 0
+    finally:
+        await client.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+    parser = argparse.ArgumentParser(description="Provision and validate VAPI assistants, phone numbers and keys")
+    parser.add_argument("command", choices=["apply", "validate", "show"])
+    parser.add_argument("--spec", type=Path, help="tenant spec JSON (default: one tenant from VAPI_API_KEY)")
+    parser.add_argument("--store", type=Path, default=DEFAULT_STORE)
+    parser.add_argument("--base-url", default=os.getenv("VAPI_BASE_URL", DEFAULT_BASE_URL))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--server-url", help="webhook URL for end-of-call reports, e.g. https://host/weaviate/vapi/webhook")
+    parser.add_argument("--update", action="store_true", help="PATCH existing assistants with the spec")
+    parser.add_argument("--write-env", metavar="TENANT", help="write this tenant's IDs to .env")
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        print(json.dumps(ConfigStore(args.store).data, indent=2))
+        return 0
+    return asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())